@@ -0,0 +1,213 @@
+"""
+Admission control for browser-backed work
+
+Every search, orders scrape and browser debug route needs a Chrome, and the
+host can only run a handful of them at once. AdmissionController hands out
+at most max_active slots; callers beyond that wait in a bounded queue,
+interactive requests ahead of batch ones, and anything that does not fit is
+turned away immediately with AdmissionRejected so the route can answer
+429/503 with a Retry-After instead of starting yet another browser.
+
+A Ticket is taken in the request thread (so rejection is fast) and can be
+waited on later, e.g. by the background job that does the scrape.
+
+Browser work that is not a request of its own (arming form slots, the
+hybrid session handshake, launching the shared Chrome) goes through
+admit_once(): it takes a slot, unless the calling thread already holds one
+for the search it is part of.
+"""
+
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from contextlib import nullcontext
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BATCH = 1
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+
+class AdmissionRejected(Exception):
+    """No browser capacity for the request; retry after retry_after seconds"""
+
+    def __init__(self, message, retry_after, status_code=503):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class Ticket:
+    """A place in the admission queue, and later an active slot"""
+
+    def __init__(self, controller, priority, seq):
+        self.controller = controller
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted_at = None
+        self.released = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    @property
+    def priority_name(self):
+        return PRIORITY_NAMES.get(self.priority, str(self.priority))
+
+    def wait(self, timeout=None, should_cancel=None):
+        """Block until the slot is granted; raises AdmissionRejected on timeout"""
+        return self.controller._wait(self, timeout, should_cancel)
+
+    def release(self):
+        """Give the slot (or the queue place) back; safe to call more than once"""
+        self.controller._release(self)
+
+    def __enter__(self):
+        self.wait()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class AdmissionController:
+    """Priority semaphore with a bounded wait queue"""
+
+    def __init__(self, max_active=4, max_queue=16, max_batch_queue=None, queue_timeout=60):
+        # max_batch_queue keeps part of the queue free for interactive requests
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.max_batch_queue = max_batch_queue if max_batch_queue is not None else max_queue // 2
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._active = 0
+        self._seq = itertools.count()
+        # Ticket granted to the current thread by wait(), for admit_once()
+        self._held = threading.local()
+
+    def enqueue(self, priority=INTERACTIVE):
+        """Take a place in the queue, or raise AdmissionRejected at once if it is full"""
+        with self._cond:
+            queued = len(self._waiting)
+            batch_queued = sum(1 for ticket in self._waiting if ticket.priority != INTERACTIVE)
+            name = PRIORITY_NAMES.get(priority, str(priority))
+            if queued >= self.max_queue:
+                self._reject(name, 'queue_full')
+                raise AdmissionRejected(
+                    f"Browser queue is full ({queued} waiting)", self.retry_after(), status_code=503
+                )
+            if priority != INTERACTIVE and batch_queued >= self.max_batch_queue:
+                self._reject(name, 'batch_limit')
+                raise AdmissionRejected(
+                    f"Too many batch requests waiting ({batch_queued})", self.retry_after(), status_code=429
+                )
+            ticket = Ticket(self, priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            self._grant()
+            return ticket
+
+    def admit(self, priority=INTERACTIVE, timeout=None):
+        """enqueue() + wait(); use as `with admission.admit(BATCH): ...`"""
+        ticket = self.enqueue(priority)
+        try:
+            ticket.wait(timeout)
+        except BaseException:
+            ticket.release()
+            raise
+        return ticket
+
+    def holding(self):
+        """True if the calling thread waited for a slot it has not released yet"""
+        ticket = getattr(self._held, 'ticket', None)
+        return ticket is not None and not ticket.released
+
+    def admit_once(self, priority=BATCH, timeout=None):
+        """admit(), or a no-op context if the calling thread already holds a slot"""
+        if self.holding():
+            return nullcontext()
+        return self.admit(priority, timeout)
+
+    def retry_after(self):
+        """Seconds until a slot is likely free, from the average hold time and the queue length"""
+        hold = metrics.summary('admission.hold')
+        average = hold['avg_ms'] / 1000 if hold else 10
+        return max(1, math.ceil(average * (len(self._waiting) + 1) / max(1, self.max_active)))
+
+    def stats(self):
+        """Current occupancy for /debug/metrics"""
+        with self._cond:
+            return {
+                'active': self._active,
+                'max_active': self.max_active,
+                'queued': len(self._waiting),
+                'queued_batch': sum(1 for ticket in self._waiting if ticket.priority != INTERACTIVE),
+                'max_queue': self.max_queue,
+                'max_batch_queue': self.max_batch_queue
+            }
+
+    def _reject(self, name, reason):
+        metrics.incr(f'admission.rejected.{name}')
+        logger.warning(f"🚦 Admission rejected ({name}, {reason}): {self._active} active, {len(self._waiting)} queued")
+
+    def _grant(self):
+        """Hand free slots to the head of the queue (caller holds the lock)"""
+        granted = False
+        while self._waiting and self._active < self.max_active:
+            ticket = heapq.heappop(self._waiting)
+            ticket.granted_at = time.monotonic()
+            self._active += 1
+            metrics.observe(f'admission.queue_time.{ticket.priority_name}', ticket.granted_at - ticket.enqueued_at)
+            metrics.incr(f'admission.admitted.{ticket.priority_name}')
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _wait(self, ticket, timeout, should_cancel):
+        timeout = self.queue_timeout if timeout is None else timeout
+        expires_at = time.monotonic() + timeout
+        with self._cond:
+            while ticket.granted_at is None:
+                if ticket.released:
+                    raise AdmissionRejected("Ticket was released before it was admitted", self.retry_after())
+                if should_cancel and should_cancel():
+                    return False
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    self._remove(ticket)
+                    self._reject(ticket.priority_name, 'queue_timeout')
+                    raise AdmissionRejected(
+                        f"Waited {timeout:.0f}s for a browser", self.retry_after(), status_code=503
+                    )
+                # Wake up periodically so a cancelled caller does not keep its place
+                self._cond.wait(min(remaining, 0.5))
+        self._held.ticket = ticket
+        return True
+
+    def _remove(self, ticket):
+        """Drop a queued ticket (caller holds the lock)"""
+        ticket.released = True
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+
+    def _release(self, ticket):
+        with self._cond:
+            if ticket.released:
+                return
+            if ticket.granted_at is None:
+                self._remove(ticket)
+                return
+            ticket.released = True
+            self._active -= 1
+            metrics.observe('admission.hold', time.monotonic() - ticket.granted_at)
+            self._grant()
@@ -5,13 +5,32 @@ import os
 from dotenv import load_dotenv
 import requests
 from bs4 import BeautifulSoup
-import json
 import logging
+import socket
 import traceback
+import threading
+import time
 from live_scraper import ProductionCourtScraper
 from live_scraper import DelhiHighCourtLiveScraper
 from enhanced_scraper import EnhancedDelhiHighCourtScraper
 from models import db, CaseQuery, CaseData
+from db_engine import engine_options
+from case_store import find_case, upsert_case, find_order, find_orders, parse_order_date, history_page
+from migrations import migrate
+from raw_pages import load_page
+from snapshots import list_versions, get_version
+from metrics import metrics
+from session_handoff import HybridSession
+from chrome_profiles import get_profile_manager
+from browser_contexts import SharedBrowser
+from driver_health import driver_registry, warn_if_rss_unmeasurable
+from browser_discovery import get_browser_manifest
+from deadline import Deadline, Cancelled
+from jobs import JobManager
+from write_batcher import WriteBatcher, counted_commits
+from admission import AdmissionController, AdmissionRejected, INTERACTIVE, BATCH
+from politeness import get_upstream, priority
+from circuit_breaker import CircuitBreaker
 
 # Load environment variables
 load_dotenv()
@@ -20,6 +39,8 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///court_data.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Engines are created by db.init_app(), so the per-backend options must be set before it
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 
 # Initialize database
 db.init_app(app)
@@ -37,6 +58,94 @@ court_scraper = ProductionCourtScraper(use_live_scraping=USE_LIVE_SCRAPING)
 live_scraper = DelhiHighCourtLiveScraper(headless=True, show_browser=False)
 enhanced_scraper = EnhancedDelhiHighCourtScraper(headless=True, show_browser=False)
 
+# Web requests wait SEARCH_DEADLINE seconds for a search, then hand off to its background job,
+# which gets SEARCH_JOB_BUDGET seconds in total
+SEARCH_DEADLINE = float(os.getenv('SEARCH_DEADLINE', '8'))
+SEARCH_JOB_BUDGET = float(os.getenv('SEARCH_JOB_BUDGET', '180'))
+
+# At most BROWSER_SLOTS browser-backed requests run at once; up to ADMISSION_QUEUE more wait
+# (interactive before batch), anything beyond that is rejected with 429/503 + Retry-After
+admission = AdmissionController(
+    max_active=int(os.getenv('BROWSER_SLOTS', '4')),
+    max_queue=int(os.getenv('ADMISSION_QUEUE', '16')),
+    max_batch_queue=int(os.getenv('ADMISSION_BATCH_QUEUE', '4')),
+    queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '60'))
+)
+# Once too many searches fail upstream, stop sending searches to the portal for a while
+# and answer from stored results instead
+portal_breaker = CircuitBreaker(
+    'portal',
+    failure_rate=float(os.getenv('CIRCUIT_FAILURE_RATE', '0.5')),
+    min_requests=int(os.getenv('CIRCUIT_MIN_REQUESTS', '5')),
+    window=int(os.getenv('CIRCUIT_WINDOW', '120')),
+    open_seconds=int(os.getenv('CIRCUIT_OPEN_SECONDS', '60'))
+)
+# Stored results younger than SEARCH_FRESH_SECONDS are served as they are; up to SEARCH_STALE_SECONDS
+# they are served at once and refreshed in the background; older ones trigger a live search
+SEARCH_FRESH_SECONDS = int(os.getenv('SEARCH_FRESH_SECONDS', '300'))
+SEARCH_STALE_SECONDS = int(os.getenv('SEARCH_STALE_SECONDS', '86400'))
+refresh_jobs = {}
+refresh_lock = threading.Lock()
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '50'))
+
+# Search errors that mean the portal itself is slow or down (not "no such case" or a CAPTCHA miss)
+UPSTREAM_FAILURES = {'timeout', 'unknown_error', 'max_retries_exceeded', 'deadline_exceeded', 'form_submission_failed'}
+
+job_manager = JobManager(
+    # Every admitted or queued job needs its own worker so the queue, not the pool, decides the order
+    max_workers=int(os.getenv('JOB_WORKERS', str(admission.max_active + admission.max_queue))),
+    retention=int(os.getenv('JOB_RETENTION', '3600')),
+    heartbeat_timeout=int(os.getenv('JOB_HEARTBEAT_TIMEOUT', '15'))
+)
+
+# Queries of searches that stored nothing are only logged; they are inserted in batches off the request path
+log_writer = WriteBatcher(
+    app,
+    interval=int(os.getenv('LOG_WRITE_INTERVAL_MS', '200')) / 1000,
+    max_batch=int(os.getenv('LOG_WRITE_BATCH', '500'))
+)
+
+# Resolve Chrome/chromedriver once at startup (cached in the browser manifest)
+browser_manifest = get_browser_manifest()
+warn_if_rss_unmeasurable()
+
+# Multi-context mode: one Chrome hosts an isolated browser context per concurrent search
+shared_browser = None
+if os.getenv('SHARED_BROWSER', 'false').lower() == 'true':
+    # Page loads are awaited by each tab, so chromedriver must not block the shared session on them
+    shared_browser = SharedBrowser(
+        launch_driver=lambda: enhanced_scraper.launch_driver(page_load_strategy='none', owner='shared'),
+        admit=lambda: admission.admit_once(BATCH)
+    )
+    enhanced_scraper.enable_shared_browser(shared_browser)
+    live_scraper.enable_shared_browser(shared_browser)
+    court_scraper.live_scraper.enable_shared_browser(shared_browser)
+
+# Hybrid mode: a browser only bootstraps cookies/tokens, searches/orders/PDFs go over HTTP
+SCRAPER_MODE = os.getenv('SCRAPER_MODE', 'browser').lower()
+hybrid_session = None
+if SCRAPER_MODE == 'hybrid':
+    hybrid_session = HybridSession(
+        session=enhanced_scraper.session,
+        create_driver=enhanced_scraper.create_driver,
+        bootstrap_url=enhanced_scraper.case_status_url,
+        max_age=int(os.getenv('HYBRID_SESSION_MAX_AGE', '900')),
+        admit=lambda: admission.admit_once(BATCH)
+    )
+    enhanced_scraper.enable_hybrid_mode(hybrid_session)
+    live_scraper.enable_hybrid_mode(hybrid_session)
+    court_scraper.live_scraper.enable_hybrid_mode(hybrid_session)
+
+# Pre-armed form slots: idle browsers parked on the search form with a solved CAPTCHA
+FORM_SLOTS = int(os.getenv('FORM_SLOTS', '0'))
+if FORM_SLOTS > 0:
+    enhanced_scraper.enable_form_slots(
+        size=FORM_SLOTS,
+        captcha_ttl=int(os.getenv('FORM_SLOT_CAPTCHA_TTL', '120')),
+        max_age=int(os.getenv('FORM_SLOT_MAX_AGE', '600')),
+        admit=lambda: admission.admit_once(BATCH)
+    )
+
 @app.route('/')
 def index():
     """Main page with case search form"""
@@ -46,6 +155,228 @@ def index():
     
     return render_template('index.html', case_types=case_types, years=years)
 
+def log_search(case_type, case_number, filing_year, case_data_id=None):
+    """Queue a user's search for the history when no scrape will write it"""
+    log_writer.add(CaseQuery, case_type=case_type, case_number=case_number, filing_year=filing_year,
+                   timestamp=datetime.now(timezone.utc), case_data_id=case_data_id)
+
+def run_search_job(job, case_type, case_number, filing_year, log_query=True):
+    """
+    Background search: scrape within the job budget, then store the result
+    and its query in one commit. Refreshes pass log_query=False, since no
+    user asked for them.
+    """
+    with app.app_context(), counted_commits() as commits:
+        # Written with the result when the case is found, otherwise by the batched log writer
+        query = CaseQuery(
+            case_type=case_type,
+            case_number=case_number,
+            filing_year=filing_year,
+            timestamp=datetime.now(timezone.utc)
+        )
+        stored = False
+        try:
+            # Use enhanced scraper for faster, more reliable results
+            logger.info(f"🚀 Enhanced search: {case_type} {case_number}/{filing_year}")
+            
+            deadline = Deadline(SEARCH_JOB_BUDGET, on_stage=job.set_stage, should_cancel=job.should_cancel)
+            try:
+                search_result = enhanced_scraper.fast_search_case(case_type, case_number, filing_year, deadline=deadline)
+            except (Cancelled, AdmissionRejected):
+                # Never reached the portal, so it says nothing about its health
+                portal_breaker.release()
+                raise
+            except Exception:
+                portal_breaker.record(False)
+                raise
+            portal_breaker.record(search_result.get('error') not in UPSTREAM_FAILURES)
+            
+            case_id = None
+            changed = False
+            case_data = search_result.get('case_data')
+            if search_result.get('success') and case_data and case_data.get('total_cases', 0) > 0:
+                logger.info(f"✅ Enhanced scraper found {case_data.get('total_cases', 0)} case(s)")
+                
+                # One row per case key; rewritten only when the content changed
+                case_record, changed = upsert_case(query, case_data, log_query=log_query)
+                case_id = case_record.id
+                stored = True
+        finally:
+            if not stored and log_query:
+                log_writer.add(CaseQuery, case_type=case_type, case_number=case_number,
+                               filing_year=filing_year, timestamp=query.timestamp)
+    metrics.incr('search.commits', commits.count)
+    metrics.incr('search.finished')
+    
+    return {
+        'search_result': search_result,
+        'case_id': case_id,
+        'changed': changed,
+        'search_query': {
+            'case_type': case_type,
+            'case_number': case_number,
+            'filing_year': filing_year
+        }
+    }
+
+def client_disconnected():
+    """True if the client of the current request has closed its connection (Werkzeug server only)"""
+    sock = request.environ.get('werkzeug.socket')
+    if sock is None:
+        return False
+    try:
+        return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+    except BlockingIOError:
+        return False
+    except ConnectionError:
+        return True
+    except (OSError, ValueError):
+        # TLS sockets do not support MSG_PEEK; assume the client is still there
+        return False
+
+def wait_for_job(job, timeout):
+    """job.wait(timeout), cancelling the job as soon as the waiting client disconnects"""
+    expires_at = time.monotonic() + timeout
+    while not job.wait(min(0.5, max(0.0, expires_at - time.monotonic()))):
+        if time.monotonic() >= expires_at:
+            return False
+        if client_disconnected():
+            logger.info(f"🔌 Client left while waiting for job {job.id}, cancelling it")
+            metrics.incr(f'{job.kind}.client_disconnected')
+            job.cancel()
+            return False
+    return True
+
+def history_filters():
+    """case_type / filing_year filters of a history request, without the empty ones"""
+    return {name: request.args[name] for name in ('case_type', 'filing_year') if request.args.get(name)}
+
+def record_age(timestamp):
+    """Seconds since a stored timestamp"""
+    if timestamp.tzinfo is None:
+        # SQLite hands back naive datetimes; they were stored as UTC
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return max(0, int((datetime.now(timezone.utc) - timestamp).total_seconds()))
+
+def format_age(timestamp):
+    """Human readable age of a stored timestamp ("5 minutes", "2 days")"""
+    seconds = record_age(timestamp)
+    for unit, size in (('day', 86400), ('hour', 3600), ('minute', 60)):
+        if seconds >= size:
+            count = seconds // size
+            return f"{count} {unit}{'s' if count != 1 else ''}"
+    return f"{seconds} second{'s' if seconds != 1 else ''}"
+
+def parse_stored_cases(record):
+    """Re-parse the saved results HTML of a record; None if it holds no cases"""
+    raw_html = load_page(record.raw_page_hash) if record else None
+    if not raw_html:
+        return None
+    case_data = enhanced_scraper.parse_case_data_fast(raw_html)
+    if not case_data or case_data.get('total_cases', 0) == 0:
+        return None
+    return case_data
+
+def render_stored_result(record, portal_unavailable=False, refresh_job=None):
+    """Results page from a stored copy of a case, or None if it cannot be shown"""
+    case_data = parse_stored_cases(record)
+    if not case_data:
+        return None
+    logger.info(f"📦 Serving stored result for {record.case_type} {record.case_number}/{record.filing_year} from {record.last_checked}")
+    return render_template('case_results.html',
+                         case_data=case_data,
+                         search_query={'case_type': record.case_type, 'case_number': record.case_number,
+                                       'filing_year': record.filing_year},
+                         case_id=record.id,
+                         stored_age=format_age(record.last_checked),
+                         portal_unavailable=portal_unavailable,
+                         refresh_job=refresh_job)
+
+def render_stale_result(case_type, case_number, filing_year):
+    """Results page from the last stored copy of a case while the portal is unavailable, or None"""
+    page = render_stored_result(find_case(case_type, case_number, filing_year), portal_unavailable=True)
+    if page:
+        metrics.incr('search.served_stale')
+    return page
+
+def run_refresh_job(job, case_type, case_number, filing_year, previous_id):
+    """Background revalidation of a stored result; result['changed'] tells the page to update"""
+    with priority(BATCH):
+        outcome = run_search_job(job, case_type, case_number, filing_year, log_query=False)
+    metrics.incr('search.refresh.changed' if outcome['changed'] else 'search.refresh.unchanged')
+    outcome['previous_id'] = previous_id
+    return outcome
+
+def queue_refresh(record):
+    """Start (or reuse) a background refresh of a stored case; None if there is no capacity for one"""
+    key = (record.case_type, record.case_number, record.filing_year)
+    with refresh_lock:
+        job = refresh_jobs.get(key)
+        if job and not job.done():
+            return job
+        if not portal_breaker.allow():
+            return None
+        try:
+            ticket = admission.enqueue(BATCH)
+        except AdmissionRejected:
+            portal_breaker.release()
+            metrics.incr('search.refresh.skipped')
+            return None
+        job = job_manager.submit(
+            'refresh', run_refresh_job, record.case_type, record.case_number, record.filing_year, record.id,
+            description=f'Refreshing {record.case_type} {record.case_number}/{record.filing_year}',
+            ticket=ticket, on_skipped=portal_breaker.release
+        )
+        refresh_jobs[key] = job
+        return job
+
+def render_search_outcome(job):
+    """Results page for a finished search job, or a flashed error and back to the form"""
+    if job.status == 'failed':
+        flash('An error occurred while searching for the case. Please try again.', 'error')
+        return redirect(url_for('index'))
+    
+    search_result = job.result['search_result']
+    search_query = job.result['search_query']
+    case_type = search_query['case_type']
+    case_number = search_query['case_number']
+    filing_year = search_query['filing_year']
+    
+    if search_result.get('error') in UPSTREAM_FAILURES:
+        stale_page = render_stale_result(case_type, case_number, filing_year)
+        if stale_page:
+            return stale_page
+    
+    if not search_result.get('success'):
+        error_msg = search_result.get('message', 'Search failed')
+        error_type = search_result.get('error', 'unknown')
+        
+        logger.warning(f"❌ Search failed: {error_type} - {error_msg}")
+        
+        if error_type == 'no_data_found':
+            flash(f'❌ No case found for {case_type} {case_number}/{filing_year}. Please verify the case details.', 'warning')
+        elif error_type == 'captcha_failed':
+            flash('🔄 CAPTCHA verification failed. Please try again.', 'error')
+        elif error_type == 'max_retries_exceeded':
+            flash('⏰ Search failed after multiple attempts. Please try again in a few minutes.', 'error')
+        elif error_type == 'deadline_exceeded':
+            flash('⏰ The court website is responding too slowly. Please try again in a few minutes.', 'error')
+        else:
+            flash(f'❌ Search error: {error_msg}', 'error')
+        
+        return redirect(url_for('index'))
+    
+    if not job.result['case_id']:
+        # Safety net: Case not found - show helpful error message
+        logger.warning(f"❌ No case data found for {case_type} {case_number}/{filing_year}")
+        flash(f'❌ No case found for {case_type} {case_number}/{filing_year}. Please verify the case details.', 'warning')
+        return redirect(url_for('index'))
+    
+    return render_template('case_results.html', 
+                         case_data=search_result.get('case_data'), 
+                         search_query=search_query,
+                         case_id=job.result['case_id'])
+
 @app.route('/search', methods=['POST'])
 def search_case():
     """Handle case search request"""
@@ -58,87 +389,116 @@ def search_case():
             flash('All fields are required', 'error')
             return redirect(url_for('index'))
         
-        # Log the query
-        query = CaseQuery(
-            case_type=case_type,
-            case_number=case_number,
-            filing_year=filing_year,
-            timestamp=datetime.now(timezone.utc)
-        )
-        db.session.add(query)
-        db.session.commit()
-        
-        # Use enhanced scraper for faster, more reliable results
-        logger.info(f"🚀 Enhanced search: {case_type} {case_number}/{filing_year}")
+        # Stale-while-revalidate: a recent enough stored copy is shown at once
+        record = find_case(case_type, case_number, filing_year)
+        if record and record_age(record.last_checked) <= SEARCH_STALE_SECONDS:
+            refresh_job = queue_refresh(record) if record_age(record.last_checked) > SEARCH_FRESH_SECONDS else None
+            stored_page = render_stored_result(record, refresh_job=refresh_job)
+            if stored_page:
+                metrics.incr('search.served_from_store')
+                log_search(case_type, case_number, filing_year, case_data_id=record.id)
+                return stored_page
         
-        search_result = enhanced_scraper.fast_search_case(case_type, case_number, filing_year)
-        
-        if not search_result.get('success'):
-            error_msg = search_result.get('message', 'Search failed')
-            error_type = search_result.get('error', 'unknown')
-            
-            logger.warning(f"❌ Search failed: {error_type} - {error_msg}")
-            
-            if error_type == 'no_data_found':
-                flash(f'❌ No case found for {case_type} {case_number}/{filing_year}. Please verify the case details.', 'warning')
-            elif error_type == 'captcha_failed':
-                flash('🔄 CAPTCHA verification failed. Please try again.', 'error')
-            elif error_type == 'max_retries_exceeded':
-                flash('⏰ Search failed after multiple attempts. Please try again in a few minutes.', 'error')
-            else:
-                flash(f'❌ Search error: {error_msg}', 'error')
-            
+        # Portal known to be down: answer from the stored copy (or fail fast) instead of waiting on it
+        if not portal_breaker.allow():
+            log_search(case_type, case_number, filing_year, case_data_id=record.id if record else None)
+            stale_page = render_stale_result(case_type, case_number, filing_year)
+            if stale_page:
+                return stale_page
+            flash(f'⏰ The court website is currently unavailable. Please try again in {portal_breaker.retry_after()} seconds.', 'error')
             return redirect(url_for('index'))
         
-        case_data = search_result.get('case_data')
-        logger.info(f"✅ Enhanced scraper returned: {type(case_data)}")
-        
-        # Log the actual case count from scraper
-        if case_data:
-            actual_count = case_data.get('total_cases', 0)
-            logger.info(f"✅ Enhanced scraper found {actual_count} case(s)")
-        else:
-            logger.info("❌ No case data returned from scraper")
+        # The scrape runs as a background job; wait for it only up to the web deadline
+        try:
+            ticket = admission.enqueue(INTERACTIVE)
+        except AdmissionRejected:
+            portal_breaker.release()
+            raise
+        job = job_manager.submit(
+            'search', run_search_job, case_type, case_number, filing_year,
+            description=f'{case_type} {case_number}/{filing_year}',
+            ticket=ticket, on_skipped=portal_breaker.release
+        )
+        if not wait_for_job(job, SEARCH_DEADLINE):
+            if job.cancel_requested:
+                return '', 204
+            logger.info(f"⏳ Search {job.id} still running after {SEARCH_DEADLINE}s, handing off to background job")
+            metrics.incr('search.handed_off')
+            job.watch()
+            return render_template('job_pending.html', job=job), 202
         
-        if case_data and case_data.get('total_cases', 0) > 0:
-            # Store case data in new format
-            case_record = CaseData(
-                query_id=query.id,
-                case_type=case_type,
-                case_number=case_number,
-                filing_year=filing_year,
-                parties=json.dumps([]),  # Will be populated from cases
-                filing_date=None,
-                next_hearing_date=None,
-                orders_judgments=json.dumps([]),  # Will be populated from cases
-                raw_response=case_data.get('raw_html', ''),
-                status='Multiple Cases' if case_data.get('total_cases', 0) > 1 else case_data.get('cases', [{}])[0].get('status', 'Unknown')
-            )
-            db.session.add(case_record)
-            db.session.commit()
-            
-            # Create search query object for template
-            search_query = {
-                'case_type': case_type,
-                'case_number': case_number,
-                'filing_year': filing_year
-            }
-            
-            return render_template('case_results.html', 
-                                 case_data=case_data, 
-                                 search_query=search_query,
-                                 case_id=case_record.id)
-        else:
-            # Safety net: Case not found - show helpful error message
-            logger.warning(f"❌ No case data found for {case_type} {case_number}/{filing_year}")
-            flash(f'❌ No case found for {case_type} {case_number}/{filing_year}. Please verify the case details.', 'warning')
-            return redirect(url_for('index'))
+        return render_job_outcome(job)
             
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error searching case: {str(e)}")
         flash('An error occurred while searching for the case. Please try again.', 'error')
         return redirect(url_for('index'))
 
+def render_job_outcome(job):
+    """Result page of a finished background job"""
+    if job.status == 'rejected':
+        # Answered like a request turned away up front: 503 with Retry-After
+        raise AdmissionRejected(job.error, job.retry_after)
+    if job.status == 'cancelled':
+        flash('The request was cancelled.', 'warning')
+        return redirect(url_for('index'))
+    if job.kind == 'orders':
+        return render_orders_outcome(job)
+    if job.kind == 'refresh' and job.status == 'done' and not job.result['case_id']:
+        # The refresh found nothing better; keep showing what is stored
+        stored_page = render_stored_result(db.session.get(CaseData, job.result['previous_id']))
+        if stored_page:
+            return stored_page
+    return render_search_outcome(job)
+
+@app.route('/jobs/<job_id>')
+def job_page(job_id):
+    """Result page of a background job, or the "still working" page while it runs"""
+    job = job_manager.get(job_id)
+    if not job:
+        flash('This request has expired. Please try again.', 'warning')
+        return redirect(url_for('index'))
+    if not job.done():
+        job.watch()
+        return render_template('job_pending.html', job=job), 202
+    return render_job_outcome(job)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel button on the "still working" page"""
+    job = job_manager.get(job_id)
+    if job and not job.done():
+        job.cancel()
+    flash('The request was cancelled.', 'warning')
+    return redirect(url_for('index'))
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """JSON status of a background job; each poll is also the page's heartbeat"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    job.heartbeat()
+    status = job.to_dict()
+    if job.kind == 'refresh' and job.status == 'done':
+        # A refresh that finished may still have failed to reach the case (CAPTCHA, timeout, no data)
+        search_result = job.result['search_result']
+        status['success'] = bool(search_result.get('success')) and job.result['case_id'] is not None
+        status['error'] = search_result.get('error')
+        status['changed'] = job.result['changed']
+        status['case_id'] = job.result['case_id']
+    return jsonify(status)
+
+@app.route('/api/jobs/<job_id>/left', methods=['POST'])
+def api_job_left(job_id):
+    """sendBeacon from a closing "still working" page; the job stops unless the page polls again"""
+    job = job_manager.get(job_id)
+    if job:
+        job.client_left()
+    return '', 204
+
 @app.route('/download_pdf/<int:case_id>/<int:order_index>')
 def download_pdf(case_id, order_index):
     """Download PDF for a specific order/judgment"""
@@ -151,13 +511,11 @@ def download_pdf(case_id, order_index):
             flash('Case not found', 'error')
             return redirect(url_for('index'))
             
-        orders = json.loads(case_record.orders_judgments)
-        logger.info(f"Found {len(orders)} orders for case {case_id}")
+        order = find_order(case_id, order_index)
         
-        if order_index < len(orders):
-            order = orders[order_index]
-            pdf_url = order.get('pdf_link')
-            logger.info(f"Order {order_index}: {order.get('description', 'No description')}")
+        if order:
+            pdf_url = order.pdf_link
+            logger.info(f"Order {order_index}: {order.description or 'No description'}")
             logger.info(f"PDF URL: {pdf_url}")
             
             if pdf_url:
@@ -179,7 +537,7 @@ def download_pdf(case_id, order_index):
                 flash('PDF not available for this order', 'error')
                 return redirect(url_for('case_details', case_id=case_id))
         else:
-            logger.error(f"Order index {order_index} out of range (max: {len(orders)-1})")
+            logger.error(f"Order index {order_index} not found for case {case_id}")
             flash('Order not found', 'error')
             return redirect(url_for('case_details', case_id=case_id))
         
@@ -201,10 +559,10 @@ def case_details(case_id):
         'case_type': case_record.case_type,
         'case_number': case_record.case_number,
         'filing_year': case_record.filing_year,
-        'parties': json.loads(case_record.parties),
+        'parties': [party.to_dict() for party in case_record.parties],
         'filing_date': case_record.filing_date,
         'next_hearing_date': case_record.next_hearing_date,
-        'orders_judgments': json.loads(case_record.orders_judgments),
+        'orders_judgments': [order.to_dict() for order in case_record.orders],
         'status': case_record.status
     }
     
@@ -212,9 +570,38 @@ def case_details(case_id):
 
 @app.route('/history')
 def search_history():
-    """Display search history"""
-    queries = CaseQuery.query.order_by(CaseQuery.timestamp.desc()).limit(50).all()
-    return render_template('history.html', queries=queries)
+    """Display search history, a page at a time (?cursor=, ?case_type=, ?filing_year=)"""
+    filters = history_filters()
+    try:
+        queries, next_cursor = history_page(request.args.get('cursor'), limit=HISTORY_PAGE_SIZE, **filters)
+    except ValueError:
+        flash('That history page link is no longer valid', 'error')
+        return redirect(url_for('search_history', **filters))
+    return render_template('history.html', queries=queries, next_cursor=next_cursor,
+                           first_page=not request.args.get('cursor'), filters=filters)
+
+@app.route('/api/history')
+def api_history():
+    """Search history as JSON; follow next_cursor for older pages"""
+    filters = history_filters()
+    limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), 200)
+    try:
+        queries, next_cursor = history_page(request.args.get('cursor'), limit=limit, **filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'queries': [{
+            'id': query.id,
+            'timestamp': query.timestamp.isoformat() if query.timestamp else None,
+            'case_type': query.case_type,
+            'case_number': query.case_number,
+            'filing_year': query.filing_year,
+            'case_id': query.case_data_id,
+            'status': query.case_record.status if query.case_record else None
+        } for query in queries],
+        'next_cursor': next_cursor,
+        'next': url_for('api_history', cursor=next_cursor, limit=limit, **filters) if next_cursor else None
+    })
 
 @app.route('/test_pdf')
 def test_pdf():
@@ -240,18 +627,63 @@ def api_case_data(case_id):
     case_record = db.session.get(CaseData, case_id)
     if not case_record:
         return jsonify({'error': 'Case not found'}), 404
+    
+    # Served from the store at once; a stored copy past the freshness window is refreshed in the background
+    age = record_age(case_record.last_checked)
+    refresh_job = queue_refresh(case_record) if age > SEARCH_FRESH_SECONDS else None
         
     return jsonify({
         'case_type': case_record.case_type,
         'case_number': case_record.case_number,
         'filing_year': case_record.filing_year,
-        'parties': json.loads(case_record.parties),
+        'parties': [party.to_dict() for party in case_record.parties],
         'filing_date': case_record.filing_date,
         'next_hearing_date': case_record.next_hearing_date,
-        'orders_judgments': json.loads(case_record.orders_judgments),
-        'status': case_record.status
+        'orders_judgments': [order.to_dict() for order in case_record.orders],
+        'status': case_record.status,
+        'created_at': case_record.created_at.isoformat() if case_record.created_at else None,
+        'updated_at': case_record.updated_at.isoformat() if case_record.updated_at else None,
+        'checked_at': case_record.last_checked.isoformat(),
+        'age_seconds': age,
+        'refresh_job': url_for('api_job_status', job_id=refresh_job.id) if refresh_job else None
+    })
+
+@app.route('/api/case/<int:case_id>/orders')
+def api_case_orders(case_id):
+    """Orders of a case, optionally only those of one date (?date=15/03/2023)"""
+    if not db.session.get(CaseData, case_id):
+        return jsonify({'error': 'Case not found'}), 404
+    on_date = None
+    if request.args.get('date'):
+        on_date = parse_order_date(request.args['date'])
+        if on_date is None:
+            return jsonify({'error': 'Invalid date, use DD/MM/YYYY'}), 400
+    orders = find_orders(case_id, on_date)
+    return jsonify({
+        'case_id': case_id,
+        'orders': [dict(order.to_dict(), index=order.position) for order in orders]
     })
 
+@app.route('/api/case/<int:case_id>/history')
+def api_case_history(case_id):
+    """Every stored version of a case, oldest first"""
+    if not db.session.get(CaseData, case_id):
+        return jsonify({'error': 'Case not found'}), 404
+    return jsonify({'case_id': case_id, 'versions': list_versions(case_id)})
+
+@app.route('/api/case/<int:case_id>/history/<int:version>')
+def api_case_version(case_id, version):
+    """One historical version of a case, rebuilt from its snapshots (?html=1 includes the raw HTML)"""
+    snapshot = get_version(case_id, version)
+    if not snapshot:
+        return jsonify({'error': 'Version not found'}), 404
+    result = {'case_id': case_id, 'version': version, 'fields': snapshot['fields']}
+    if request.args.get('html') == '1':
+        result['raw_html'] = snapshot['raw_html']
+    else:
+        result['raw_html_bytes'] = len(snapshot['raw_html'].encode('utf-8'))
+    return jsonify(result)
+
 @app.route('/api/case-types')
 def api_case_types():
     """API endpoint to get available case types"""
@@ -298,7 +730,8 @@ def debug_test_scraper():
         logger.info(f"Debug test: {case_type} {case_number}/{filing_year}")
         
         # Test scraper directly
-        case_data = live_scraper.scrape_case_data(case_type, case_number, filing_year)
+        with admission.admit(BATCH), priority(BATCH):
+            case_data = live_scraper.scrape_case_data(case_type, case_number, filing_year)
         
         return jsonify({
             'success': True,
@@ -316,6 +749,8 @@ def debug_test_scraper():
             }
         })
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Debug test error: {str(e)}", exc_info=True)
         return jsonify({
@@ -336,7 +771,8 @@ def debug_test_enhanced_scraper():
         logger.info(f"Enhanced scraper test: {case_type} {case_number}/{filing_year}")
         
         # Test enhanced scraper directly
-        search_result = enhanced_scraper.fast_search_case(case_type, case_number, filing_year)
+        with admission.admit(BATCH), priority(BATCH):
+            search_result = enhanced_scraper.fast_search_case(case_type, case_number, filing_year)
         
         return jsonify({
             'test_params': {
@@ -352,6 +788,8 @@ def debug_test_enhanced_scraper():
             }
         })
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Enhanced scraper test error: {str(e)}", exc_info=True)
         return jsonify({
@@ -360,6 +798,38 @@ def debug_test_enhanced_scraper():
             'error_type': type(e).__name__
         })
 
+@app.route('/debug/metrics')
+def debug_metrics():
+    """Debug endpoint exposing in-process scraper timings and counters"""
+    snapshot = metrics.snapshot()
+    if enhanced_scraper.driver_pool:
+        snapshot['form_slots'] = enhanced_scraper.driver_pool.stats()
+    profile_manager = get_profile_manager()
+    if profile_manager:
+        snapshot['chrome_profiles'] = profile_manager.stats()
+    snapshot['browser_manifest'] = get_browser_manifest()
+    snapshot['admission'] = admission.stats()
+    snapshot['upstream'] = get_upstream().stats()
+    snapshot['circuit_breaker'] = portal_breaker.stats()
+    snapshot['log_writer'] = {'pending': log_writer.pending()}
+    if shared_browser:
+        snapshot['shared_browser'] = shared_browser.stats()
+    if hybrid_session:
+        snapshot['hybrid_session'] = {
+            'valid': hybrid_session.is_valid(),
+            'bootstraps': hybrid_session.bootstrap_count,
+            'cookies': len(hybrid_session.session.cookies)
+        }
+    return jsonify(snapshot)
+
+@app.route('/admin/drivers')
+def admin_drivers():
+    """List live Chrome drivers with their uptime, page count, error count and memory"""
+    return jsonify({
+        'drivers': driver_registry.snapshot(),
+        'policy': vars(live_scraper.recycle_policy)
+    })
+
 @app.route('/debug/simple-search', methods=['POST'])
 def debug_simple_search():
     """Simplified search route for debugging"""
@@ -371,7 +841,8 @@ def debug_simple_search():
         logger.info(f"Simple search: {case_type} {case_number}/{filing_year}")
         
         # Test scraper
-        case_data = live_scraper.scrape_case_data(case_type, case_number, filing_year)
+        with admission.admit(BATCH), priority(BATCH):
+            case_data = live_scraper.scrape_case_data(case_type, case_number, filing_year)
         
         logger.info(f"Simple search result: {type(case_data)}")
         if case_data:
@@ -394,6 +865,8 @@ def debug_simple_search():
             logger.warning("No case data found")
             return f"<h1>Debug: No case data found</h1><p>case_data: {case_data}</p>"
             
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Simple search error: {str(e)}", exc_info=True)
         return f"<h1>Debug Error</h1><p>{str(e)}</p><pre>{traceback.format_exc()}</pre>"
@@ -416,6 +889,36 @@ def debug_pdf_url(pdf_url):
     except Exception as e:
         return f"<h1>Debug Error</h1><p>{str(e)}</p>"
 
+def run_orders_job(job, orders_url):
+    """Background orders scrape, stopped early if the user leaves"""
+    deadline = Deadline(SEARCH_JOB_BUDGET, on_stage=job.set_stage, should_cancel=job.should_cancel)
+    # Use global scraper instance for better performance (reuses driver session)
+    orders_data = live_scraper.scrape_orders_page(orders_url, deadline=deadline)
+    return {'orders_data': orders_data, 'orders_url': orders_url}
+
+def render_orders_outcome(job):
+    """Orders page for a finished orders job, or a flashed error and back to the form"""
+    if job.status == 'failed':
+        flash('Error loading orders. Please try again.', 'error')
+        return redirect(url_for('index'))
+    
+    orders_data = job.result['orders_data']
+    logger.info(f"Orders data received: {type(orders_data)}")
+    if orders_data:
+        logger.info(f"Total orders: {orders_data.get('total_orders', 0)}")
+        logger.info(f"Has error: {orders_data.get('error', 'No error')}")
+    
+    if orders_data and orders_data.get('total_orders', 0) > 0:
+        logger.info("Rendering orders template")
+        return render_template('orders.html', 
+                             orders_data=orders_data,
+                             orders_url=job.result['orders_url'])
+    else:
+        error_msg = orders_data.get('error', 'No orders found') if orders_data else 'Scraper returned None'
+        logger.warning(f"No orders found: {error_msg}")
+        flash(f'No orders found for this case. {error_msg}', 'warning')
+        return redirect(url_for('index'))
+
 @app.route('/orders/<path:orders_url>')
 def view_orders(orders_url):
     """View orders for a specific case"""
@@ -434,25 +937,20 @@ def view_orders(orders_url):
             return redirect(url_for('index'))
         
         logger.info("Starting orders scraping...")
-        # Use global scraper instance for better performance (reuses driver session)
-        orders_data = live_scraper.scrape_orders_page(decoded_url)
-        
-        logger.info(f"Orders data received: {type(orders_data)}")
-        if orders_data:
-            logger.info(f"Total orders: {orders_data.get('total_orders', 0)}")
-            logger.info(f"Has error: {orders_data.get('error', 'No error')}")
+        job = job_manager.submit('orders', run_orders_job, decoded_url, description='Case orders',
+                                 ticket=admission.enqueue(INTERACTIVE))
+        if not wait_for_job(job, SEARCH_DEADLINE):
+            if job.cancel_requested:
+                return '', 204
+            logger.info(f"⏳ Orders job {job.id} still running after {SEARCH_DEADLINE}s, handing off")
+            metrics.incr('orders.handed_off')
+            job.watch()
+            return render_template('job_pending.html', job=job), 202
         
-        if orders_data and orders_data.get('total_orders', 0) > 0:
-            logger.info("Rendering orders template")
-            return render_template('orders.html', 
-                                 orders_data=orders_data,
-                                 orders_url=decoded_url)
-        else:
-            error_msg = orders_data.get('error', 'No orders found') if orders_data else 'Scraper returned None'
-            logger.warning(f"No orders found: {error_msg}")
-            flash(f'No orders found for this case. {error_msg}', 'warning')
-            return redirect(url_for('index'))
+        return render_job_outcome(job)
             
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error viewing orders: {str(e)}", exc_info=True)
         flash('Error loading orders. Please try again.', 'error')
@@ -464,6 +962,18 @@ def view_orders(orders_url):
 def not_found_error(error):
     return render_template('error.html', error_message="Page not found"), 404
 
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    """No browser capacity: answer fast with Retry-After instead of starting another Chrome"""
+    if request.path.startswith(('/api/', '/debug/')):
+        response = jsonify({'success': False, 'error': str(error), 'retry_after': error.retry_after})
+        response.status_code = error.status_code
+    else:
+        message = f"The court website search is busy right now. Please try again in {error.retry_after} seconds."
+        response = app.make_response((render_template('error.html', error_message=message), error.status_code))
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 @app.errorhandler(500)
 def internal_error(error):
     db.session.rollback()
@@ -471,5 +981,5 @@ def internal_error(error):
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        migrate()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
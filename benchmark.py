@@ -0,0 +1,763 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the court scrapers
+
+Usage: python benchmark.py <command> [options]
+Run 'python benchmark.py help' for the list of commands.
+"""
+
+import os
+import sys
+import time
+import logging
+
+from admission import BATCH
+from metrics import percentile
+from politeness import priority
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def print_timings(label, samples):
+    """Print a one-line latency summary for a list of durations in seconds"""
+    if not samples:
+        print(f"  {label:<28} no samples")
+        return
+    avg = sum(samples) / len(samples)
+    print(f"  {label:<28} n={len(samples):<4} avg={avg * 1000:8.1f}ms "
+          f"p50={percentile(samples, 50) * 1000:8.1f}ms p99={percentile(samples, 99) * 1000:8.1f}ms")
+
+
+def bench_captcha_acquire(iterations=10):
+    """Compare element screenshots with direct byte acquisition of the CAPTCHA image"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from enhanced_scraper import EnhancedDelhiHighCourtScraper
+    from captcha_utils import fetch_captcha_bytes, CAPTCHA_IMG_XPATH
+
+    scraper = EnhancedDelhiHighCourtScraper(headless=True, show_browser=False)
+    if not scraper.setup_driver():
+        print("❌ Could not start Chrome")
+        return
+
+    screenshot_times = []
+    direct_times = []
+    try:
+        for _ in range(iterations):
+            scraper.driver.get(scraper.case_status_url)
+            WebDriverWait(scraper.driver, 10).until(
+                EC.presence_of_element_located((By.ID, "case_type"))
+            )
+            captcha_img = scraper.driver.find_element(By.XPATH, CAPTCHA_IMG_XPATH)
+
+            start = time.perf_counter()
+            screenshot = captcha_img.screenshot_as_png
+            scraper.solve_captcha_bytes_fast(screenshot)
+            screenshot_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            image_bytes = fetch_captcha_bytes(scraper.driver, captcha_img, scraper.session.headers)
+            scraper.solve_captcha_bytes_fast(image_bytes)
+            direct_times.append(time.perf_counter() - start)
+    finally:
+        scraper.cleanup()
+
+    print("CAPTCHA acquisition + OCR per attempt:")
+    print_timings("screenshot", screenshot_times)
+    print_timings("direct bytes", direct_times)
+    if screenshot_times and direct_times:
+        saving = (sum(screenshot_times) - sum(direct_times)) / len(direct_times)
+        print(f"  saving per attempt/retry: {saving * 1000:.1f}ms")
+
+
+def bench_captcha_refresh(iterations=10, case_type='W.P.(C)', case_number='1', filing_year='2024'):
+    """Compare in-place CAPTCHA refresh with a full form reload and refill"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from enhanced_scraper import EnhancedDelhiHighCourtScraper
+    from captcha_utils import refresh_captcha_in_place, form_state_intact
+
+    scraper = EnhancedDelhiHighCourtScraper(headless=True, show_browser=False)
+    if not scraper.setup_driver():
+        print("❌ Could not start Chrome")
+        return
+
+    case_number, filing_year = str(case_number), str(filing_year)
+    in_place_times = []
+    reload_times = []
+    in_place_failures = 0
+    try:
+        scraper.driver.get(scraper.case_status_url)
+        WebDriverWait(scraper.driver, 10).until(EC.presence_of_element_located((By.ID, "case_type")))
+        scraper.fill_form_fast(case_type, case_number, filing_year)
+
+        for _ in range(iterations):
+            start = time.perf_counter()
+            if (refresh_captcha_in_place(scraper.driver) and
+                    form_state_intact(scraper.driver, case_type, case_number, filing_year)):
+                in_place_times.append(time.perf_counter() - start)
+            else:
+                in_place_failures += 1
+
+            start = time.perf_counter()
+            scraper.driver.get(scraper.case_status_url)
+            WebDriverWait(scraper.driver, 10).until(EC.presence_of_element_located((By.ID, "case_type")))
+            scraper.fill_form_fast(case_type, case_number, filing_year)
+            reload_times.append(time.perf_counter() - start)
+    finally:
+        scraper.cleanup()
+
+    print("CAPTCHA retry strategies:")
+    print_timings("in-place refresh", in_place_times)
+    print_timings("full reload + refill", reload_times)
+    print(f"  in-place refresh unavailable: {in_place_failures}/{iterations}")
+
+
+def cpu_seconds():
+    """CPU time of this process plus finished child processes (tesseract runs as a child)"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def bench_captcha_solvers(corpus_dir=None, *solver_names):
+    """Replay the labelled CAPTCHA corpus offline against every solver backend"""
+    from captcha_corpus import CaptchaCorpus
+    from captcha_solvers import SOLVERS
+
+    corpus_dir = corpus_dir or os.getenv('CAPTCHA_CORPUS_DIR', 'captcha_corpus')
+    samples = CaptchaCorpus(corpus_dir).load(labelled_only=True)
+    if not samples:
+        print(f"❌ No labelled samples in {corpus_dir}. Record some with CAPTCHA_CORPUS_DIR set.")
+        return
+
+    images = []
+    for sample in samples:
+        with open(sample['path'], 'rb') as f:
+            images.append((f.read(), sample['answer']))
+
+    print(f"CAPTCHA solvers on {len(images)} labelled samples from {corpus_dir}:")
+    print(f"  {'solver':<22} {'accuracy':>9} {'p50':>9} {'p99':>9} {'solves/s/core':>14}")
+    for name in (solver_names or SOLVERS.keys()):
+        solver = SOLVERS[name]
+        latencies = []
+        correct = 0
+        cpu_start = cpu_seconds()
+        for image_bytes, answer in images:
+            start = time.perf_counter()
+            try:
+                result = solver(image_bytes)
+            except Exception:
+                result = None
+            latencies.append(time.perf_counter() - start)
+            correct += result == answer
+        cpu_used = cpu_seconds() - cpu_start
+        throughput = len(images) / cpu_used if cpu_used > 0 else float('inf')
+        print(f"  {name:<22} {correct / len(images):>8.1%} "
+              f"{percentile(latencies, 50) * 1000:>7.1f}ms {percentile(latencies, 99) * 1000:>7.1f}ms "
+              f"{throughput:>14.1f}")
+
+
+def bench_profile_warmup(launches=5):
+    """Compare first page load with temporary, cold and warm persistent Chrome profiles"""
+    import tempfile
+    import chrome_profiles
+    from enhanced_scraper import EnhancedDelhiHighCourtScraper
+
+    scraper = EnhancedDelhiHighCourtScraper(headless=True, show_browser=False)
+
+    def timed_first_load():
+        driver = scraper.create_driver()
+        if not driver:
+            return None
+        try:
+            start = time.perf_counter()
+            driver.get(scraper.case_status_url)
+            driver.execute_script("return document.readyState")
+            return time.perf_counter() - start
+        finally:
+            driver.quit()
+
+    results = {'temporary profile': [], 'cold profile': [], 'warm profile': []}
+    base_dir = tempfile.mkdtemp(prefix='chrome-profiles-')
+    os.environ.pop('CHROME_PROFILE_DIR', None)
+    chrome_profiles._manager = None
+    for _ in range(launches):
+        results['temporary profile'].append(timed_first_load())
+
+    os.environ['CHROME_PROFILE_DIR'] = base_dir
+    os.environ['CHROME_PROFILE_SLOTS'] = '1'
+    for launch in range(launches + 1):
+        label = 'cold profile' if launch == 0 else 'warm profile'
+        results[label].append(timed_first_load())
+
+    print("First page load per driver launch:")
+    for label, samples in results.items():
+        print_timings(label, [sample for sample in samples if sample is not None])
+    print(f"  profile directory: {base_dir}")
+
+
+def bench_resource_blocking(loads=5):
+    """Compare search form loads with and without CDP resource blocking"""
+    import resource_blocking
+    from enhanced_scraper import EnhancedDelhiHighCourtScraper
+
+    os.environ['RESOURCE_BLOCKING'] = 'true'
+    scraper = EnhancedDelhiHighCourtScraper(headless=True, show_browser=False)
+    driver = scraper.create_driver()
+    if not driver:
+        print("Could not start Chrome")
+        return
+
+    default_rules = resource_blocking.RULES['search_form']
+    try:
+        for label, rules in (('unblocked', []), ('blocked', default_rules)):
+            resource_blocking.RULES['search_form'] = rules
+            timings = []
+            totals = {}
+            for _ in range(loads):
+                driver.delete_all_cookies()
+                driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+                resource_blocking.apply_rules(driver, 'search_form')
+                start = time.perf_counter()
+                driver.get(scraper.case_status_url)
+                driver.execute_script("return document.readyState")
+                timings.append(time.perf_counter() - start)
+                resource_blocking.merge_stats(totals, resource_blocking.collect_stats(driver))
+            print_timings(f"search form ({label})", timings)
+            print(f"  {'':<28} requests={totals['requests_loaded'] / loads:.1f}/load "
+                  f"loaded={totals['bytes_loaded'] / loads / 1024:.0f}KB/load "
+                  f"blocked={totals['requests_blocked'] / loads:.1f}/load "
+                  f"saved~{totals['bytes_saved'] / loads / 1024:.0f}KB/load")
+    finally:
+        resource_blocking.RULES['search_form'] = default_rules
+        driver.quit()
+
+
+def bench_memory_per_search(concurrency=4):
+    """Compare memory per concurrent search: one Chrome per search vs contexts in one Chrome"""
+    import process_stats
+    from browser_contexts import SharedBrowser
+    from enhanced_scraper import EnhancedDelhiHighCourtScraper
+
+    if not process_stats.PSUTIL_AVAILABLE:
+        print("psutil is required for this benchmark (pip install psutil)")
+        return
+
+    scraper = EnhancedDelhiHighCourtScraper(headless=True, show_browser=False)
+
+    drivers = [scraper.launch_driver() for _ in range(concurrency)]
+    drivers = [driver for driver in drivers if driver]
+    try:
+        for driver in drivers:
+            driver.get(scraper.case_status_url)
+        total = sum(process_stats.driver_rss(driver) or 0 for driver in drivers)
+        if drivers:
+            print(f"  {'one Chrome per search':<28} n={len(drivers):<4} "
+                  f"total={total / 1048576:8.1f}MB per search={total / len(drivers) / 1048576:8.1f}MB")
+    finally:
+        for driver in drivers:
+            driver.quit()
+
+    shared = SharedBrowser(launch_driver=scraper.launch_driver)
+    try:
+        tabs = [shared.open_tab() for _ in range(concurrency)]
+        tabs = [tab for tab in tabs if tab]
+        for tab in tabs:
+            tab.get(scraper.case_status_url)
+        total = process_stats.driver_rss(shared.driver) or 0
+        if tabs:
+            print(f"  {'contexts in one Chrome':<28} n={len(tabs):<4} "
+                  f"total={total / 1048576:8.1f}MB per search={total / len(tabs) / 1048576:8.1f}MB")
+    finally:
+        shared.shutdown()
+
+
+def bench_backend_latency(iterations=10, case_type='W.P.(C)', case_number='1', filing_year='2024'):
+    """Per-operation latency of the Selenium and direct CDP browser backends"""
+    from browser_backends import create_backend
+    from enhanced_scraper import EnhancedDelhiHighCourtScraper
+
+    scraper = EnhancedDelhiHighCourtScraper(headless=True, show_browser=False)
+    operations = ['navigate', 'fill_form', 'read_captcha', 'enter_captcha', 'dom_snapshot']
+    form_values = {'case_type': case_type, 'case_number': case_number, 'case_year': filing_year}
+
+    for name in ('selenium', 'cdp'):
+        backend = create_backend(name, create_driver=scraper.launch_driver, session=scraper.session)
+        if not backend:
+            print(f"{name}: backend could not be started")
+            continue
+        timings = {operation: [] for operation in operations}
+        try:
+            for _ in range(iterations):
+                steps = [
+                    ('navigate', lambda: backend.navigate(scraper.case_status_url, wait_for_id='case_type')),
+                    ('fill_form', lambda: backend.fill_form(form_values)),
+                    ('read_captcha', backend.read_captcha),
+                    ('enter_captcha', lambda: backend.enter_captcha('12345')),
+                    ('dom_snapshot', backend.dom_snapshot)
+                ]
+                for operation, step in steps:
+                    start = time.perf_counter()
+                    step()
+                    timings[operation].append(time.perf_counter() - start)
+        finally:
+            backend.quit()
+        print(f"{name} backend:")
+        for operation in operations:
+            print_timings(operation, timings[operation])
+
+
+def synthetic_results_page(case_index, status, next_date, orders, token):
+    """Results page shaped like the portal's: fixed chrome, a results table and per-request tokens"""
+    navigation = ''.join(f'<li><a href="/page/{i}">Section {i} of the Delhi High Court website</a></li>' for i in range(400))
+    rows = ''.join(
+        f'<tr><td>{i + 1}</td><td><a href="/orders/{case_index}/{i}.pdf">Order dated {day:02d}/01/2024</a></td>'
+        f'<td>Hon\'ble Judge {i % 7}</td></tr>'
+        for i, day in enumerate(orders)
+    )
+    return (
+        f'<html><head><meta name="csrf-token" content="{token}"><title>Case Status</title></head><body>'
+        f'<ul class="nav">{navigation}</ul>'
+        f'<table><tr><th>S.No</th><th>Case No</th><th>Petitioner Vs. Respondent</th><th>Listing</th></tr>'
+        f'<tr><td>1</td><td>W.P.(C) {case_index}/2024 [{status}]</td><td>PETITIONER {case_index} VS UNION OF INDIA</td>'
+        f'<td>NEXT DATE: {next_date} Last Date: 01/01/2024 COURT NO: {case_index % 40}</td></tr></table>'
+        f'<table class="orders">{rows}</table>'
+        f'<footer>Rendered for session {token}</footer></body></html>'
+    )
+
+
+def bench_snapshot_storage(refreshes=200, cases=20):
+    """Storage per case over many refreshes: a full row per search vs one row + delta snapshot history"""
+    import random
+    import uuid
+    from snapshots import KEYFRAME_INTERVAL, encode_version, decode_version
+
+    rng = random.Random(42)
+    full_rows = upserted = history = versions = 0
+    rebuild_times = []
+    for case_index in range(cases):
+        status, day, orders = 'PENDING', 1, [1]
+        chain, state = [], None
+        for refresh in range(refreshes):
+            # Most refreshes change nothing; some move the listing date, add an order or change the status
+            if rng.random() < 0.2:
+                day = day % 28 + 1
+            if rng.random() < 0.05:
+                orders.append(day)
+            if rng.random() < 0.01:
+                status = 'DISPOSED'
+            html = synthetic_results_page(case_index, status, f'{day:02d}/02/2025', orders, uuid.uuid4().hex)
+            full_rows += len(html)
+            fields = {'status': status, 'cases': [{'next_date': day, 'orders': list(orders)}]}
+            if chain and fields == chain[-1][0]:
+                continue  # content hash unchanged: no new version, nothing rewritten
+            full = not chain or len(chain) % KEYFRAME_INTERVAL == 0
+            fields_json, blob = encode_version(state, fields, html, full)
+            history += len(fields_json) + len(blob or b'')
+            state = decode_version(state, fields_json, blob, full)
+            chain.append((fields, fields_json, blob, full))
+            versions += 1
+        upserted += len(html)
+
+        # Rebuild the newest version from its nearest full version
+        start = time.perf_counter()
+        replay = []
+        for entry in reversed(chain):
+            replay.append(entry)
+            if entry[3]:
+                break
+        rebuilt = None
+        for _, fields_json, blob, full in reversed(replay):
+            rebuilt = decode_version(rebuilt, fields_json, blob, full)
+        rebuild_times.append(time.perf_counter() - start)
+
+    print(f"{cases} cases x {refreshes} refreshes, {versions} content versions:")
+    print(f"  {'full row per search':<28} {full_rows / cases / 1024:10.1f}KB per case")
+    print(f"  {'upsert (latest only)':<28} {upserted / cases / 1024:10.1f}KB per case")
+    print(f"  {'upsert + snapshot history':<28} {(upserted + history) / cases / 1024:10.1f}KB per case "
+          f"(history {history / cases / 1024:.1f}KB, {history / max(versions, 1):.0f}B per version)")
+    print_timings("rebuild newest version", rebuild_times)
+
+
+def bench_raw_page_storage(rows=2000, fetches=1000):
+    """raw_response inline in case_data vs compressed in raw_pages: size and case row fetch latency (offline)"""
+    import random
+    import sqlite3
+    import tempfile
+    import uuid
+    from raw_pages import ZSTD_AVAILABLE, compress, decompress, page_hash
+
+    rng = random.Random(42)
+    pages = [
+        synthetic_results_page(i, 'PENDING', f'{rng.randint(1, 28):02d}/02/2025',
+                               [rng.randint(1, 28) for _ in range(rng.randint(1, 30))], uuid.uuid4().hex)
+        for i in range(rows)
+    ]
+    raw_bytes = sum(len(page.encode('utf-8')) for page in pages)
+
+    print(f"{rows} results pages, {raw_bytes / rows / 1024:.1f}KB each on average:")
+    for encoding in ['zlib'] + (['zstd'] if ZSTD_AVAILABLE else []):
+        start = time.perf_counter()
+        compressed = [compress(page, encoding)[1] for page in pages]
+        compress_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for data in compressed:
+            decompress(encoding, data)
+        decompress_time = time.perf_counter() - start
+        stored = sum(len(data) for data in compressed)
+        print(f"  {encoding:<28} ratio {raw_bytes / stored:5.1f}x, {compress_time / rows * 1000:.2f}ms to compress, "
+              f"{decompress_time / rows * 1000:.2f}ms to decompress per page")
+    if not ZSTD_AVAILABLE:
+        print("  zstd                         skipped (zstandard not installed)")
+
+    columns = ('id INTEGER PRIMARY KEY, query_id INTEGER, case_type TEXT, case_number TEXT, filing_year TEXT, '
+               'parties TEXT, filing_date TEXT, next_hearing_date TEXT, orders_judgments TEXT, status TEXT')
+    metadata = (1, 'W.P.(C)', 'NUM', '2024', '[]', None, None, '[]', 'PENDING')
+    with tempfile.TemporaryDirectory() as tmp:
+        inline = sqlite3.connect(os.path.join(tmp, 'inline.db'))
+        inline.execute(f'CREATE TABLE case_data ({columns}, raw_response TEXT)')
+        inline.executemany('INSERT INTO case_data VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           [(i + 1,) + metadata + (page,) for i, page in enumerate(pages)])
+        inline.commit()
+
+        out_of_line = sqlite3.connect(os.path.join(tmp, 'out_of_line.db'))
+        out_of_line.execute(f'CREATE TABLE case_data ({columns}, raw_page_hash TEXT)')
+        out_of_line.execute('CREATE TABLE raw_pages (hash TEXT PRIMARY KEY, encoding TEXT, data BLOB, size INTEGER)')
+        for i, page in enumerate(pages):
+            encoding, data = compress(page)
+            out_of_line.execute('INSERT INTO raw_pages VALUES (?, ?, ?, ?)', (page_hash(page), encoding, data, len(page)))
+            out_of_line.execute('INSERT INTO case_data VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                (i + 1,) + metadata + (page_hash(page),))
+        out_of_line.commit()
+
+        for name in ('inline', 'out_of_line'):
+            print(f"  {name + ' database file':<28} {os.path.getsize(os.path.join(tmp, name + '.db')) / 1024 / 1024:8.1f}MB")
+
+        # What db.session.get(CaseData, id) selects in /case, /api/case and /download_pdf
+        ids = [rng.randint(1, rows) for _ in range(fetches)]
+        for name, conn in (('inline', inline), ('out_of_line', out_of_line)):
+            samples = []
+            for case_id in ids:
+                start = time.perf_counter()
+                conn.execute('SELECT * FROM case_data WHERE id = ?', (case_id,)).fetchone()
+                samples.append(time.perf_counter() - start)
+            # Sub-millisecond, so reported in microseconds rather than through print_timings()
+            print(f"  {'case row fetch (' + name + ')':<28} n={len(samples):<4} "
+                  f"avg={sum(samples) / len(samples) * 1e6:8.1f}us p50={percentile(samples, 50) * 1e6:8.1f}us "
+                  f"p99={percentile(samples, 99) * 1e6:8.1f}us")
+        inline.close()
+        out_of_line.close()
+
+
+def bench_history_indexes(queries=1000000, lookups=200):
+    """/history and case-key lookups over a seeded database, without and with the hot-path indexes (offline)"""
+    import random
+    import tempfile
+    from datetime import datetime, timedelta
+    from sqlalchemy import create_engine, select, text
+    from models import db, CaseQuery, CaseData
+    from migrations import HOT_PATH_INDEXES
+
+    rng = random.Random(42)
+    case_types = ['W.P.(C)', 'CRL.A.', 'CS(OS)', 'FAO', 'RFA', 'LPA', 'CRL.M.C.', 'ARB.P.', 'MAT.APP.', 'CM(M)']
+    keys = [(rng.choice(case_types), str(rng.randint(1, 20000)), str(rng.randint(2015, 2024)))
+            for _ in range(queries // 10)]
+    queries_table, data_table = CaseQuery.__table__, CaseData.__table__
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'history.db')}")
+        db.metadata.create_all(engine, tables=[queries_table, data_table])
+        with engine.begin() as conn:
+            for _, name, _ in HOT_PATH_INDEXES:
+                conn.execute(text(f'DROP INDEX {name}'))
+
+        print(f"Seeding {queries} queries over {len(keys)} case keys...")
+        start_time = datetime(2024, 1, 1)
+        with engine.begin() as conn:
+            batch = []
+            for i in range(queries):
+                case_type, case_number, filing_year = rng.choice(keys)
+                batch.append({'case_type': case_type, 'case_number': case_number, 'filing_year': filing_year,
+                              'timestamp': start_time + timedelta(seconds=rng.randint(0, 365 * 86400))})
+                if len(batch) == 50000:
+                    conn.execute(queries_table.insert(), batch)
+                    batch = []
+            if batch:
+                conn.execute(queries_table.insert(), batch)
+            # One stored record per case key that was searched, pointing at one of its queries
+            conn.execute(text(
+                'INSERT OR IGNORE INTO case_data (query_id, case_type, case_number, filing_year, created_at) '
+                'SELECT MAX(id), case_type, case_number, filing_year, MIN(timestamp) FROM case_queries '
+                'GROUP BY case_type, case_number, filing_year'
+            ))
+            records = conn.execute(text('SELECT COUNT(*) FROM case_data')).scalar()
+        print(f"  {records} case records")
+
+        history = select(queries_table).order_by(queries_table.c.timestamp.desc()).limit(50)
+        probe_keys = [rng.choice(keys) for _ in range(lookups)]
+        probe_queries = [rng.randint(1, queries) for _ in range(lookups)]
+
+        def by_key(key):
+            return select(queries_table).where(
+                queries_table.c.case_type == key[0], queries_table.c.case_number == key[1],
+                queries_table.c.filing_year == key[2]
+            ).order_by(queries_table.c.timestamp.desc())
+
+        def by_query_id(query_id):
+            return select(data_table).where(data_table.c.query_id == query_id)
+
+        recent = select(data_table).order_by(data_table.c.created_at.desc()).limit(50)
+
+        def run(label):
+            with engine.connect() as conn:
+                plan = conn.execute(text('EXPLAIN QUERY PLAN ' + str(history.compile(engine, compile_kwargs={'literal_binds': True})))).fetchall()
+                print(f"\n{label} (/history plan: {'; '.join(row[-1] for row in plan)})")
+                for name, statements in (
+                    ("/history (latest 50)", [history] * min(lookups, 20)),
+                    ("queries by case key", [by_key(key) for key in probe_keys]),
+                    ("case_data by query_id", [by_query_id(query_id) for query_id in probe_queries]),
+                    ("newest case_data", [recent] * min(lookups, 20)),
+                ):
+                    samples = []
+                    for statement in statements:
+                        start = time.perf_counter()
+                        conn.execute(statement).fetchall()
+                        samples.append(time.perf_counter() - start)
+                    print_timings(name, samples)
+
+        run("Without indexes")
+        with engine.begin() as conn:
+            for table, name, columns in HOT_PATH_INDEXES:
+                conn.execute(text(f'CREATE INDEX {name} ON {table} ({columns})'))
+        run("With indexes")
+        engine.dispose()
+
+
+def bench_search_writes(searches=2000, threads=8, found_percent=50):
+    """Persistence per search: query + result commits vs one unit of work + batched logging (offline, SQLite)"""
+    import random
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime, timezone
+    from flask import Flask
+    from sqlalchemy.exc import IntegrityError
+    from models import db, CaseQuery, CaseData
+    from case_store import (upsert_case, find_case, content_hash, case_status, set_parties, set_orders)
+    from raw_pages import store_page, release_page
+    from snapshots import record_snapshot
+    from write_batcher import WriteBatcher, counted_commits
+
+    rng = random.Random(42)
+    keys = [('W.P.(C)', str(number), '2024') for number in range(200)]
+    plan = [(rng.choice(keys), rng.randint(1, 100) <= found_percent, rng.randint(1, 3)) for _ in range(searches)]
+
+    def store_result_separately(query, case_data):
+        # upsert_case() as it was before the query joined the result's transaction: a second commit
+        # (retrying the whole attempt on a concurrent insert, as upsert_case does now, so the run completes)
+        now = datetime.now(timezone.utc)
+        new_hash = content_hash(case_data)
+        for attempt in range(2):
+            try:
+                record = find_case(query.case_type, query.case_number, query.filing_year)
+                if record is None:
+                    record = CaseData(query_id=query.id, case_type=query.case_type, case_number=query.case_number,
+                                      filing_year=query.filing_year, created_at=now)
+                    db.session.add(record)
+                    changed = True
+                else:
+                    changed = record.content_hash != new_hash
+                record.checked_at = now
+                if changed:
+                    record.query_id = query.id
+                    previous_page = record.raw_page_hash
+                    record.raw_page_hash = store_page(case_data.get('raw_html') or '')
+                    record.status = case_status(case_data)
+                    record.content_hash = new_hash
+                    record.updated_at = now
+                    if 'parties' in case_data:
+                        set_parties(record, case_data['parties'])
+                    if 'orders_judgments' in case_data:
+                        set_orders(record, case_data['orders_judgments'])
+                db.session.flush()
+                query.case_data_id = record.id
+                if changed:
+                    if previous_page != record.raw_page_hash:
+                        release_page(previous_page)
+                    record_snapshot(record, case_data)
+                db.session.commit()
+                return
+            except IntegrityError:
+                db.session.rollback()
+                db.session.add(query)
+                if attempt:
+                    raise
+
+    def two_commits(app, writer, key, found, case_data):
+        # Before: the query is committed up front, the result in a second commit
+        query = CaseQuery(case_type=key[0], case_number=key[1], filing_year=key[2], timestamp=datetime.now(timezone.utc))
+        db.session.add(query)
+        db.session.commit()
+        if found:
+            store_result_separately(query, case_data)
+
+    def one_unit(app, writer, key, found, case_data):
+        query = CaseQuery(case_type=key[0], case_number=key[1], filing_year=key[2], timestamp=datetime.now(timezone.utc))
+        if found:
+            upsert_case(query, case_data)
+        else:
+            writer.add(CaseQuery, case_type=key[0], case_number=key[1], filing_year=key[2], timestamp=query.timestamp)
+
+    print(f"{searches} searches on {threads} threads, {found_percent}% finding their case:")
+    for label, persist in (("query + result commits", two_commits), ("one unit + batched log", one_unit)):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = Flask('benchmark')
+            app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'writes.db')}"
+            db.init_app(app)
+            with app.app_context():
+                db.create_all()
+            writer = WriteBatcher(app)
+
+            def search(item):
+                key, found, version = item
+                case_data = {'cases': [{'case_no': key[1], 'version': version}], 'total_cases': 1,
+                             'raw_html': synthetic_results_page(int(key[1]), 'PENDING', '01/02/2025', [version], 'x')}
+                with app.app_context(), counted_commits() as commits:
+                    start = time.perf_counter()
+                    persist(app, writer, key, found, case_data)
+                    elapsed = time.perf_counter() - start
+                return elapsed, commits.count
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                results = list(pool.map(search, plan))
+            writer.shutdown()
+            wall = time.perf_counter() - start
+            with app.app_context():
+                logged = db.session.query(CaseQuery).count()
+                db.engine.dispose()
+
+        commits = sum(count for _, count in results)
+        print(f"\n  {label} ({logged} queries logged)")
+        print(f"  {'throughput':<28} {searches / wall:8.1f} searches/s")
+        print(f"  {'request-path commits':<28} {commits / searches:8.2f} per search")
+        print_timings("request-path write time", [elapsed for elapsed, _ in results])
+
+
+def bench_sqlite_tuning(writers=8, writes=250, readers=2):
+    """Concurrent commits on SQLite: rollback journal + synchronous=FULL vs WAL + synchronous=NORMAL (offline)"""
+    import tempfile
+    import threading
+    from datetime import datetime, timezone
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.exc import OperationalError
+    from models import db, CaseQuery, CaseData
+    import db_engine  # noqa: F401 - installs the SQLite pragma listener
+
+    table = CaseQuery.__table__
+    saved = {name: os.environ.get(name) for name in ('SQLITE_JOURNAL_MODE', 'SQLITE_SYNCHRONOUS')}
+    print(f"{writers} writers x {writes} single-row commits, {readers} readers paging /history:")
+    for label, journal_mode, synchronous in (("DELETE journal, FULL sync", 'DELETE', 'FULL'),
+                                             ("WAL, NORMAL sync", 'WAL', 'NORMAL')):
+        os.environ['SQLITE_JOURNAL_MODE'] = journal_mode
+        os.environ['SQLITE_SYNCHRONOUS'] = synchronous
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'tuning.db')}",
+                                   pool_size=writers + readers)
+            db.metadata.create_all(engine, tables=[table, CaseData.__table__])
+            samples, errors, reads = [], [0], [0]
+            lock = threading.Lock()
+            writing = threading.Event()
+            writing.set()
+
+            def write(worker):
+                for i in range(writes):
+                    start = time.perf_counter()
+                    try:
+                        with engine.begin() as conn:
+                            conn.execute(table.insert().values(
+                                case_type='W.P.(C)', case_number=f'{worker}-{i}', filing_year='2024',
+                                timestamp=datetime.now(timezone.utc)
+                            ))
+                    except OperationalError:
+                        with lock:
+                            errors[0] += 1
+                        continue
+                    with lock:
+                        samples.append(time.perf_counter() - start)
+
+            def read():
+                history = select(table).order_by(table.c.timestamp.desc()).limit(50)
+                while writing.is_set():
+                    try:
+                        with engine.connect() as conn:
+                            conn.execute(history).fetchall()
+                    except OperationalError:
+                        continue
+                    with lock:
+                        reads[0] += 1
+
+            reader_threads = [threading.Thread(target=read) for _ in range(readers)]
+            writer_threads = [threading.Thread(target=write, args=(worker,)) for worker in range(writers)]
+            start = time.perf_counter()
+            for thread in reader_threads + writer_threads:
+                thread.start()
+            for thread in writer_threads:
+                thread.join()
+            wall = time.perf_counter() - start
+            writing.clear()
+            for thread in reader_threads:
+                thread.join()
+            engine.dispose()
+
+        print(f"\n  {label}")
+        print(f"  {'write throughput':<28} {len(samples) / wall:8.1f} commits/s ({errors[0]} 'database is locked')")
+        print(f"  {'read throughput':<28} {reads[0] / wall:8.1f} history pages/s")
+        print_timings("commit latency", samples)
+    for name, value in saved.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+COMMANDS = {
+    'captcha-acquire': (bench_captcha_acquire, "Screenshot vs direct CAPTCHA bytes (live site)"),
+    'captcha-refresh': (bench_captcha_refresh, "In-place CAPTCHA refresh vs full reload (live site)"),
+    'captcha-solvers': (bench_captcha_solvers, "Accuracy/latency of solvers on the recorded corpus (offline)"),
+    'profile-warmup': (bench_profile_warmup, "First page load with temporary, cold and warm Chrome profiles"),
+    'resource-blocking': (bench_resource_blocking, "Search form load time and bytes with/without CDP blocking"),
+    'memory-per-search': (bench_memory_per_search, "RSS per concurrent search: Chrome per search vs shared contexts"),
+    'backend-latency': (bench_backend_latency, "Per-operation latency: Selenium vs direct CDP backend (live site)"),
+    'raw-page-storage': (bench_raw_page_storage, "raw_response inline vs compressed raw_pages: size and row fetch latency (offline)"),
+    'history-indexes': (bench_history_indexes, "/history and case-key lookups without vs with indexes, seeded DB (offline)"),
+    'search-writes': (bench_search_writes, "Per-search persistence: two commits vs one unit of work + batched logging (offline)"),
+    'sqlite-tuning': (bench_sqlite_tuning, "Concurrent SQLite commits: rollback journal vs WAL + synchronous=NORMAL (offline)"),
+    'snapshot-storage': (bench_snapshot_storage, "Storage per case: full row per search vs delta snapshot history (offline)"),
+}
+
+
+def main():
+    """Main entry point"""
+    if len(sys.argv) < 2 or sys.argv[1] == 'help':
+        print("Available commands:")
+        for name, (_, description) in COMMANDS.items():
+            print(f"  {name:<18} - {description}")
+        return
+
+    command = sys.argv[1]
+    if command not in COMMANDS:
+        print(f"Unknown command: {command}")
+        print("Use 'python benchmark.py help' for available commands")
+        return
+
+    func, _ = COMMANDS[command]
+    args = [int(arg) if arg.isdigit() else arg for arg in sys.argv[2:]]
+    # Benchmarks never use the upstream capacity reserved for interactive searches
+    with priority(BATCH):
+        func(*args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,402 @@
+"""
+Browser backends for the search flow
+
+The search flow only needs a few things from a browser: navigate, fill the
+form, read the CAPTCHA, submit (and wait for the answer) and take a DOM
+snapshot. BrowserBackend is
+that interface, with two implementations:
+
+* SeleniumBackend - wraps a WebDriver; every find_element/.text is an HTTP
+  round trip to chromedriver, which relays it to Chrome
+* CdpBackend - starts Chrome itself and talks to it directly over the
+  DevTools websocket, running each operation as one Runtime.evaluate
+
+CdpBackend needs the websocket-client package.
+"""
+
+import base64
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from abc import ABC, abstractmethod
+
+import requests
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support import expected_conditions as EC
+
+from browser_discovery import get_browser_manifest
+from captcha_utils import (
+    CAPTCHA_IMG_XPATH, CAPTCHA_TEXT_SELECTORS, PAGE_SETTLED_JS, decode_data_uri, fetch_captcha_bytes, wait_for_answer
+)
+
+try:
+    import websocket
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CAPTCHA_INPUT_SELECTORS = [
+    "input[name*='captcha']",
+    "input[id*='captcha']",
+    "input[placeholder*='captcha']"
+]
+
+SUBMIT_SELECTORS = [
+    "button[type='submit']",
+    "input[type='submit']",
+    "button[class*='submit']",
+    "input[class*='submit']",
+    ".submit-btn"
+]
+
+class BrowserBackend(ABC):
+    """Browser operations used by the search flow"""
+
+    name = 'base'
+    # Page HTML just before the last submit(), to tell when the answer has arrived
+    submitted_from = None
+
+    @abstractmethod
+    def navigate(self, url, wait_for_id=None, timeout=15):
+        """Load url and wait until the element with id wait_for_id exists"""
+
+    @abstractmethod
+    def fill_form(self, values):
+        """Set form fields by element id ({'case_type': 'W.P.(C)', ...}); selects and inputs alike"""
+
+    @abstractmethod
+    def read_captcha(self):
+        """('text', answer) for a text CAPTCHA, ('image', bytes) for an image one, (None, None) if absent"""
+
+    @abstractmethod
+    def enter_captcha(self, answer):
+        """Type the CAPTCHA answer; returns False if there is no CAPTCHA input"""
+
+    @abstractmethod
+    def submit(self):
+        """Click the form's submit button; returns False if none was found"""
+
+    @abstractmethod
+    def page_settled(self):
+        """True once the page has loaded and no AJAX request is in flight"""
+
+    def wait_for_answer(self, timeout=20):
+        """After submit(), wait until the portal has answered; False on timeout"""
+        return wait_for_answer(self.dom_snapshot, self.page_settled, self.submitted_from, timeout)
+
+    @abstractmethod
+    def dom_snapshot(self):
+        """Current page HTML"""
+
+    @abstractmethod
+    def quit(self):
+        """Release the browser"""
+
+
+class SeleniumBackend(BrowserBackend):
+    """Backend on top of an existing Selenium WebDriver"""
+
+    name = 'selenium'
+
+    def __init__(self, driver, session=None):
+        self.driver = driver
+        self.session = session
+
+    def navigate(self, url, wait_for_id=None, timeout=15):
+        self.driver.get(url)
+        if wait_for_id:
+            WebDriverWait(self.driver, timeout).until(
+                EC.presence_of_element_located((By.ID, wait_for_id))
+            )
+
+    def fill_form(self, values):
+        for element_id, value in values.items():
+            element = self.driver.find_element(By.ID, element_id)
+            if element.tag_name.lower() == 'select':
+                Select(element).select_by_value(value)
+            else:
+                element.clear()
+                element.send_keys(value)
+
+    def _first(self, by, selectors):
+        """First element matching any selector, or None"""
+        for selector in selectors:
+            elements = self.driver.find_elements(by, selector)
+            if elements:
+                return elements[0]
+        return None
+
+    def read_captcha(self):
+        text_element = self._first(By.CSS_SELECTOR, CAPTCHA_TEXT_SELECTORS)
+        if text_element:
+            text = text_element.text.strip()
+            if len(text) >= 3:
+                return 'text', text
+        image = self._first(By.XPATH, [CAPTCHA_IMG_XPATH])
+        if image:
+            return 'image', fetch_captcha_bytes(self.driver, image, self.session.headers if self.session else None)
+        return None, None
+
+    def enter_captcha(self, answer):
+        captcha_input = self._first(By.CSS_SELECTOR, CAPTCHA_INPUT_SELECTORS)
+        if not captcha_input:
+            return False
+        captcha_input.clear()
+        captcha_input.send_keys(answer)
+        return True
+
+    def submit(self):
+        button = self._first(By.CSS_SELECTOR, SUBMIT_SELECTORS)
+        if not button:
+            button = self._first(By.XPATH, ["//button[contains(text(), 'Submit')]"])
+        if not button:
+            return False
+        self.submitted_from = self.dom_snapshot()
+        button.click()
+        return True
+
+    def page_settled(self):
+        return self.driver.execute_script(f'return {PAGE_SETTLED_JS};')
+
+    def dom_snapshot(self):
+        return self.driver.page_source
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+
+class CdpError(Exception):
+    """Chrome returned an error for a DevTools command"""
+
+
+class CdpBackend(BrowserBackend):
+    """Backend that drives Chrome over its DevTools websocket, without chromedriver"""
+
+    name = 'cdp'
+
+    def __init__(self, headless=True, user_agent=None, startup_timeout=20):
+        if not WEBSOCKET_AVAILABLE:
+            raise RuntimeError("websocket-client is required for the CDP backend (pip install websocket-client)")
+        chrome = get_browser_manifest().get('chrome_binary')
+        if not chrome:
+            raise RuntimeError("Chrome executable not found (set CHROME_BINARY)")
+
+        self.user_data_dir = tempfile.mkdtemp(prefix='cdp-chrome-')
+        args = [
+            chrome,
+            '--remote-debugging-port=0',
+            f'--user-data-dir={self.user_data_dir}',
+            '--no-first-run',
+            '--no-default-browser-check',
+            '--disable-extensions',
+            '--disable-background-networking',
+            '--disable-dev-shm-usage',
+            '--no-sandbox',
+            '--window-size=1920,1080',
+            'about:blank'
+        ]
+        if headless:
+            args.insert(1, '--headless=new')
+        if user_agent:
+            args.insert(1, f'--user-agent={user_agent}')
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._next_id = 0
+        # URL -> requestId of the latest response, so read_captcha() can take the image bytes Chrome received
+        self._responses = {}
+        self.ws = None
+        try:
+            self.ws = websocket.create_connection(self._page_websocket_url(startup_timeout), timeout=30)
+            self.send('Network.enable')
+        except Exception:
+            self.quit()
+            raise
+
+    def _page_websocket_url(self, timeout):
+        """Wait for Chrome's DevTools port and return the websocket URL of its first page"""
+        port_file = os.path.join(self.user_data_dir, 'DevToolsActivePort')
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if os.path.exists(port_file):
+                with open(port_file) as f:
+                    lines = f.read().split()
+                if lines:
+                    targets = requests.get(f'http://127.0.0.1:{lines[0]}/json/list', timeout=5).json()
+                    pages = [target for target in targets if target.get('type') == 'page']
+                    if pages:
+                        return pages[0]['webSocketDebuggerUrl']
+            time.sleep(0.1)
+        raise RuntimeError("Chrome did not open its DevTools port")
+
+    def send(self, method, params=None):
+        """Send one DevTools command and return its result; events received meanwhile are recorded"""
+        self._next_id += 1
+        command_id = self._next_id
+        self.ws.send(json.dumps({'id': command_id, 'method': method, 'params': params or {}}))
+        while True:
+            message = json.loads(self.ws.recv())
+            if message.get('method') == 'Network.responseReceived':
+                params = message['params']
+                self._responses[params['response']['url']] = params['requestId']
+            if message.get('id') != command_id:
+                continue
+            if 'error' in message:
+                raise CdpError(f"{method}: {message['error'].get('message')}")
+            return message.get('result', {})
+
+    def evaluate(self, expression):
+        """Evaluate JavaScript in the page and return its (JSON) value"""
+        result = self.send('Runtime.evaluate', {
+            'expression': expression,
+            'returnByValue': True,
+            'awaitPromise': True
+        })
+        if 'exceptionDetails' in result:
+            raise CdpError(result['exceptionDetails'].get('text', 'JavaScript error'))
+        return result.get('result', {}).get('value')
+
+    def navigate(self, url, wait_for_id=None, timeout=15):
+        # Marks the current document, so the checks below only pass on the new one
+        self.evaluate("document.__replaced = true")
+        self._responses.clear()
+        result = self.send('Page.navigate', {'url': url})
+        if result.get('errorText'):
+            raise CdpError(f"Could not load {url}: {result['errorText']}")
+        ready = (f"document.getElementById({json.dumps(wait_for_id)}) !== null" if wait_for_id
+                 else "document.readyState !== 'loading'")
+        check = f"!document.__replaced && {ready}"
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                if self.evaluate(check):
+                    return
+            except CdpError:
+                # Execution context is replaced while the new document loads
+                pass
+            time.sleep(0.05)
+        raise TimeoutError(f"Timed out loading {url}")
+
+    def fill_form(self, values):
+        missing = self.evaluate(f"""
+            (() => {{
+                const values = {json.dumps(values)};
+                const missing = [];
+                for (const [id, value] of Object.entries(values)) {{
+                    const element = document.getElementById(id);
+                    if (!element) {{ missing.push(id); continue; }}
+                    element.value = value;
+                    element.dispatchEvent(new Event('input', {{bubbles: true}}));
+                    element.dispatchEvent(new Event('change', {{bubbles: true}}));
+                }}
+                return missing;
+            }})()
+        """)
+        if missing:
+            raise CdpError(f"Form fields not found: {', '.join(missing)}")
+
+    def read_captcha(self):
+        captcha = self.evaluate(f"""
+            (async () => {{
+                for (const selector of {json.dumps(CAPTCHA_TEXT_SELECTORS)}) {{
+                    const element = document.querySelector(selector);
+                    const text = element ? element.innerText.trim() : '';
+                    if (text.length >= 3) return {{kind: 'text', value: text}};
+                }}
+                const image = document.evaluate({json.dumps(CAPTCHA_IMG_XPATH)}, document, null,
+                    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+                if (!image) return null;
+                if (image.src.startsWith('data:')) return {{kind: 'image', value: image.src}};
+                if (!image.complete) await new Promise(resolve => image.addEventListener('load', resolve, {{once: true}}));
+                return {{kind: 'url', value: image.currentSrc || image.src}};
+            }})()
+        """)
+        if not captcha:
+            return None, None
+        if captcha['kind'] == 'text':
+            return 'text', captcha['value']
+        if captcha['kind'] == 'image':
+            return 'image', decode_data_uri(captcha['value'])
+        return 'image', self.response_body(captcha['value'])
+
+    def response_body(self, url):
+        """Bytes Chrome received for url, as loaded by the page"""
+        request_id = self._responses.get(url)
+        if request_id is None:
+            raise CdpError(f"No response recorded for {url}")
+        body = self.send('Network.getResponseBody', {'requestId': request_id})
+        if body.get('base64Encoded'):
+            return base64.b64decode(body['body'])
+        return body['body'].encode('utf-8')
+
+    def enter_captcha(self, answer):
+        return bool(self.evaluate(f"""
+            (() => {{
+                for (const selector of {json.dumps(CAPTCHA_INPUT_SELECTORS)}) {{
+                    const element = document.querySelector(selector);
+                    if (element) {{
+                        element.value = {json.dumps(answer)};
+                        element.dispatchEvent(new Event('input', {{bubbles: true}}));
+                        return true;
+                    }}
+                }}
+                return false;
+            }})()
+        """))
+
+    def submit(self):
+        self.submitted_from = self.dom_snapshot()
+        return bool(self.evaluate(f"""
+            (() => {{
+                let button = null;
+                for (const selector of {json.dumps(SUBMIT_SELECTORS)}) {{
+                    button = document.querySelector(selector);
+                    if (button) break;
+                }}
+                if (!button) {{
+                    button = [...document.querySelectorAll('button')].find(b => b.textContent.includes('Submit'));
+                }}
+                if (!button) return false;
+                button.click();
+                return true;
+            }})()
+        """))
+
+    def page_settled(self):
+        return self.evaluate(PAGE_SETTLED_JS)
+
+    def dom_snapshot(self):
+        return self.evaluate("document.documentElement.outerHTML")
+
+    def quit(self):
+        try:
+            if self.ws:
+                self.send('Browser.close')
+                self.ws.close()
+        except Exception:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+def create_backend(name, create_driver=None, session=None, headless=True, user_agent=None):
+    """Start a backend by name ('selenium' or 'cdp'); None if it could not be started"""
+    try:
+        if name == 'cdp':
+            return CdpBackend(headless=headless, user_agent=user_agent)
+        driver = create_driver() if create_driver else None
+        return SeleniumBackend(driver, session) if driver else None
+    except Exception as e:
+        logger.error(f"Could not start {name} browser backend: {str(e)}")
+        return None
@@ -0,0 +1,273 @@
+"""
+Many isolated browser contexts inside one Chrome process
+
+Instead of starting a Chrome per concurrent search, SharedBrowser keeps one
+Chrome running and opens an incognito-style browser context (own cookies,
+cache and storage) with a single tab for every search. The tab is handed to
+the scrapers as a ContextTab, which behaves like a WebDriver: every command
+takes the browser lock and switches chromedriver to the tab first, because
+chromedriver only talks to one window at a time. quit() disposes of the
+context instead of stopping Chrome.
+
+The lock is only held to switch and issue a command, never while a page
+loads or an element is awaited: the shared Chrome runs with page load
+strategy 'none' and implicit waits off, so get() returns as soon as the
+navigation has started, and ContextTab waits for the new document (and
+emulates implicit waits) with short polls between which other tabs run.
+Chrome's performance log is shared by every tab; entries are sorted by the
+target they came from so each tab only counts its own requests.
+
+Every tab is registered with the driver registry for its age, pages and
+errors. Memory is measured on the shared Chrome itself, which is restarted
+between searches once it crosses the recycle policy.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import nullcontext
+
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.remote.webelement import WebElement
+
+from driver_health import RecyclePolicy, driver_registry
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SharedBrowser:
+    """One Chrome process hosting one browser context per concurrent search"""
+
+    def __init__(self, launch_driver, recycle_policy=None, admit=None):
+        # launch_driver() -> WebDriver or None, used to (re)start the shared Chrome
+        # admit() -> context manager holding a browser slot while a tab is opened
+        self.launch_driver = launch_driver
+        self.admit = admit or nullcontext
+        self.recycle_policy = recycle_policy or RecyclePolicy.from_env()
+        self.driver = None
+        self.current_target = None
+        self.tabs = {}
+        self.lock = threading.RLock()
+        self._performance_logs = defaultdict(list)
+
+    def _ensure_browser(self):
+        """Start Chrome, or restart it if it has died; returns False if that fails"""
+        if self.driver:
+            try:
+                self.driver.execute_cdp_cmd('Browser.getVersion', {})
+            except Exception:
+                logger.warning("Shared Chrome is not responding, restarting it")
+                self._quit_browser()
+            else:
+                # Only restart between searches, never under an open tab
+                recycle_reason = None if self.tabs else driver_registry.recycle_reason(self.driver, self.recycle_policy)
+                if not recycle_reason:
+                    return True
+                logger.info(f"Recycling shared Chrome ({recycle_reason})")
+                metrics.incr('driver.recycled')
+                self._quit_browser()
+        self.driver = self.launch_driver()
+        self.current_target = None
+        if self.driver is None:
+            return False
+        # Waits happen in ContextTab between short locked calls, not inside chromedriver
+        self.driver.implicitly_wait(0)
+        return True
+
+    def open_tab(self):
+        """Create a new isolated context with one blank tab, or None if Chrome is unavailable"""
+        # Taken before the browser lock, so a caller waiting for a slot does not stall other tabs
+        with self.admit(), self.lock:
+            if not self._ensure_browser():
+                return None
+            try:
+                context_id = self.driver.execute_cdp_cmd(
+                    'Target.createBrowserContext', {'disposeOnDetach': False}
+                )['browserContextId']
+                target_id = self.driver.execute_cdp_cmd(
+                    'Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id}
+                )['targetId']
+            except Exception as e:
+                logger.error(f"Could not open browser context: {str(e)}")
+                return None
+            tab = ContextTab(self, context_id, target_id)
+            # The tab's memory is the shared Chrome's, which is measured on its own
+            driver_registry.register(tab, owner='shared-tab', measure_rss=False)
+            self.tabs[target_id] = tab
+            metrics.incr('shared_browser.contexts_opened')
+            return tab
+
+    def switch_to(self, target_id):
+        """Point chromedriver at a tab (caller holds the lock)"""
+        if self.current_target != target_id:
+            # chromedriver window handles are the DevTools target ids
+            self.driver.switch_to.window(target_id)
+            self.current_target = target_id
+
+    def performance_log(self, target_id):
+        """Performance log entries of one tab since its last call (caller holds the lock)"""
+        for entry in self.driver.get_log('performance'):
+            try:
+                webview = json.loads(entry['message']).get('webview')
+            except (KeyError, ValueError):
+                continue
+            if webview in self.tabs:
+                self._performance_logs[webview].append(entry)
+        return self._performance_logs.pop(target_id, [])
+
+    def close_tab(self, tab):
+        """Close a tab and throw away its context (cookies, cache, storage)"""
+        with self.lock:
+            self.tabs.pop(tab.target_id, None)
+            self._performance_logs.pop(tab.target_id, None)
+            if not self.driver:
+                return
+            try:
+                self.driver.execute_cdp_cmd('Target.closeTarget', {'targetId': tab.target_id})
+                self.driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': tab.context_id})
+            except Exception as e:
+                logger.debug(f"Closing browser context failed: {str(e)}")
+            if self.current_target == tab.target_id:
+                self.current_target = None
+
+    def _quit_browser(self):
+        """Stop the shared Chrome, ignoring errors"""
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        self.driver = None
+        self.tabs = {}
+
+    def shutdown(self):
+        """Close every context and stop Chrome"""
+        with self.lock:
+            if self.driver:
+                self._quit_browser()
+
+    def stats(self):
+        """Open context count for debug output"""
+        return {'running': self.driver is not None, 'open_contexts': len(self.tabs)}
+
+
+class ContextTab:
+    """WebDriver stand-in bound to one tab of a SharedBrowser"""
+
+    def __init__(self, browser, context_id, target_id):
+        self._browser = browser
+        self.context_id = context_id
+        self.target_id = target_id
+        self.page_load_timeout = 30
+        self.implicit_wait = 0
+
+    # Seconds between polls while waiting for a page or an element
+    POLL_INTERVAL = 0.1
+
+    def _call(self, func, *args, **kwargs):
+        """Run a WebDriver/WebElement call with this tab selected"""
+        args = [arg._element if isinstance(arg, TabElement) else arg for arg in args]
+        with self._browser.lock:
+            self._browser.switch_to(self.target_id)
+            return self._wrap(func(*args, **kwargs))
+
+    def get(self, url):
+        """Start the navigation under the lock, then wait for the new document without it"""
+        marker = uuid.uuid4().hex
+        driver = self._browser.driver
+        # The marker lives on the old document, so its absence means the new one has replaced it
+        self._call(driver.execute_script, 'window.__contextTabNavigation = arguments[0];', marker)
+        self._call(driver.get, url)
+        deadline = time.monotonic() + self.page_load_timeout
+        while True:
+            state = self._call(
+                driver.execute_script,
+                'return window.__contextTabNavigation === arguments[0] ? "old" : document.readyState;',
+                marker
+            )
+            if state in ('interactive', 'complete'):
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutException(f"Timed out after {self.page_load_timeout}s loading {url}")
+            time.sleep(self.POLL_INTERVAL)
+
+    def set_page_load_timeout(self, seconds):
+        self.page_load_timeout = seconds
+
+    def implicitly_wait(self, seconds):
+        self.implicit_wait = seconds
+
+    def find_element(self, *args, **kwargs):
+        return self._find(self._browser.driver, 'find_element', *args, **kwargs)
+
+    def find_elements(self, *args, **kwargs):
+        return self._find(self._browser.driver, 'find_elements', *args, **kwargs)
+
+    def _find(self, target, method, *args, **kwargs):
+        """find_element(s) with this tab's implicit wait, polling outside the lock"""
+        deadline = time.monotonic() + self.implicit_wait
+        while True:
+            try:
+                found = self._call(getattr(target, method), *args, **kwargs)
+            except NoSuchElementException:
+                if time.monotonic() >= deadline:
+                    raise
+            else:
+                if found or method == 'find_element' or time.monotonic() >= deadline:
+                    return found
+            time.sleep(self.POLL_INTERVAL)
+
+    def get_log(self, log_type):
+        """Only this tab's entries of the shared performance log"""
+        if log_type != 'performance':
+            return self._call(self._browser.driver.get_log, log_type)
+        with self._browser.lock:
+            return self._browser.performance_log(self.target_id)
+
+    def _wrap(self, value):
+        """Bind returned elements to this tab too"""
+        if isinstance(value, WebElement):
+            return TabElement(self, value)
+        if isinstance(value, list) and value and isinstance(value[0], WebElement):
+            return [TabElement(self, element) for element in value]
+        return value
+
+    def __getattr__(self, name):
+        value = self._call(getattr, self._browser.driver, name)
+        if callable(value):
+            return lambda *args, **kwargs: self._call(value, *args, **kwargs)
+        return value
+
+    def quit(self):
+        """Dispose of this context; the shared Chrome keeps running"""
+        self._browser.close_tab(self)
+
+    def close(self):
+        self.quit()
+
+
+class TabElement:
+    """WebElement stand-in that re-selects its tab before every call"""
+
+    def __init__(self, tab, element):
+        self._tab = tab
+        self._element = element
+
+    @property
+    def wrapped_element(self):
+        return self._element
+
+    def find_element(self, *args, **kwargs):
+        return self._tab._find(self._element, 'find_element', *args, **kwargs)
+
+    def find_elements(self, *args, **kwargs):
+        return self._tab._find(self._element, 'find_elements', *args, **kwargs)
+
+    def __getattr__(self, name):
+        value = self._tab._call(getattr, self._element, name)
+        if callable(value):
+            return lambda *args, **kwargs: self._tab._call(value, *args, **kwargs)
+        return value
@@ -0,0 +1,173 @@
+"""
+One-time discovery of the Chrome and chromedriver executables
+
+Probing install paths and asking webdriver-manager for a matching
+chromedriver (which may resolve versions over the network) used to happen
+on every driver launch. Discovery now runs once at startup, the result is
+stored in a small JSON manifest (BROWSER_MANIFEST, default
+browser_manifest.json) and every launch reuses it via
+Service(executable_path). The manifest is only refreshed when a cached path
+disappears or chromedriver refuses the installed Chrome's version (e.g.
+after a Chrome update); any other launch failure is raised as is, so a
+crashing Chrome does not trigger a webdriver-manager lookup per launch.
+A discovery that did not find both executables is never persisted and is
+retried after REDISCOVER_INCOMPLETE_AFTER seconds; meanwhile launches fall
+back to Selenium's own driver resolution.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException
+from selenium.webdriver.chrome.service import Service
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CHROME_PATHS = [
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+    r"C:\Users\{}\AppData\Local\Google\Chrome\Application\chrome.exe".format(os.getenv('USERNAME'))
+]
+
+CHROME_NAMES = ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome']
+
+MANIFEST_PATHS = ('chrome_binary', 'chromedriver')
+
+# Seconds before a discovery that missed Chrome or chromedriver is tried again
+REDISCOVER_INCOMPLETE_AFTER = 300
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def manifest_path():
+    """Location of the persisted manifest"""
+    return os.getenv('BROWSER_MANIFEST', 'browser_manifest.json')
+
+
+def find_chrome_binary():
+    """Path of the Chrome executable (CHROME_BINARY, known install paths, then PATH), or None"""
+    for path in [os.getenv('CHROME_BINARY')] + CHROME_PATHS:
+        if path and os.path.exists(path):
+            return path
+    for name in CHROME_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def find_chromedriver():
+    """Path of a chromedriver (CHROMEDRIVER_PATH, PATH, then webdriver-manager), or None"""
+    path = os.getenv('CHROMEDRIVER_PATH') or shutil.which('chromedriver')
+    if path and os.path.exists(path):
+        return path
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+        return ChromeDriverManager().install()
+    except Exception as e:
+        logger.warning(f"webdriver-manager could not resolve chromedriver: {str(e)}")
+        return None
+
+
+def discover():
+    """Probe for Chrome and chromedriver and persist the result"""
+    start = time.perf_counter()
+    manifest = {
+        'chrome_binary': find_chrome_binary(),
+        'chromedriver': find_chromedriver(),
+        'discovered_at': time.time()
+    }
+    metrics.observe('driver.discovery', time.perf_counter() - start)
+    if not complete(manifest):
+        logger.warning("Browser discovery did not find both Chrome and chromedriver; not saving the manifest")
+        return manifest
+    try:
+        with open(manifest_path(), 'w') as f:
+            json.dump(manifest, f, indent=2)
+    except OSError as e:
+        logger.warning(f"Could not write browser manifest: {str(e)}")
+    logger.info(f"Browser discovery: chrome={manifest['chrome_binary']} chromedriver={manifest['chromedriver']}")
+    return manifest
+
+
+def load_manifest():
+    """Read the persisted manifest if it names both executables and they still exist, else None"""
+    try:
+        with open(manifest_path()) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if paths_exist(manifest) else None
+
+
+def complete(manifest):
+    """True if the manifest names both Chrome and chromedriver"""
+    return all(manifest.get(key) for key in MANIFEST_PATHS)
+
+
+def paths_exist(manifest):
+    """True if the manifest names both executables and both are still on disk"""
+    return complete(manifest) and all(os.path.exists(manifest[key]) for key in MANIFEST_PATHS)
+
+
+def needs_rediscovery(manifest):
+    """A cached path disappeared, or an incomplete discovery is due for another try"""
+    if paths_exist(manifest):
+        return False
+    if complete(manifest):
+        return True
+    return time.time() - manifest.get('discovered_at', 0) > REDISCOVER_INCOMPLETE_AFTER
+
+
+def version_mismatch(error):
+    """True if chromedriver refused to start because it does not support the installed Chrome"""
+    return isinstance(error, SessionNotCreatedException) and 'only supports Chrome version' in str(error)
+
+
+def get_browser_manifest(refresh=False):
+    """Cached {'chrome_binary', 'chromedriver'} paths, discovered on first use"""
+    global _manifest
+    with _manifest_lock:
+        if refresh or _manifest is None:
+            _manifest = (not refresh and load_manifest()) or discover()
+        return _manifest
+
+
+def launch_chrome(chrome_options):
+    """
+    Start Chrome with the manifest's binary and chromedriver, timed as
+    'driver.launch'. If a cached path has disappeared (or is missing and
+    due for another look), or chromedriver does not support the installed
+    Chrome, rediscover once and retry.
+    """
+    manifest = get_browser_manifest()
+    if needs_rediscovery(manifest):
+        logger.warning("Cached Chrome/chromedriver path is missing, rediscovering")
+        manifest = get_browser_manifest(refresh=True)
+    for attempt in range(2):
+        if attempt > 0:
+            manifest = get_browser_manifest(refresh=True)
+        if manifest.get('chrome_binary'):
+            chrome_options.binary_location = manifest['chrome_binary']
+        start = time.perf_counter()
+        try:
+            if manifest.get('chromedriver'):
+                service = Service(executable_path=manifest['chromedriver'])
+                driver = webdriver.Chrome(service=service, options=chrome_options)
+            else:
+                driver = webdriver.Chrome(options=chrome_options)
+        except Exception as e:
+            if attempt > 0 or not version_mismatch(e):
+                raise
+            logger.warning(f"chromedriver does not match the installed Chrome, rediscovering: {str(e)}")
+            continue
+        metrics.observe('driver.launch', time.perf_counter() - start)
+        return driver
@@ -0,0 +1,125 @@
+"""
+Local corpus of CAPTCHA images and their confirmed answers
+
+When CAPTCHA_CORPUS_DIR is set, the scrapers save every CAPTCHA image they
+see together with the predicted answer, if the solver produced one. Once the
+court site accepts a submission the prediction is confirmed as the correct
+label. Rejected and unsolved samples stay unlabelled: they are exactly the
+hard cases, so 'python run.py label-captchas' lets a person type in their
+answers. The labelled corpus can then be replayed offline with
+'python benchmark.py captcha-solvers'.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+def guess_extension(image_bytes):
+    """Pick a file extension from the image magic bytes"""
+    if image_bytes.startswith(b'\x89PNG'):
+        return 'png'
+    if image_bytes.startswith(b'\xff\xd8'):
+        return 'jpg'
+    if image_bytes.startswith(b'GIF8'):
+        return 'gif'
+    return 'bin'
+
+
+class CaptchaCorpus:
+    """Append-only store of CAPTCHA images plus an index.jsonl of labels"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.jsonl')
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _append(self, entry):
+        """Append one index entry"""
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def record(self, image_bytes, predicted, solver=None):
+        """Save an image with its predicted answer (None if unsolved) and return the sample id"""
+        sample_id = hashlib.sha256(image_bytes).hexdigest()[:16]
+        filename = f"{sample_id}.{guess_extension(image_bytes)}"
+        path = os.path.join(self.directory, filename)
+        try:
+            if not os.path.exists(path):
+                with open(path, 'wb') as f:
+                    f.write(image_bytes)
+            self._append({
+                'id': sample_id,
+                'file': filename,
+                'predicted': predicted,
+                'solver': solver,
+                'recorded_at': datetime.now(timezone.utc).isoformat()
+            })
+        except OSError as e:
+            logger.warning(f"Could not record CAPTCHA sample: {str(e)}")
+            return None
+        return sample_id
+
+    def confirm(self, sample_id, answer):
+        """Mark a sample's answer as accepted by the court site"""
+        if sample_id:
+            self._append({'id': sample_id, 'answer': answer})
+
+    def reject(self, sample_id):
+        """Mark a sample's prediction as rejected by the court site"""
+        if sample_id:
+            self._append({'id': sample_id, 'rejected': True})
+
+    def label(self, sample_id, answer):
+        """Record a manually typed answer for a sample"""
+        if sample_id and answer:
+            self._append({'id': sample_id, 'answer': answer, 'labelled_by': 'manual'})
+
+    def unlabelled(self):
+        """Samples without an answer yet (rejected or unsolved), oldest first"""
+        samples = [sample for sample in self.load(labelled_only=False) if not sample.get('answer')]
+        return sorted(samples, key=lambda sample: sample.get('recorded_at') or '')
+
+    def load(self, labelled_only=True):
+        """Return samples as dicts (id, file, path, predicted, answer, rejected)"""
+        samples = {}
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                samples.setdefault(entry['id'], {}).update(entry)
+
+        result = []
+        for sample in samples.values():
+            if 'file' not in sample:
+                continue
+            if labelled_only and not sample.get('answer'):
+                continue
+            sample['path'] = os.path.join(self.directory, sample['file'])
+            result.append(sample)
+        return result
+
+
+_corpus = None
+
+
+def get_corpus():
+    """Return the corpus configured by CAPTCHA_CORPUS_DIR, or None when recording is off"""
+    global _corpus
+    directory = os.getenv('CAPTCHA_CORPUS_DIR')
+    if not directory:
+        return None
+    if _corpus is None or _corpus.directory != directory:
+        _corpus = CaptchaCorpus(directory)
+    return _corpus
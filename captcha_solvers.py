@@ -0,0 +1,91 @@
+"""
+CAPTCHA solver backends
+
+Every solver takes the raw CAPTCHA image bytes and returns the digits it read,
+or None. Solvers are registered by name so the scrapers can pick one through
+the CAPTCHA_SOLVER environment variable and the benchmark can replay a
+recorded corpus against all of them.
+"""
+
+import io
+import logging
+
+from PIL import Image, ImageEnhance, ImageFilter
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+if not TESSERACT_AVAILABLE:
+    logger.warning("Tesseract OCR not available. CAPTCHA solving will be limited.")
+
+DEFAULT_SOLVER = 'tesseract_fast'
+
+SOLVERS = {}
+
+
+def register_solver(name):
+    """Decorator registering a solver function under name"""
+    def decorator(func):
+        SOLVERS[name] = func
+        return func
+    return decorator
+
+
+def clean_result(text):
+    """Keep digits only and reject implausible lengths (CAPTCHAs are 3-8 digits)"""
+    digits = ''.join(filter(str.isdigit, text or ''))
+    if 3 <= len(digits) <= 8:
+        return digits
+    return None
+
+
+def solve(image_bytes, solver=DEFAULT_SOLVER):
+    """Run the named solver on image bytes"""
+    if solver not in SOLVERS:
+        logger.warning(f"Unknown CAPTCHA solver '{solver}', using {DEFAULT_SOLVER}")
+        solver = DEFAULT_SOLVER
+    return SOLVERS[solver](image_bytes)
+
+
+@register_solver('tesseract_fast')
+def solve_tesseract_fast(image_bytes):
+    """Grayscale, contrast x2.5, 2x upscale, single-line OCR (enhanced scraper pipeline)"""
+    if not TESSERACT_AVAILABLE:
+        return None
+    image = Image.open(io.BytesIO(image_bytes)).convert('L')
+    image = ImageEnhance.Contrast(image).enhance(2.5)
+    width, height = image.size
+    image = image.resize((width * 2, height * 2), Image.LANCZOS)
+    text = pytesseract.image_to_string(image, config='--psm 7 -c tessedit_char_whitelist=0123456789')
+    return clean_result(text)
+
+
+@register_solver('tesseract_denoise')
+def solve_tesseract_denoise(image_bytes):
+    """Grayscale, contrast x2, median filter, 3x upscale, single-word OCR (live scraper pipeline)"""
+    if not TESSERACT_AVAILABLE:
+        return None
+    image = Image.open(io.BytesIO(image_bytes)).convert('L')
+    image = ImageEnhance.Contrast(image).enhance(2.0)
+    image = image.filter(ImageFilter.MedianFilter(size=3))
+    width, height = image.size
+    image = image.resize((width * 3, height * 3), Image.LANCZOS)
+    text = pytesseract.image_to_string(image, config='--psm 8 -c tessedit_char_whitelist=0123456789')
+    return clean_result(text)
+
+
+@register_solver('tesseract_threshold')
+def solve_tesseract_threshold(image_bytes):
+    """Grayscale, 2x upscale, hard binarisation before OCR"""
+    if not TESSERACT_AVAILABLE:
+        return None
+    image = Image.open(io.BytesIO(image_bytes)).convert('L')
+    width, height = image.size
+    image = image.resize((width * 2, height * 2), Image.LANCZOS)
+    image = image.point(lambda pixel: 255 if pixel > 140 else 0)
+    text = pytesseract.image_to_string(image, config='--psm 7 -c tessedit_char_whitelist=0123456789')
+    return clean_result(text)
@@ -0,0 +1,298 @@
+"""
+CAPTCHA image acquisition helpers shared by the scrapers
+
+The court portal serves its CAPTCHA either as an inline data-URI or as an
+image URL bound to the visitor's session. Reading those bytes directly is
+much cheaper than asking Chrome to lay out and rasterize the element for a
+screenshot, and it also works for requests-only (browserless) flows.
+"""
+
+import base64
+import logging
+import re
+import time
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+from metrics import metrics
+from politeness import get_upstream, FORM
+
+logger = logging.getLogger(__name__)
+
+CAPTCHA_IMG_XPATH = "//img[contains(@src, 'captcha') or contains(@src, 'Captcha')]"
+
+DATA_URI_PATTERN = re.compile(r'^data:image/[\w.+-]+;base64,(.*)$', re.IGNORECASE | re.DOTALL)
+
+
+def decode_data_uri(src):
+    """Return raw image bytes from a base64 data-URI, or None"""
+    if not src:
+        return None
+    match = DATA_URI_PATTERN.match(src.strip())
+    if not match:
+        return None
+    try:
+        return base64.b64decode(match.group(1))
+    except Exception as e:
+        logger.warning(f"Invalid CAPTCHA data-URI: {str(e)}")
+        return None
+
+
+def copy_driver_cookies(driver, session):
+    """Copy the browser's cookies into a requests session"""
+    for cookie in driver.get_cookies():
+        session.cookies.set(
+            cookie['name'],
+            cookie['value'],
+            domain=cookie.get('domain'),
+            path=cookie.get('path', '/')
+        )
+
+
+def driver_session(driver, headers=None):
+    """
+    New requests session holding only this driver's cookies. Drivers run
+    concurrently, so their cookies never go into a session another search
+    (or the hybrid bootstrap) is using.
+    """
+    session = requests.Session()
+    if headers:
+        session.headers.update(headers)
+    copy_driver_cookies(driver, session)
+    return session
+
+
+def fetch_image_over_http(session, image_url, referer=None):
+    """Download CAPTCHA image bytes with the given session, or return None"""
+    headers = {'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8'}
+    if referer:
+        headers['Referer'] = referer
+
+    with get_upstream().slot(FORM) as slot:
+        response = slot.check(session.get(image_url, headers=headers, timeout=10))
+    response.raise_for_status()
+
+    content_type = response.headers.get('content-type', '').lower()
+    if not content_type.startswith('image/') or not response.content:
+        logger.warning(f"CAPTCHA URL did not return an image: {content_type}")
+        return None
+    return response.content
+
+
+def fetch_captcha_bytes(driver, captcha_element, headers=None):
+    """
+    Get the original CAPTCHA image bytes for an <img> element in the browser.
+
+    Order of preference: inline data-URI, HTTP fetch with the browser's
+    cookies (in a session of its own, sending headers), and finally an
+    element screenshot. Note that fetching the image URL makes the server
+    issue a fresh code for the session, so the bytes returned here are the
+    ones the next submission is checked against.
+    """
+    src = captcha_element.get_attribute('src')
+
+    with metrics.timer('captcha.acquire.data_uri'):
+        image_bytes = decode_data_uri(src)
+    if image_bytes:
+        metrics.incr('captcha.acquire.data_uri')
+        return image_bytes
+
+    if src:
+        try:
+            with metrics.timer('captcha.acquire.http'), driver_session(driver, headers) as session:
+                image_url = urljoin(driver.current_url, src)
+                image_bytes = fetch_image_over_http(session, image_url, referer=driver.current_url)
+            if image_bytes:
+                metrics.incr('captcha.acquire.http')
+                return image_bytes
+        except Exception as e:
+            logger.warning(f"CAPTCHA HTTP fetch failed, falling back to screenshot: {str(e)}")
+
+    with metrics.timer('captcha.acquire.screenshot'):
+        image_bytes = captcha_element.screenshot_as_png
+    metrics.incr('captcha.acquire.screenshot')
+    return image_bytes
+
+
+def find_captcha_src(page_html):
+    """Return the CAPTCHA <img> src from page HTML, or None"""
+    soup = BeautifulSoup(page_html, 'html.parser')
+    for img in soup.find_all('img'):
+        src = img.get('src', '')
+        if 'captcha' in src.lower() or 'captcha' in (img.get('id') or '').lower():
+            return src
+    return None
+
+
+def fetch_captcha_bytes_http(session, page_html, page_url):
+    """Browserless variant: get CAPTCHA bytes from fetched page HTML and the session"""
+    src = find_captcha_src(page_html)
+    if not src:
+        return None
+
+    image_bytes = decode_data_uri(src)
+    if image_bytes:
+        metrics.incr('captcha.acquire.data_uri')
+        return image_bytes
+
+    try:
+        with metrics.timer('captcha.acquire.http'):
+            image_bytes = fetch_image_over_http(session, urljoin(page_url, src), referer=page_url)
+        if image_bytes:
+            metrics.incr('captcha.acquire.http')
+        return image_bytes
+    except Exception as e:
+        logger.warning(f"CAPTCHA HTTP fetch failed: {str(e)}")
+        return None
+
+
+CAPTCHA_REFRESH_SELECTORS = [
+    "a[onclick*='captcha']",
+    "a[onclick*='Captcha']",
+    "button[onclick*='captcha']",
+    "[id*='refresh'][id*='aptcha']",
+    "[class*='refresh'][class*='aptcha']",
+    "img[alt*='efresh']",
+    "a[title*='efresh']",
+    "[id*='refresh']"
+]
+
+CAPTCHA_TEXT_SELECTORS = [
+    "span[id*='captcha']",
+    "div[id*='captcha']",
+    "label[for*='captcha']",
+    "span.captcha",
+    "div.captcha-text"
+]
+
+CAPTCHA_REJECTED_PHRASES = [
+    'invalid captcha',
+    'incorrect captcha',
+    'wrong captcha',
+    'captcha mismatch',
+    'captcha does not match',
+    'captcha not matched'
+]
+
+
+def captcha_rejected(page_source):
+    """Return True if the page says the submitted CAPTCHA was wrong"""
+    page_lower = page_source.lower()
+    return any(phrase in page_lower for phrase in CAPTCHA_REJECTED_PHRASES)
+
+
+# True once the document has loaded and no jQuery request is in flight
+PAGE_SETTLED_JS = "document.readyState === 'complete' && (!window.jQuery || window.jQuery.active === 0)"
+
+
+def wait_for_answer(page_source, settled, page_before, timeout=20, poll=0.25):
+    """
+    Wait until the portal has answered a form submission: the page differs
+    from page_before (a new document or an AJAX update) and has settled.
+    page_source() and settled() read the browser. Returns False on timeout.
+    """
+    expires_at = time.monotonic() + timeout
+    while time.monotonic() < expires_at:
+        try:
+            if settled() and page_source() != page_before:
+                return True
+        except Exception:
+            # The old document is being replaced
+            pass
+        time.sleep(poll)
+    return False
+
+
+def wait_for_driver_answer(driver, page_before, timeout=20):
+    """wait_for_answer() on a Selenium WebDriver"""
+    return wait_for_answer(
+        lambda: driver.page_source,
+        lambda: driver.execute_script(f'return {PAGE_SETTLED_JS};'),
+        page_before,
+        timeout
+    )
+
+
+def _captcha_fingerprint(driver):
+    """Return (img src, img load state, text captcha) for change detection"""
+    src = None
+    loaded = None
+    text = None
+    images = driver.find_elements(By.XPATH, CAPTCHA_IMG_XPATH)
+    if images:
+        src = images[0].get_attribute('src')
+        loaded = driver.execute_script(
+            "return arguments[0].complete && arguments[0].naturalWidth > 0;", images[0]
+        )
+    for selector in CAPTCHA_TEXT_SELECTORS:
+        elements = driver.find_elements(By.CSS_SELECTOR, selector)
+        if elements and elements[0].text.strip():
+            text = elements[0].text.strip()
+            break
+    return src, loaded, text
+
+
+def refresh_captcha_in_place(driver, timeout=5):
+    """
+    Reload only the CAPTCHA widget, keeping the rest of the form as filled.
+
+    Clicks the page's own refresh control when there is one, otherwise
+    re-requests the image URL with a cache buster. Returns False when no
+    in-place refresh is possible, so the caller can reload the whole page.
+    """
+    try:
+        before = _captcha_fingerprint(driver)
+
+        refreshed = False
+        for selector in CAPTCHA_REFRESH_SELECTORS:
+            controls = [el for el in driver.find_elements(By.CSS_SELECTOR, selector) if el.is_displayed()]
+            if controls:
+                controls[0].click()
+                refreshed = True
+                logger.info(f"Clicked CAPTCHA refresh control: {selector}")
+                break
+
+        if not refreshed:
+            images = driver.find_elements(By.XPATH, CAPTCHA_IMG_XPATH)
+            src = images[0].get_attribute('src') if images else None
+            if not src or src.startswith('data:'):
+                return False
+            separator = '&' if '?' in src else '?'
+            driver.execute_script(
+                "arguments[0].src = arguments[1];",
+                images[0],
+                f"{src}{separator}_={int(time.time() * 1000)}"
+            )
+            logger.info("Reloaded CAPTCHA image URL in place")
+
+        # Wait until the widget shows a new, fully loaded CAPTCHA
+        def captcha_changed(d):
+            after = _captcha_fingerprint(d)
+            return after != before and after[1] is not False
+
+        WebDriverWait(driver, timeout).until(captcha_changed)
+        return True
+
+    except TimeoutException:
+        logger.warning("CAPTCHA did not change after in-place refresh")
+        return False
+    except Exception as e:
+        logger.warning(f"In-place CAPTCHA refresh failed: {str(e)}")
+        return False
+
+
+def form_state_intact(driver, case_type, case_number, filing_year):
+    """Return True if the search form still holds the values we filled in"""
+    try:
+        return (
+            driver.find_element(By.ID, "case_type").get_attribute('value') == case_type and
+            driver.find_element(By.ID, "case_number").get_attribute('value') == case_number and
+            driver.find_element(By.ID, "case_year").get_attribute('value') == filing_year
+        )
+    except Exception:
+        return False
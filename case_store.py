@@ -0,0 +1,219 @@
+"""
+Storage of scraped case results, one row per case key
+
+A search used to insert a fresh CaseData row with the full results HTML
+every time, so a popular case left thousands of near-identical rows behind.
+Results are now upserted on the natural key (case_type, case_number,
+filing_year): the content columns are only rewritten when the hash of the
+parsed cases changes, otherwise just checked_at is bumped. CaseQuery keeps
+a reference (case_data_id) to the row its search resolved to, and every
+content change is added to the row's snapshot history (snapshots.py). The
+results HTML itself is stored compressed in raw_pages (raw_pages.py).
+"""
+
+import base64
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from metrics import metrics
+from models import db, CaseQuery, CaseData, Party, Order
+from raw_pages import store_page, release_page
+from snapshots import record_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(case_data):
+    """Stable hash of the parsed cases (the raw HTML carries per-request tokens)"""
+    cases = case_data.get('cases', [])
+    return hashlib.sha256(json.dumps(cases, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def find_case(case_type, case_number, filing_year):
+    """The stored record for a case key, or None"""
+    # CaseData.query is the backref to CaseQuery, so go through the session
+    return db.session.query(CaseData).filter_by(
+        case_type=case_type, case_number=case_number, filing_year=filing_year
+    ).first()
+
+
+def case_status(case_data):
+    """Status column value for a search result"""
+    if case_data.get('total_cases', 0) > 1:
+        return 'Multiple Cases'
+    return (case_data.get('cases') or [{}])[0].get('status', 'Unknown')
+
+
+def parse_order_date(text):
+    """date for '15/03/2023' (or 15-03-2023, 2023-03-15); None for anything else"""
+    for fmt in ('%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime((text or '').strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _sync_rows(rows, items, make, update):
+    """Update rows in place by position, append new ones, drop the rest (positions stay unique mid-flush)"""
+    for position, item in enumerate(items):
+        if position < len(rows):
+            update(rows[position], item)
+        else:
+            row = make(position)
+            update(row, item)
+            rows.append(row)
+    del rows[len(items):]
+
+
+def _update_party(party, item):
+    party.party_type = item.get('type')
+    party.name = item.get('name')
+
+
+def _update_order(order, item):
+    order.date_text = item.get('date')
+    order.order_date = parse_order_date(item.get('date'))
+    order.description = item.get('description')
+    order.pdf_link = item.get('pdf_link')
+
+
+def set_parties(record, parties):
+    """Replace a record's parties with a list of {'type', 'name'} dicts"""
+    _sync_rows(record.parties, parties or [], lambda position: Party(position=position), _update_party)
+
+
+def set_orders(record, orders):
+    """Replace a record's orders with a list of {'date', 'description', 'pdf_link'} dicts"""
+    _sync_rows(record.orders, orders or [], lambda position: Order(position=position), _update_order)
+
+
+def find_order(case_data_id, position):
+    """One order of a case by its index on the case page (uq_case_orders_position), or None"""
+    return db.session.query(Order).filter_by(case_data_id=case_data_id, position=position).first()
+
+
+def find_orders(case_data_id, on_date=None):
+    """Orders of a case, optionally only those dated on_date (ix_case_orders_date)"""
+    orders = db.session.query(Order).filter_by(case_data_id=case_data_id)
+    if on_date is not None:
+        orders = orders.filter(Order.order_date == on_date)
+    return orders.order_by(Order.position).all()
+
+
+def _store(query, case_data, new_hash, now, log_query):
+    """One attempt of upsert_case(), flushed but not committed"""
+    if log_query:
+        db.session.add(query)
+        db.session.flush()
+    record = find_case(query.case_type, query.case_number, query.filing_year)
+    if record is None:
+        if not log_query:
+            # A new record must point at a query, so this one is written after all
+            db.session.add(query)
+            db.session.flush()
+            log_query = True
+        record = CaseData(
+            query_id=query.id,
+            case_type=query.case_type,
+            case_number=query.case_number,
+            filing_year=query.filing_year,
+            filing_date=None,
+            next_hearing_date=None,
+            created_at=now
+        )
+        db.session.add(record)
+        changed = True
+    else:
+        changed = record.content_hash != new_hash
+
+    record.checked_at = now
+    if changed:
+        if log_query:
+            record.query_id = query.id
+        previous_page = record.raw_page_hash
+        record.raw_page_hash = store_page(case_data.get('raw_html') or '')
+        record.status = case_status(case_data)
+        record.content_hash = new_hash
+        record.updated_at = now
+        if 'parties' in case_data:
+            set_parties(record, case_data['parties'])
+        if 'orders_judgments' in case_data:
+            set_orders(record, case_data['orders_judgments'])
+    db.session.flush()
+    query.case_data_id = record.id
+    if changed:
+        if previous_page != record.raw_page_hash:
+            release_page(previous_page)
+        record_snapshot(record, case_data)
+    return record, changed
+
+
+def upsert_case(query, case_data, log_query=True):
+    """
+    Store a successful search result for query's case key. query may be
+    new: it is written in the same transaction as the result, so a search
+    costs one commit. With log_query=False (background refreshes) query
+    only supplies the case key and is not written, unless the record does
+    not exist yet. Returns (record, changed).
+    """
+    now = datetime.now(timezone.utc)
+    new_hash = content_hash(case_data)
+    for attempt in range(2):
+        try:
+            record, changed = _store(query, case_data, new_hash, now, log_query)
+            db.session.commit()
+            break
+        except IntegrityError:
+            # A concurrent search inserted the same key (or page) first; update that row instead
+            db.session.rollback()
+            if attempt:
+                raise
+
+    metrics.incr('case_store.updated' if changed else 'case_store.unchanged')
+    logger.info(f"💾 {'Stored' if changed else 'Unchanged'} {query.case_type} {query.case_number}/{query.filing_year} (record {record.id})")
+    return record, changed
+
+
+def encode_cursor(query):
+    """Opaque cursor pointing just past query in (timestamp, id) order"""
+    return base64.urlsafe_b64encode(f'{query.timestamp.isoformat()}|{query.id}'.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) from encode_cursor(); ValueError if it is not one"""
+    try:
+        timestamp, query_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(timestamp), int(query_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def history_page(cursor=None, case_type=None, filing_year=None, limit=50):
+    """
+    One page of search history, newest first, with each query's stored
+    record loaded in the same SELECT. Pages are keyset-paginated on
+    (timestamp, id) so a deep page costs the same as the first one.
+    Returns (queries, next_cursor); next_cursor is None on the last page.
+    """
+    queries = db.session.query(CaseQuery).options(joinedload(CaseQuery.case_record))
+    if case_type:
+        queries = queries.filter(CaseQuery.case_type == case_type)
+    if filing_year:
+        queries = queries.filter(CaseQuery.filing_year == filing_year)
+    if cursor:
+        timestamp, query_id = decode_cursor(cursor)
+        queries = queries.filter(or_(
+            CaseQuery.timestamp < timestamp,
+            and_(CaseQuery.timestamp == timestamp, CaseQuery.id < query_id)
+        ))
+    # One extra row tells whether there is a next page
+    rows = queries.order_by(CaseQuery.timestamp.desc(), CaseQuery.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -0,0 +1,275 @@
+"""
+Persistent Chrome profiles with a warm HTTP disk cache
+
+By default every driver launch gets a fresh temporary profile, so Chrome
+re-downloads the court site's CSS, JS and fonts each time. When
+CHROME_PROFILE_DIR is set, drivers instead use one of a fixed set of
+profile slots under that directory. A lock file makes sure two live drivers
+never share a profile. Once a driver is running the lock records its
+chromedriver pid, so a driver that crashes without quit() frees its slot;
+a lock only counts as stale once that process has exited. Caches are trimmed least-recently-used first to keep
+the total size within CHROME_PROFILE_MAX_MB, in the background and at most
+once per CHROME_PROFILE_TRIM_INTERVAL seconds.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Cache directories that can be deleted without losing cookies or settings
+CACHE_SUBDIRS = [
+    os.path.join('Default', 'Cache'),
+    os.path.join('Default', 'Code Cache'),
+    os.path.join('Default', 'GPUCache'),
+    os.path.join('Default', 'Service Worker', 'CacheStorage'),
+    'ShaderCache',
+    'GrShaderCache'
+]
+
+
+def dir_size(path):
+    """Total size in bytes of all files under path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def pid_alive(pid):
+    """Best-effort check whether a process id is still running"""
+    if PSUTIL_AVAILABLE:
+        return psutil.pid_exists(pid)
+    if os.name == 'nt':
+        # os.kill(pid, 0) would terminate the process on Windows; assume it is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ChromeProfile:
+    """A locked profile slot handed to one driver"""
+
+    def __init__(self, slot, path, warm):
+        self.slot = slot
+        self.path = path
+        self.warm = warm
+
+
+class ProfileManager:
+    """Hands out per-slot --user-data-dir profiles and bounds their disk usage"""
+
+    def __init__(self, base_dir, slots=8, max_total_mb=1024, cache_size_mb=100, trim_interval=300):
+        self.base_dir = base_dir
+        self.slots = slots
+        self.max_total_bytes = max_total_mb * 1024 * 1024
+        self.cache_size_bytes = cache_size_mb * 1024 * 1024
+        self.trim_interval = trim_interval
+        self._lock = threading.Lock()
+        self._last_trim = 0
+        self._trimming = False
+        os.makedirs(base_dir, exist_ok=True)
+
+    def profile_path(self, slot):
+        """Directory of a profile slot"""
+        return os.path.join(self.base_dir, f'slot-{slot}')
+
+    def lock_path(self, slot):
+        """Lock file of a profile slot (kept outside the profile itself)"""
+        return os.path.join(self.base_dir, f'slot-{slot}.lock')
+
+    def _lock_is_stale(self, lock_path):
+        """True if the process holding a lock is gone; a long-lived driver keeps its lock"""
+        try:
+            with open(lock_path) as f:
+                pid = int(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            return True
+        return not pid_alive(pid)
+
+    def _write_lock(self, lock_path, pid, flags):
+        fd = os.open(lock_path, flags)
+        with os.fdopen(fd, 'w') as f:
+            f.write(f"{pid} {time.time()}")
+
+    def _try_lock(self, slot):
+        """Atomically create the slot's lock file; returns True if we got it"""
+        lock_path = self.lock_path(slot)
+        for _ in range(2):
+            try:
+                # Our pid until the driver is up (see bind_to_driver)
+                self._write_lock(lock_path, os.getpid(), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                return True
+            except FileExistsError:
+                if not self._lock_is_stale(lock_path):
+                    return False
+                logger.info(f"Removing stale Chrome profile lock: {lock_path}")
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    return False
+        return False
+
+    def acquire(self):
+        """Lock a free profile slot, preferring warm ones; None if all are in use"""
+        with self._lock:
+            order = sorted(range(self.slots), key=lambda slot: not os.path.isdir(self.profile_path(slot)))
+            for slot in order:
+                if self._try_lock(slot):
+                    path = self.profile_path(slot)
+                    warm = os.path.isdir(os.path.join(path, 'Default'))
+                    os.makedirs(path, exist_ok=True)
+                    metrics.incr('chrome_profile.warm' if warm else 'chrome_profile.cold')
+                    return ChromeProfile(slot, path, warm)
+        logger.warning("All Chrome profile slots are busy, using a temporary profile")
+        return None
+
+    def release(self, profile):
+        """Unlock a profile slot and schedule a cache trim"""
+        try:
+            os.remove(self.lock_path(profile.slot))
+        except OSError:
+            pass
+        self.schedule_trim()
+
+    def schedule_trim(self):
+        """Run enforce_budget() in the background, at most once per trim_interval"""
+        with self._lock:
+            if self._trimming or time.time() - self._last_trim < self.trim_interval:
+                return
+            self._trimming = True
+            self._last_trim = time.time()
+        threading.Thread(target=self._trim, name='chrome-profile-trim', daemon=True).start()
+
+    def _trim(self):
+        try:
+            self.enforce_budget()
+        except Exception as e:
+            logger.warning(f"Chrome profile cache trim failed: {str(e)}")
+        finally:
+            self._trimming = False
+
+    def bind_to_driver(self, driver, profile):
+        """Hand the slot's lock to the driver's chromedriver process and release it when the driver quits"""
+        driver.chrome_profile = profile
+        try:
+            self._write_lock(self.lock_path(profile.slot), driver.service.process.pid,
+                             os.O_CREAT | os.O_TRUNC | os.O_WRONLY)
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Could not record the driver pid for Chrome profile slot {profile.slot}: {str(e)}")
+        original_quit = driver.quit
+
+        def quit_and_release():
+            try:
+                original_quit()
+            finally:
+                self.release(profile)
+
+        driver.quit = quit_and_release
+
+    def apply_options(self, chrome_options, profile):
+        """Point Chrome at the profile directory and size its disk cache"""
+        chrome_options.add_argument(f'--user-data-dir={os.path.abspath(profile.path)}')
+        chrome_options.add_argument(f'--disk-cache-size={self.cache_size_bytes}')
+
+    def enforce_budget(self):
+        """Delete caches of unlocked profiles, least recently used first, until under budget"""
+        # Sizes are measured without self._lock, so acquire() isn't held up by the disk scan
+        profiles = []
+        total = 0
+        for slot in range(self.slots):
+            path = self.profile_path(slot)
+            if not os.path.isdir(path):
+                continue
+            total += dir_size(path)
+            if not os.path.exists(self.lock_path(slot)):
+                profiles.append((os.path.getmtime(path), slot, path))
+
+        if total <= self.max_total_bytes:
+            return
+
+        for _, slot, path in sorted(profiles):
+            # Lock the slot while trimming it, so it isn't handed to a driver halfway through
+            with self._lock:
+                locked = self._try_lock(slot)
+            if not locked:
+                continue
+            try:
+                before = dir_size(path)
+                for subdir in CACHE_SUBDIRS:
+                    shutil.rmtree(os.path.join(path, subdir), ignore_errors=True)
+                freed = before - dir_size(path)
+            finally:
+                try:
+                    os.remove(self.lock_path(slot))
+                except OSError:
+                    pass
+            total -= freed
+            logger.info(f"Trimmed Chrome profile slot {slot} cache ({freed / 1048576:.1f} MB)")
+            if total <= self.max_total_bytes:
+                break
+
+    def stats(self):
+        """Disk usage and lock state per slot"""
+        result = []
+        for slot in range(self.slots):
+            path = self.profile_path(slot)
+            if os.path.isdir(path):
+                result.append({
+                    'slot': slot,
+                    'size_mb': round(dir_size(path) / 1048576, 1),
+                    'locked': os.path.exists(self.lock_path(slot))
+                })
+        return result
+
+
+def record_first_page_load(driver, seconds):
+    """Record a driver's first page load as a temp-, cold- or warm-profile timing"""
+    if getattr(driver, 'first_load_recorded', False):
+        return
+    driver.first_load_recorded = True
+    profile = getattr(driver, 'chrome_profile', None)
+    if profile is None:
+        metrics.observe('page_load.temp_profile', seconds)
+    else:
+        metrics.observe('page_load.warm_profile' if profile.warm else 'page_load.cold_profile', seconds)
+
+
+_manager = None
+
+
+def get_profile_manager():
+    """Return the manager configured by CHROME_PROFILE_DIR, or None to use temporary profiles"""
+    global _manager
+    base_dir = os.getenv('CHROME_PROFILE_DIR')
+    if not base_dir:
+        return None
+    if _manager is None:
+        _manager = ProfileManager(
+            base_dir,
+            slots=int(os.getenv('CHROME_PROFILE_SLOTS', '8')),
+            max_total_mb=int(os.getenv('CHROME_PROFILE_MAX_MB', '1024')),
+            cache_size_mb=int(os.getenv('CHROME_DISK_CACHE_MB', '100')),
+            trim_interval=int(os.getenv('CHROME_PROFILE_TRIM_INTERVAL', '300'))
+        )
+    return _manager
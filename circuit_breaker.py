@@ -0,0 +1,130 @@
+"""
+Circuit breaker around the court portal
+
+When delhihighcourt.nic.in is down, every search would still spend its full
+retry budget in a browser before failing. The breaker watches the outcome of
+recent searches; once the failure rate over the last `window` seconds
+reaches `failure_rate` (with at least `min_requests` outcomes) it opens and
+searches are answered straight away, from the last stored result where one
+exists. After `open_seconds` it lets a single probe search through
+(half-open): success closes the circuit, failure opens it again. A call
+that never reached the upstream (cancelled, or refused by admission) is
+given back with release(), so a probe that goes nowhere doesn't hold the
+circuit half-open.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker with half-open probing"""
+
+    def __init__(self, name, failure_rate=0.5, min_requests=5, window=120, open_seconds=60):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = None
+        self.probe_started_at = None
+        self._outcomes = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def allow(self):
+        """True if a call may go to the upstream now (closed, or the half-open probe)"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now - self.opened_at < self.open_seconds:
+                metrics.incr(f'circuit.{self.name}.short_circuited')
+                return False
+            # Half-open: one probe at a time; a probe that never reported back is replaced
+            if self.probe_started_at is not None and now - self.probe_started_at < self.open_seconds:
+                metrics.incr(f'circuit.{self.name}.short_circuited')
+                return False
+            self.state = HALF_OPEN
+            self.probe_started_at = now
+            logger.info(f"🔌 Circuit {self.name} half-open, probing the upstream")
+            return True
+
+    def record(self, ok):
+        """Report the outcome of a call that allow() let through"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self.probe_started_at = None
+                if ok:
+                    self._close()
+                else:
+                    self._open(now)
+                return
+            self._outcomes.append((now, ok))
+            self._trim(now)
+            failures = sum(1 for _, outcome_ok in self._outcomes if not outcome_ok)
+            if (self.state == CLOSED and len(self._outcomes) >= self.min_requests and
+                    failures / len(self._outcomes) >= self.failure_rate):
+                self._open(now)
+
+    def release(self):
+        """Give back a call allow() let through that never reached the upstream"""
+        with self._lock:
+            if self.state == HALF_OPEN and self.probe_started_at is not None:
+                # Neutral outcome: the next caller probes instead
+                self.probe_started_at = None
+                metrics.incr(f'circuit.{self.name}.probe_released')
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        metrics.incr(f'circuit.{self.name}.opened')
+        logger.warning(f"🔌 Circuit {self.name} open for {self.open_seconds}s")
+
+    def _close(self):
+        self.state = CLOSED
+        self.opened_at = None
+        self._outcomes.clear()
+        metrics.incr(f'circuit.{self.name}.closed')
+        logger.info(f"🔌 Circuit {self.name} closed, upstream recovered")
+
+    def retry_after(self):
+        """Seconds until the next probe is allowed (0 when closed)"""
+        with self._lock:
+            if self.state == CLOSED or self.opened_at is None:
+                return 0
+            if self.state == HALF_OPEN:
+                if self.probe_started_at is None:
+                    return 0
+                # A probe is running; it is replaced if it hasn't reported back by then
+                started = self.probe_started_at
+            else:
+                started = self.opened_at
+            return max(0, int(self.open_seconds - (time.monotonic() - started)) + 1)
+
+    def stats(self):
+        """State and recent outcomes for /debug/metrics"""
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                'state': self.state,
+                'recent_calls': len(self._outcomes),
+                'recent_failures': sum(1 for _, ok in self._outcomes if not ok),
+                'failure_rate': self.failure_rate,
+                'open_seconds': self.open_seconds
+            }
@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
 
+from db_engine import engine_options
+
 load_dotenv()
 
 class Config:
@@ -14,6 +16,8 @@ class Config:
         DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
     
     SQLALCHEMY_DATABASE_URI = DATABASE_URL or 'sqlite:///court_data.db'
+    # Pool sizing for Postgres; SQLite connections get WAL/synchronous/busy_timeout pragmas (db_engine.py)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     
     # Court scraper settings
     COURT_NAME = "Delhi High Court"
@@ -46,6 +50,7 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     WTF_CSRF_ENABLED = False
 
 # Configuration dictionary
@@ -0,0 +1,57 @@
+"""
+Per-backend database engine settings
+
+SQLite: every connection gets journal_mode, synchronous and busy_timeout
+pragmas (default WAL, NORMAL, 5000 ms). With WAL, readers no longer block
+the writer and commits don't rewrite a rollback journal; synchronous=NORMAL
+is safe in WAL mode (a power loss can only drop the last commits, never
+corrupt the file); busy_timeout makes a writer wait for the lock instead of
+failing with "database is locked".
+
+Postgres: an explicitly sized pool (DB_POOL_SIZE + DB_MAX_OVERFLOW), with
+pre-ping so connections the server dropped are replaced before use, and
+recycling after DB_POOL_RECYCLE seconds.
+"""
+
+import logging
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+def engine_options(database_uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URI"""
+    if database_uri.startswith('sqlite'):
+        # Pragmas are set per connection by _sqlite_pragmas()
+        return {}
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': True
+    }
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the SQLITE_* pragmas to each new SQLite connection"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}")
+        journal_mode = os.getenv('SQLITE_JOURNAL_MODE', 'WAL').upper()
+        if journal_mode in ('WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY'):
+            cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+        synchronous = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+        if synchronous in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            cursor.execute(f'PRAGMA synchronous = {synchronous}')
+    except sqlite3.Error as e:
+        logger.warning(f"Could not apply SQLite pragmas: {str(e)}")
+    finally:
+        cursor.close()
@@ -0,0 +1,69 @@
+"""
+Time budgets and cancellation for scraper calls
+
+A Deadline is passed down through a search so every stage (navigation,
+CAPTCHA retries, result wait, parsing) can size its waits to the time that
+is left and stop retrying once the budget is spent. checkpoint() also
+reports the stage the search has reached, which background jobs show to the
+user while they poll, and is where work stops early once nobody is waiting
+for the result any more.
+"""
+
+import time
+
+
+class DeadlineExceeded(Exception):
+    """The time budget ran out before the work finished"""
+
+
+class Cancelled(Exception):
+    """The work was cancelled or its client went away"""
+
+
+class Deadline:
+    """Absolute time budget with stage checkpoints"""
+
+    def __init__(self, seconds=None, on_stage=None, should_cancel=None):
+        # seconds=None means no budget; on_stage(stage) is called at every checkpoint;
+        # should_cancel() -> True stops the work at the next checkpoint
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + seconds if seconds is not None else None
+        self.on_stage = on_stage
+        self.should_cancel = should_cancel
+        self.stage = None
+
+    def remaining(self):
+        """Seconds left (infinity without a budget, never negative)"""
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        """True once the budget is spent"""
+        return self.remaining() <= 0
+
+    def elapsed(self):
+        """Seconds since the deadline was created"""
+        return time.monotonic() - self.started_at
+
+    def timeout(self, default, minimum=1):
+        """A wait timeout of at most default seconds that does not overrun the budget"""
+        return max(minimum, min(default, self.remaining()))
+
+    def sleep(self, seconds):
+        """Sleep, but not past the deadline"""
+        time.sleep(min(seconds, self.remaining()))
+
+    def cancelled(self):
+        """True once the caller no longer wants the result"""
+        return bool(self.should_cancel and self.should_cancel())
+
+    def checkpoint(self, stage):
+        """Record the stage reached; raise Cancelled or DeadlineExceeded to stop the work"""
+        self.stage = stage
+        if self.on_stage:
+            self.on_stage(stage)
+        if self.cancelled():
+            raise Cancelled(f"Cancelled at stage '{stage}' after {self.elapsed():.1f}s")
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline exceeded at stage '{stage}' after {self.elapsed():.1f}s")
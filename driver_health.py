@@ -0,0 +1,165 @@
+"""
+Per-driver resource accounting and recycling policy
+
+Every Chrome driver the scrapers start is registered here with its start
+time, pages loaded, errors seen and the resident memory of its chromedriver
+and Chrome process tree. Long-lived drivers are recycled as soon as any
+limit of the RecyclePolicy is crossed instead of only on age, and
+/admin/drivers lists what is currently running.
+
+Tabs of the shared browser are registered too, for their age, pages and
+errors; their memory belongs to the shared Chrome, which is registered
+(and measured) as a driver of its own.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from metrics import metrics
+from process_stats import PSUTIL_AVAILABLE, driver_rss
+
+logger = logging.getLogger(__name__)
+
+
+class RecyclePolicy:
+    """Limits after which a driver is replaced (None disables a limit)"""
+
+    def __init__(self, max_age=300, max_rss_mb=1024, max_pages=50, max_errors=3):
+        self.max_age = max_age
+        self.max_rss_mb = max_rss_mb
+        self.max_pages = max_pages
+        self.max_errors = max_errors
+
+    @classmethod
+    def from_env(cls):
+        """Build the policy from DRIVER_MAX_AGE, DRIVER_MAX_RSS_MB, DRIVER_MAX_PAGES and DRIVER_MAX_ERRORS"""
+        return cls(
+            max_age=int(os.getenv('DRIVER_MAX_AGE', '300')),
+            max_rss_mb=int(os.getenv('DRIVER_MAX_RSS_MB', '1024')),
+            max_pages=int(os.getenv('DRIVER_MAX_PAGES', '50')),
+            max_errors=int(os.getenv('DRIVER_MAX_ERRORS', '3'))
+        )
+
+
+def warn_if_rss_unmeasurable():
+    """Log at startup when DRIVER_MAX_RSS_MB is set but memory cannot be measured"""
+    if os.getenv('DRIVER_MAX_RSS_MB') and not PSUTIL_AVAILABLE:
+        logger.warning("DRIVER_MAX_RSS_MB is set but psutil is not installed; drivers will not be recycled on memory")
+
+
+class DriverStats:
+    """Resource use of one live driver"""
+
+    def __init__(self, driver_id, owner, measure_rss=True):
+        self.driver_id = driver_id
+        self.owner = owner
+        self.measure_rss = measure_rss
+        self.started_at = time.time()
+        self.pages = 0
+        self.errors = 0
+        self.rss_bytes = None
+
+    def uptime(self):
+        """Seconds since the driver was started"""
+        return time.time() - self.started_at
+
+    def to_dict(self):
+        """Describe the driver for the admin endpoint"""
+        return {
+            'driver_id': self.driver_id,
+            'owner': self.owner,
+            'uptime_seconds': round(self.uptime(), 1),
+            'pages': self.pages,
+            'errors': self.errors,
+            'rss_mb': round(self.rss_bytes / 1048576, 1) if self.rss_bytes is not None else None
+        }
+
+
+class DriverRegistry:
+    """Tracks every live driver and decides when one should be recycled"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._drivers = {}
+        self._next_id = 1
+
+    def register(self, driver, owner, measure_rss=True):
+        """
+        Start tracking a driver; it is dropped automatically when it quits.
+        measure_rss=False for drivers that share another driver's processes.
+        """
+        with self._lock:
+            stats = DriverStats(self._next_id, owner, measure_rss)
+            self._next_id += 1
+            self._drivers[id(driver)] = (driver, stats)
+        driver.driver_stats = stats
+        original_quit = driver.quit
+
+        def quit_and_unregister():
+            try:
+                original_quit()
+            finally:
+                self.unregister(driver)
+
+        driver.quit = quit_and_unregister
+        metrics.incr('driver.started')
+        return stats
+
+    def unregister(self, driver):
+        """Stop tracking a driver"""
+        with self._lock:
+            self._drivers.pop(id(driver), None)
+
+    def stats_for(self, driver):
+        """DriverStats of a registered driver, or None"""
+        return getattr(driver, 'driver_stats', None)
+
+    def record_page(self, driver):
+        """Count one page load"""
+        stats = self.stats_for(driver)
+        if stats:
+            stats.pages += 1
+
+    def record_error(self, driver):
+        """Count one failed operation"""
+        stats = self.stats_for(driver)
+        if stats:
+            stats.errors += 1
+
+    def refresh_rss(self, driver):
+        """Re-read the resident memory of the driver's process tree"""
+        stats = self.stats_for(driver)
+        if stats and stats.measure_rss:
+            stats.rss_bytes = driver_rss(driver)
+        return stats
+
+    def recycle_reason(self, driver, policy):
+        """Name of the first policy limit the driver has crossed, or None"""
+        stats = self.refresh_rss(driver)
+        if not stats:
+            return None
+        if policy.max_age is not None and stats.uptime() > policy.max_age:
+            return f"age {stats.uptime():.0f}s > {policy.max_age}s"
+        if policy.max_rss_mb is not None and stats.rss_bytes and stats.rss_bytes > policy.max_rss_mb * 1048576:
+            return f"rss {stats.rss_bytes / 1048576:.0f}MB > {policy.max_rss_mb}MB"
+        if policy.max_pages is not None and stats.pages >= policy.max_pages:
+            return f"pages {stats.pages} >= {policy.max_pages}"
+        if policy.max_errors is not None and stats.errors >= policy.max_errors:
+            return f"errors {stats.errors} >= {policy.max_errors}"
+        return None
+
+    def snapshot(self):
+        """Current resource use of every live driver"""
+        with self._lock:
+            entries = list(self._drivers.values())
+        result = []
+        for driver, stats in entries:
+            if stats.measure_rss:
+                stats.rss_bytes = driver_rss(driver)
+            result.append(stats.to_dict())
+        return result
+
+
+driver_registry = DriverRegistry()
@@ -0,0 +1,216 @@
+"""
+Pool of pre-armed Chrome drivers
+
+Idle drivers are parked on the case status form with the CAPTCHA already
+solved, so an incoming search only has to fill three fields and submit.
+A background thread keeps the pool topped up and re-arms slots before
+their CAPTCHA or session can expire.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from contextlib import nullcontext
+
+from admission import AdmissionRejected
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class FormSlot:
+    """One pooled driver and its arming state"""
+
+    def __init__(self, slot_id, driver):
+        self.slot_id = slot_id
+        self.driver = driver
+        self.created_at = time.time()
+        self.armed_at = None
+        self.captcha_sample = None
+        self.uses = 0
+
+    def is_armed(self, captcha_ttl):
+        """True if the form is loaded and the CAPTCHA is still fresh"""
+        return self.armed_at is not None and time.time() - self.armed_at < captcha_ttl
+
+    def age(self):
+        """Seconds since the driver was started"""
+        return time.time() - self.created_at
+
+    def to_dict(self):
+        """Describe the slot for debug output"""
+        return {
+            'slot_id': self.slot_id,
+            'age_seconds': round(self.age(), 1),
+            'armed_seconds_ago': round(time.time() - self.armed_at, 1) if self.armed_at else None,
+            'uses': self.uses
+        }
+
+
+class DriverPool:
+    """Keeps idle drivers parked on the search form with a solved CAPTCHA"""
+
+    def __init__(self, create_driver, arm_driver, size=2, captcha_ttl=120, max_age=600, check_interval=2,
+                 recycle_reason=None, admit=None):
+        # create_driver() -> driver or None; arm_driver(driver) -> (armed, captcha_sample)
+        # recycle_reason(driver) -> str or None retires drivers over their memory/page/error limits
+        # admit() -> context manager holding a browser slot while a slot is started or armed
+        self.create_driver = create_driver
+        self.arm_driver = arm_driver
+        self.recycle_reason = recycle_reason
+        self.admit = admit or nullcontext
+        self.size = size
+        self.captcha_ttl = captcha_ttl
+        self.max_age = max_age
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._idle = []
+        self._busy = {}
+        self._next_slot_id = 1
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background maintenance thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._maintain_loop, name='form-slot-pool', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+        logger.info(f"Form slot pool started with {self.size} slot(s)")
+
+    def acquire(self):
+        """Take an armed slot without waiting, or None if none is ready"""
+        with self._lock:
+            for slot in list(self._idle):
+                if slot.is_armed(self.captcha_ttl) and slot.age() < self.max_age:
+                    self._idle.remove(slot)
+                    self._busy[slot.slot_id] = slot
+                    slot.uses += 1
+                    metrics.incr('form_slot.hit')
+                    return slot
+        metrics.incr('form_slot.miss')
+        return None
+
+    def release(self, slot, reusable=True):
+        """Give a slot back; it is re-armed in the background or retired"""
+        with self._lock:
+            self._busy.pop(slot.slot_id, None)
+            keep = reusable and not self._stopped.is_set() and slot.age() < self.max_age
+            if keep:
+                slot.armed_at = None
+                slot.captcha_sample = None
+                self._idle.append(slot)
+        if not keep:
+            self._quit(slot)
+
+    def shutdown(self):
+        """Stop maintenance and quit every pooled driver"""
+        self._stopped.set()
+        with self._lock:
+            slots = self._idle + list(self._busy.values())
+            self._idle = []
+            self._busy = {}
+        for slot in slots:
+            self._quit(slot)
+
+    def stats(self):
+        """Return pool state for debug output"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': [slot.to_dict() for slot in self._idle],
+                'busy': [slot.to_dict() for slot in self._busy.values()],
+                'armed': sum(1 for slot in self._idle if slot.is_armed(self.captcha_ttl))
+            }
+
+    def _quit(self, slot):
+        """Quit a slot's driver, ignoring errors"""
+        try:
+            slot.driver.quit()
+        except Exception:
+            pass
+
+    def _maintain_loop(self):
+        """Keep the pool full and every idle slot armed"""
+        while not self._stopped.is_set():
+            try:
+                self._maintain_once()
+            except Exception as e:
+                logger.error(f"Form slot maintenance failed: {str(e)}")
+            self._stopped.wait(self.check_interval)
+
+    def _maintain_once(self):
+        """One maintenance pass: retire old slots, start missing ones, re-arm stale ones"""
+        with self._lock:
+            idle = list(self._idle)
+        retired = []
+        for slot in idle:
+            if slot.age() >= self.max_age:
+                retired.append((slot, f"session age {slot.age():.0f}s"))
+            elif self.recycle_reason:
+                reason = self.recycle_reason(slot.driver)
+                if reason:
+                    retired.append((slot, reason))
+        with self._lock:
+            retired = [(slot, reason) for slot, reason in retired if slot in self._idle]
+            for slot, _ in retired:
+                self._idle.remove(slot)
+            missing = self.size - len(self._idle) - len(self._busy)
+        for slot, reason in retired:
+            logger.info(f"Retiring form slot {slot.slot_id} ({reason})")
+            self._quit(slot)
+
+        for _ in range(max(0, missing)):
+            try:
+                with self.admit():
+                    driver = self.create_driver()
+            except AdmissionRejected:
+                logger.info("No browser slot free for a new form slot, retrying later")
+                break
+            if not driver:
+                break
+            with self._lock:
+                slot = FormSlot(self._next_slot_id, driver)
+                self._next_slot_id += 1
+                self._idle.append(slot)
+
+        # Re-arm slots whose CAPTCHA is missing or about to expire
+        refresh_margin = min(self.captcha_ttl / 4, 30)
+        with self._lock:
+            stale = [
+                slot for slot in self._idle
+                if slot.armed_at is None or time.time() - slot.armed_at > self.captcha_ttl - refresh_margin
+            ]
+            for slot in stale:
+                self._idle.remove(slot)
+                self._busy[slot.slot_id] = slot
+
+        for slot in stale:
+            start = time.perf_counter()
+            try:
+                with self.admit():
+                    armed, captcha_sample = self.arm_driver(slot.driver)
+            except AdmissionRejected:
+                # Searches come first; keep the slot and arm it on a later pass
+                with self._lock:
+                    self._busy.pop(slot.slot_id, None)
+                    self._idle.append(slot)
+                continue
+            except Exception as e:
+                logger.warning(f"Arming form slot {slot.slot_id} failed: {str(e)}")
+                armed, captcha_sample = False, None
+
+            with self._lock:
+                self._busy.pop(slot.slot_id, None)
+                if armed:
+                    slot.armed_at = time.time()
+                    slot.captcha_sample = captcha_sample
+                    self._idle.append(slot)
+            if armed:
+                metrics.observe('form_slot.arm', time.perf_counter() - start)
+            else:
+                self._quit(slot)
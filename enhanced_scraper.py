@@ -1,32 +1,63 @@
 import requests
-from bs4 import BeautifulSoup
 import time
 import logging
-import re
 from datetime import datetime
-import io
-from selenium import webdriver
+import os
+import threading
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
 import json
 import base64
-from PIL import Image
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except ImportError:
-    TESSERACT_AVAILABLE = False
-
+from captcha_utils import (
+    fetch_captcha_bytes, fetch_captcha_bytes_http, refresh_captcha_in_place, form_state_intact,
+    captcha_rejected, wait_for_driver_answer, CAPTCHA_IMG_XPATH, CAPTCHA_TEXT_SELECTORS
+)
+from captcha_solvers import solve as solve_captcha, DEFAULT_SOLVER
+from captcha_corpus import get_corpus
+from driver_pool import DriverPool
+from session_handoff import extract_form
+from chrome_profiles import get_profile_manager, record_first_page_load
+from resource_blocking import configure_options, apply_rules, collect_stats
+from driver_health import RecyclePolicy, driver_registry
+from browser_backends import create_backend
+from results_parser import parse_results_html, parse_results_text
+from browser_discovery import launch_chrome
+from deadline import Deadline, DeadlineExceeded, Cancelled
+from admission import BATCH
+from politeness import get_upstream, priority, FORM, RESULTS, PDF
+from metrics import metrics
 logger = logging.getLogger(__name__)
 
-# Check Tesseract availability after logger is defined
-if not TESSERACT_AVAILABLE:
-    logger.warning("Tesseract OCR not available. CAPTCHA solving will be limited.")
+# Implicit wait for element lookups, the same for own drivers and shared-browser tabs
+IMPLICIT_WAIT = 5
+
+NO_RECORD_PHRASES = ['no record found', 'no records found', 'case not found', 'invalid case']
+
+def shows_no_record(page_source):
+    """True if a results page says the case does not exist"""
+    page_lower = page_source.lower()
+    return any(phrase in page_lower for phrase in NO_RECORD_PHRASES)
+
+def no_record_result(message):
+    """Search result for a case the portal does not know"""
+    return {
+        'success': False,
+        'message': message,
+        'error': 'no_data_found',
+        'case_data': None
+    }
+
+def found_result(case_data):
+    """Search result for parsed cases"""
+    return {
+        'success': True,
+        'message': 'Case found successfully',
+        'error': None,
+        'case_data': case_data
+    }
 
 class EnhancedDelhiHighCourtScraper:
     """Enhanced scraper for Delhi High Court with improved speed and reliability"""
@@ -45,14 +76,39 @@ class EnhancedDelhiHighCourtScraper:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
-        self.driver = None
-        self.driver_setup_time = None
-        self.max_driver_age = 300  # 5 minutes before recreating driver
+        # Driver and CAPTCHA state are per thread so concurrent searches don't share a browser
+        self._local = threading.local()
+        self.recycle_policy = RecyclePolicy.from_env()
         self.max_retries = 3
+        self.captcha_attempts = 3
+        self.captcha_solver = os.getenv('CAPTCHA_SOLVER', DEFAULT_SOLVER)
+        self.driver_pool = None
+        self.hybrid_session = None
+        self.shared_browser = None
+        # selenium (chromedriver) or cdp (Chrome's DevTools websocket, no chromedriver)
+        self.browser_backend = os.getenv('BROWSER_BACKEND', 'selenium').lower()
         
         # Load form structure from JSON
         self.form_structure = self.load_form_structure()
     
+    @property
+    def driver(self):
+        """WebDriver used by the current thread"""
+        return getattr(self._local, 'driver', None)
+    
+    @driver.setter
+    def driver(self, value):
+        self._local.driver = value
+    
+    @property
+    def pending_captcha_sample(self):
+        """(sample_id, answer) of the last recorded CAPTCHA on this thread"""
+        return getattr(self._local, 'pending_captcha_sample', None)
+    
+    @pending_captcha_sample.setter
+    def pending_captcha_sample(self, value):
+        self._local.pending_captcha_sample = value
+    
     def load_form_structure(self):
         """Load form structure from JSON file"""
         try:
@@ -64,28 +120,35 @@ class EnhancedDelhiHighCourtScraper:
             return {}
     
     def setup_driver(self):
-        """Setup Chrome WebDriver with optimized options for speed"""
+        """Setup Chrome WebDriver for the current thread"""
+        self.driver = self.create_driver()
+        return self.driver is not None
+    
+    def create_driver(self):
+        """
+        Return a driver for one search, or None: a new tab/context in the shared
+        Chrome when multi-context mode is on, otherwise a Chrome of its own
+        """
+        if self.shared_browser:
+            tab = self.shared_browser.open_tab()
+            if tab:
+                tab.set_page_load_timeout(30)
+                tab.implicitly_wait(IMPLICIT_WAIT)
+                apply_rules(tab, 'search_form')
+            return tab
+        return self.launch_driver()
+    
+    def enable_shared_browser(self, shared_browser):
+        """Run every search in its own browser context of one shared Chrome"""
+        self.shared_browser = shared_browser
+    
+    def launch_driver(self, page_load_strategy='eager', owner='enhanced'):
+        """Start a Chrome WebDriver with optimized options for speed, or return None"""
+        profile_manager = get_profile_manager()
+        profile = None
         try:
             chrome_options = Options()
             
-            # Find Chrome executable
-            import os
-            possible_paths = [
-                r"C:\Program Files\Google\Chrome\Application\chrome.exe",
-                r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
-                r"C:\Users\{}\AppData\Local\Google\Chrome\Application\chrome.exe".format(os.getenv('USERNAME'))
-            ]
-            
-            chrome_path = None
-            for path in possible_paths:
-                if os.path.exists(path):
-                    chrome_path = path
-                    break
-            
-            if chrome_path:
-                chrome_options.binary_location = chrome_path
-                logger.info(f"Using Chrome at: {chrome_path}")
-            
             # Browser visibility control
             if self.headless or not self.show_browser:
                 chrome_options.add_argument('--headless')
@@ -114,7 +177,6 @@ class EnhancedDelhiHighCourtScraper:
             chrome_options.add_argument('--disable-domain-reliability')
             chrome_options.add_argument('--disable-component-update')
             chrome_options.add_argument('--disable-desktop-notifications')
-            chrome_options.add_argument('--aggressive-cache-discard')
             chrome_options.add_argument('--memory-pressure-off')
             chrome_options.add_argument('--disable-logging')
             chrome_options.add_argument('--disable-blink-features=AutomationControlled')
@@ -131,76 +193,128 @@ class EnhancedDelhiHighCourtScraper:
             chrome_options.add_argument('--disable-features=VizDisplayCompositor')
             
             # Set page load strategy for faster loading
-            chrome_options.page_load_strategy = 'eager'
+            chrome_options.page_load_strategy = page_load_strategy
             
-            # Try direct Chrome start first (faster)
-            try:
-                self.driver = webdriver.Chrome(options=chrome_options)
-                logger.info("Chrome WebDriver setup successful (direct)")
-            except Exception as e1:
-                logger.warning(f"Direct Chrome start failed: {str(e1)}, trying webdriver-manager...")
-                # Fallback to webdriver-manager
-                service = Service(ChromeDriverManager().install())
-                self.driver = webdriver.Chrome(service=service, options=chrome_options)
-                logger.info("Chrome WebDriver setup successful (webdriver-manager)")
+            # Performance log used to count requests blocked over CDP
+            configure_options(chrome_options)
+            
+            # Persistent per-slot profile with a warm disk cache, if configured
+            profile = profile_manager.acquire() if profile_manager else None
+            if profile:
+                profile_manager.apply_options(chrome_options, profile)
+            else:
+                chrome_options.add_argument('--aggressive-cache-discard')
+            
+            # Chrome and chromedriver paths come from the startup discovery manifest
+            driver = launch_chrome(chrome_options)
+            logger.info("Chrome WebDriver setup successful")
+            
+            if profile:
+                profile_manager.bind_to_driver(driver, profile)
+            driver_registry.register(driver, owner=owner)
             
             # Set timeouts for faster operations
-            self.driver.set_page_load_timeout(30)
-            self.driver.implicitly_wait(5)
+            driver.set_page_load_timeout(30)
+            driver.implicitly_wait(IMPLICIT_WAIT)
             
-            return True
+            # Drop analytics, fonts, stylesheets and decorative images on the search form
+            apply_rules(driver, 'search_form')
+            
+            return driver
         except Exception as e:
             logger.error(f"Failed to setup WebDriver: {str(e)}")
-            return False
+            if profile:
+                profile_manager.release(profile)
+            return None
+    
+    def enable_form_slots(self, size=2, captcha_ttl=120, max_age=600, admit=None):
+        """Keep `size` idle drivers parked on the search form with a solved CAPTCHA"""
+        # Slot age is governed by max_age; memory, page and error limits come from the recycle policy
+        slot_policy = RecyclePolicy.from_env()
+        slot_policy.max_age = None
+        self.driver_pool = DriverPool(
+            create_driver=self.create_driver,
+            arm_driver=self.arm_form_slot,
+            recycle_reason=lambda driver: driver_registry.recycle_reason(driver, slot_policy),
+            size=size,
+            captcha_ttl=captcha_ttl,
+            max_age=max_age,
+            admit=admit
+        )
+        self.driver_pool.start()
+    
+    def arm_form_slot(self, driver):
+        """Load the search form on a pooled driver and solve its CAPTCHA ahead of time"""
+        self.driver = driver
+        self.pending_captcha_sample = None
+        try:
+            apply_rules(self.driver, 'search_form')
+            page_load_start = time.perf_counter()
+            # Pre-arming is speculative, so it must not use the tokens reserved for live searches
+            with priority(BATCH), get_upstream().slot(FORM):
+                self.driver.get(self.case_status_url)
+            record_first_page_load(self.driver, time.perf_counter() - page_load_start)
+            driver_registry.record_page(self.driver)
+            WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.ID, "case_type"))
+            )
+            armed = self.handle_captcha_fast()
+            # Count the arming page load now so it is not attributed to the next search
+            collect_stats(self.driver)
+            return armed, self.pending_captcha_sample
+        finally:
+            self.driver = None
+            self.pending_captcha_sample = None
     
     def solve_captcha_fast(self, captcha_element):
         """Fast CAPTCHA solving optimized for Delhi High Court"""
         try:
-            if not TESSERACT_AVAILABLE:
-                logger.warning("Tesseract OCR not available. Cannot solve CAPTCHA automatically.")
-                return None
-                
-            # Take screenshot of CAPTCHA
-            captcha_screenshot = captcha_element.screenshot_as_png
-            
-            # Convert to PIL Image
-            image = Image.open(io.BytesIO(captcha_screenshot))
+            # Use the original image bytes (data-URI or HTTP) instead of a screenshot
+            captcha_bytes = fetch_captcha_bytes(self.driver, captcha_element, self.session.headers)
             
-            # Fast preprocessing for Delhi High Court CAPTCHAs (usually simple digits)
-            image = image.convert('L')  # Convert to grayscale
+            with metrics.timer('captcha.solve'):
+                captcha_text = self.solve_captcha_bytes_fast(captcha_bytes)
             
-            # Quick enhancement
-            from PIL import ImageEnhance
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(2.5)
-            
-            # Resize for better OCR
-            width, height = image.size
-            image = image.resize((width * 2, height * 2), Image.LANCZOS)
-            
-            # Fast OCR with digit-only configuration
-            captcha_text = pytesseract.image_to_string(
-                image, 
-                config='--psm 7 -c tessedit_char_whitelist=0123456789'
-            )
-            captcha_text = ''.join(filter(str.isdigit, captcha_text.strip()))
-            
-            logger.info(f"Fast CAPTCHA OCR result: '{captcha_text}' (length: {len(captcha_text)})")
-            
-            # Return only if we got a reasonable result
-            if len(captcha_text) >= 3 and len(captcha_text) <= 8:
-                return captcha_text
-            else:
-                logger.warning(f"CAPTCHA result seems invalid: '{captcha_text}'")
-                return None
+            self.record_captcha_sample(captcha_bytes, captcha_text)
+            return captcha_text
             
         except Exception as e:
             logger.error(f"Fast CAPTCHA solving failed: {str(e)}")
             return None
     
-    def fast_search_case(self, case_type, case_number, filing_year):
+    def record_captcha_sample(self, captcha_bytes, captcha_text):
+        """Keep a CAPTCHA image for the offline solver benchmark if recording is on"""
+        corpus = get_corpus()
+        if corpus and captcha_bytes:
+            sample_id = corpus.record(captcha_bytes, captcha_text, self.captcha_solver)
+            # Unsolved images stay unlabelled until someone labels them by hand
+            self.pending_captcha_sample = (sample_id, captcha_text) if captcha_text else None
+    
+    def settle_captcha_sample(self, accepted):
+        """Confirm or reject the pending CAPTCHA prediction once the site has answered"""
+        corpus = get_corpus()
+        if corpus and self.pending_captcha_sample:
+            if accepted:
+                corpus.confirm(*self.pending_captcha_sample)
+            else:
+                corpus.reject(self.pending_captcha_sample[0])
+        self.pending_captcha_sample = None
+    
+    def solve_captcha_bytes_fast(self, captcha_bytes):
+        """OCR raw CAPTCHA image bytes (usable without a browser)"""
+        try:
+            captcha_text = solve_captcha(captcha_bytes, self.captcha_solver)
+            logger.info(f"Fast CAPTCHA OCR result ({self.captcha_solver}): '{captcha_text}'")
+            return captcha_text
+        except Exception as e:
+            logger.error(f"Fast CAPTCHA OCR failed: {str(e)}")
+            return None
+    
+    def fast_search_case(self, case_type, case_number, filing_year, deadline=None):
         """
-        Fast case search with enhanced error handling and retry logic
+        Fast case search with enhanced error handling and retry logic.
+        deadline bounds the whole search (waits shrink to the time left and no
+        new retry starts once it is spent).
         Returns: {
             'success': bool,
             'message': str,
@@ -208,47 +322,71 @@ class EnhancedDelhiHighCourtScraper:
             'case_data': dict or None
         }
         """
+        deadline = deadline or Deadline()
+        
+        if self.hybrid_session:
+            try:
+                result = self.http_search_case(case_type, case_number, filing_year, deadline)
+                if result is not None:
+                    return result
+            except (Cancelled, DeadlineExceeded):
+                # Out of time or unwanted: don't start the browser fallback
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ HTTP mode search failed, falling back to browser: {str(e)}")
+        
+        if self.browser_backend != 'selenium':
+            result = self.backend_search_case(case_type, case_number, filing_year, deadline)
+            if result is not None:
+                return result
+        
         for attempt in range(self.max_retries):
+            # Pre-armed driver parked on the form with the CAPTCHA solved, if the pool has one
+            form_slot = self.driver_pool.acquire() if self.driver_pool else None
+            form_slot_healthy = True
             try:
+                deadline.checkpoint('starting browser')
                 logger.info(f"🚀 Fast search attempt {attempt + 1}/{self.max_retries}: {case_type} {case_number}/{filing_year}")
                 
-                if not self.setup_driver():
-                    logger.error("Failed to setup WebDriver")
-                    if attempt == self.max_retries - 1:
-                        return {
-                            'success': False,
-                            'message': 'Failed to initialize browser',
-                            'error': 'browser_setup_failed',
-                            'case_data': None
-                        }
-                    continue
-                
-                # Navigate to case status page
-                self.driver.get(self.case_status_url)
-                time.sleep(1)  # Reduced wait time
-                
-                # Wait for page to load
-                WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.ID, "case_type"))
-                )
+                if form_slot:
+                    logger.info(f"⚡ Using pre-armed form slot {form_slot.slot_id}")
+                    self.driver = form_slot.driver
+                    self.pending_captcha_sample = form_slot.captcha_sample
+                else:
+                    if not self.setup_driver():
+                        logger.error("Failed to setup WebDriver")
+                        if attempt == self.max_retries - 1:
+                            return {
+                                'success': False,
+                                'message': 'Failed to initialize browser',
+                                'error': 'browser_setup_failed',
+                                'case_data': None
+                            }
+                        continue
+                    
+                    # Navigate to case status page
+                    deadline.checkpoint('loading search form')
+                    page_load_start = time.perf_counter()
+                    with get_upstream().slot(FORM, deadline=deadline):
+                        self.driver.get(self.case_status_url)
+                    record_first_page_load(self.driver, time.perf_counter() - page_load_start)
+                    driver_registry.record_page(self.driver)
+                    deadline.sleep(1)  # Reduced wait time
+                    
+                    # Wait for page to load
+                    WebDriverWait(self.driver, deadline.timeout(10)).until(
+                        EC.presence_of_element_located((By.ID, "case_type"))
+                    )
                 
                 # Fill case details quickly
-                case_type_select = Select(self.driver.find_element(By.ID, "case_type"))
-                case_type_select.select_by_value(case_type)
-                logger.info(f"✅ Selected case type: {case_type}")
-                
-                case_number_input = self.driver.find_element(By.ID, "case_number")
-                case_number_input.clear()
-                case_number_input.send_keys(case_number)
-                logger.info(f"✅ Entered case number: {case_number}")
+                deadline.checkpoint('filling form')
+                self.fill_form_fast(case_type, case_number, filing_year)
                 
-                filing_year_select = Select(self.driver.find_element(By.ID, "case_year"))
-                filing_year_select.select_by_value(filing_year)
-                logger.info(f"✅ Selected year: {filing_year}")
-                
-                # Handle CAPTCHA quickly
-                captcha_solved = self.handle_captcha_fast()
-                if not captcha_solved:
+                # Solve CAPTCHA and submit, refreshing only the CAPTCHA widget between tries
+                outcome = self.submit_with_captcha_retries(
+                    case_type, case_number, filing_year, captcha_ready=form_slot is not None, deadline=deadline
+                )
+                if outcome == 'captcha_failed':
                     logger.warning(f"❌ CAPTCHA failed on attempt {attempt + 1}")
                     if attempt == self.max_retries - 1:
                         return {
@@ -259,8 +397,7 @@ class EnhancedDelhiHighCourtScraper:
                         }
                     continue
                 
-                # Submit form quickly
-                if not self.submit_form_fast():
+                if outcome == 'submit_failed':
                     logger.warning(f"❌ Form submission failed on attempt {attempt + 1}")
                     if attempt == self.max_retries - 1:
                         return {
@@ -271,10 +408,6 @@ class EnhancedDelhiHighCourtScraper:
                         }
                     continue
                 
-                # Wait for results
-                logger.info("⏳ Waiting for results...")
-                time.sleep(5)  # Increased wait time for page to fully load
-                
                 # Debug: Log page title and URL to understand what page we're on
                 try:
                     current_url = self.driver.current_url
@@ -284,36 +417,21 @@ class EnhancedDelhiHighCourtScraper:
                     pass
                 
                 # Check for "No records found"
-                page_source = self.driver.page_source.lower()
-                if any(phrase in page_source for phrase in ['no record found', 'no records found', 'case not found', 'invalid case']):
+                if shows_no_record(self.driver.page_source):
                     logger.info(f"❌ Case not found: {case_type} {case_number}/{filing_year}")
-                    return {
-                        'success': False,
-                        'message': f'No case found for {case_type} {case_number}/{filing_year}',
-                        'error': 'no_data_found',
-                        'case_data': None
-                    }
+                    return no_record_result(f'No case found for {case_type} {case_number}/{filing_year}')
                 
                 # Parse case data quickly
-                case_data = self.parse_case_data_fast()
+                deadline.checkpoint('parsing results')
+                case_data = self.parse_case_data_fast(deadline=deadline)
                 
                 if case_data and case_data.get('total_cases', 0) > 0:
                     logger.info(f"✅ Fast search successful: Found {case_data.get('total_cases', 0)} case(s)")
-                    return {
-                        'success': True,
-                        'message': 'Case found successfully',
-                        'error': None,
-                        'case_data': case_data
-                    }
+                    return found_result(case_data)
                 elif case_data and case_data.get('total_cases', 0) == 0:
                     # Valid response but no cases found
                     logger.info(f"❌ No cases found for the search criteria")
-                    return {
-                        'success': False,
-                        'message': f'No case found for the given search criteria',
-                        'error': 'no_data_found',
-                        'case_data': None
-                    }
+                    return no_record_result('No case found for the given search criteria')
                 else:
                     logger.warning(f"❌ No case data parsed on attempt {attempt + 1}")
                     if attempt == self.max_retries - 1:
@@ -325,7 +443,23 @@ class EnhancedDelhiHighCourtScraper:
                         }
                     continue
                     
+            except Cancelled as e:
+                # Nobody is waiting for the result; the finally block frees the browser now
+                logger.info(f"🛑 Search {case_type} {case_number}/{filing_year}: {str(e)}")
+                raise
+                
+            except DeadlineExceeded as e:
+                logger.warning(f"⏰ {str(e)}")
+                return {
+                    'success': False,
+                    'message': 'Search ran out of time',
+                    'error': 'deadline_exceeded',
+                    'case_data': None
+                }
+                
             except TimeoutException as e:
+                form_slot_healthy = False
+                driver_registry.record_error(self.driver)
                 logger.warning(f"⏰ Timeout on attempt {attempt + 1}: {str(e)}")
                 if attempt == self.max_retries - 1:
                     return {
@@ -337,6 +471,8 @@ class EnhancedDelhiHighCourtScraper:
                 continue
                 
             except Exception as e:
+                form_slot_healthy = False
+                driver_registry.record_error(self.driver)
                 logger.error(f"❌ Error on attempt {attempt + 1}: {str(e)}")
                 if attempt == self.max_retries - 1:
                     return {
@@ -349,11 +485,20 @@ class EnhancedDelhiHighCourtScraper:
                 
             finally:
                 if self.driver:
+                    network = collect_stats(self.driver)
+                    if network['requests_blocked']:
+                        logger.info(f"🛡️ Blocked {network['requests_blocked']} request(s), "
+                                    f"~{network['bytes_saved'] / 1024:.0f} KB saved, "
+                                    f"{network['bytes_loaded'] / 1024:.0f} KB loaded")
+                if form_slot:
+                    # Hand the browser back to be re-armed instead of quitting it
+                    self.driver_pool.release(form_slot, reusable=form_slot_healthy)
+                elif self.driver:
                     try:
                         self.driver.quit()
                     except:
                         pass
-                    self.driver = None
+                self.driver = None
         
         # If we get here, all retries failed
         return {
@@ -363,6 +508,251 @@ class EnhancedDelhiHighCourtScraper:
             'case_data': None
         }
     
+    def enable_hybrid_mode(self, hybrid_session):
+        """Run searches over the shared HTTP session, using a browser only for the handshake"""
+        self.hybrid_session = hybrid_session
+        self.session = hybrid_session.session
+    
+    def http_search_case(self, case_type, case_number, filing_year, deadline=None):
+        """
+        Case search over plain HTTP using the hybrid session's cookies and tokens.
+        Returns the same dict as fast_search_case, or None if the form could not
+        be handled without a browser (the caller then falls back to Selenium).
+        """
+        deadline = deadline or Deadline()
+        # Bootstrapped cookies without the server session; the form GET below opens this search's own session and CAPTCHA
+        session = self.hybrid_session.fork()
+        if session is None:
+            return None
+        try:
+            return self._http_search(session, case_type, case_number, filing_year, deadline)
+        finally:
+            session.close()
+    
+    def _http_search(self, session, case_type, case_number, filing_year, deadline):
+        """http_search_case() on one forked session"""
+        hybrid = self.hybrid_session
+        for captcha_attempt in range(self.captcha_attempts):
+            deadline.checkpoint('loading search form over HTTP')
+            with get_upstream().slot(FORM, deadline=deadline) as slot:
+                response = slot.check(hybrid.request('GET', self.case_status_url, session=session,
+                                                     timeout=deadline.timeout(20)))
+            if response is None or response.status_code != 200:
+                logger.warning("⚠️ HTTP mode could not load the search form")
+                return None
+            
+            form = extract_form(response.text, response.url)
+            if not form:
+                logger.warning("⚠️ HTTP mode found no search form, falling back to browser")
+                return None
+            
+            names = form['names']
+            data = dict(form['fields'])
+            data[names.get('case_type', 'case_type')] = case_type
+            data[names.get('case_number', 'case_number')] = case_number
+            data[names.get('case_year', 'case_year')] = filing_year
+            
+            # CAPTCHA: text rendered in the page, or an image read with the session
+            captcha_name = next((name for name in form['text_inputs'] if 'captcha' in name.lower()), None)
+            if captcha_name:
+                captcha_text = None
+                for selector in CAPTCHA_TEXT_SELECTORS:
+                    element = form['soup'].select_one(selector)
+                    if element and len(element.get_text(strip=True)) >= 3:
+                        captcha_text = element.get_text(strip=True)
+                        break
+                if not captcha_text:
+                    captcha_bytes = fetch_captcha_bytes_http(session, response.text, response.url)
+                    if captcha_bytes:
+                        with metrics.timer('captcha.solve'):
+                            captcha_text = self.solve_captcha_bytes_fast(captcha_bytes)
+                        self.record_captcha_sample(captcha_bytes, captcha_text)
+                if not captcha_text:
+                    logger.warning(f"❌ HTTP mode could not solve CAPTCHA (try {captcha_attempt + 1})")
+                    continue
+                data[captcha_name] = captcha_text
+            
+            deadline.checkpoint('submitting search over HTTP')
+            with metrics.timer('hybrid.search'), get_upstream().slot(RESULTS, deadline=deadline) as slot:
+                if form['method'] == 'post':
+                    result = hybrid.request('POST', form['action'], session=session, data=data,
+                                            headers={'Referer': response.url}, timeout=deadline.timeout(20))
+                else:
+                    result = hybrid.request('GET', form['action'], session=session, params=data,
+                                            headers={'Referer': response.url}, timeout=deadline.timeout(20))
+                slot.check(result)
+            if result is None:
+                return None
+            
+            page_source = result.text
+            if captcha_rejected(page_source):
+                logger.warning(f"❌ CAPTCHA rejected in HTTP mode (try {captcha_attempt + 1})")
+                self.settle_captcha_sample(accepted=False)
+                continue
+            self.settle_captcha_sample(accepted=True)
+            
+            outcome = self.results_page_outcome(page_source, case_type, case_number, filing_year, 'HTTP')
+            if outcome is None:
+                # Nothing recognisable came back (e.g. results rendered by JavaScript)
+                logger.warning("⚠️ HTTP mode could not parse results, falling back to browser")
+            return outcome
+        
+        return None
+    
+    def backend_search_case(self, case_type, case_number, filing_year, deadline=None):
+        """
+        Case search through a BrowserBackend (navigate, fill form, read CAPTCHA,
+        submit, DOM snapshot). Returns the same dict as fast_search_case, or
+        None if the backend failed (the caller then uses the Selenium flow).
+        """
+        backend = create_backend(
+            self.browser_backend,
+            create_driver=self.create_driver,
+            session=self.session,
+            headless=self.headless or not self.show_browser,
+            user_agent=self.session.headers.get('User-Agent')
+        )
+        if not backend:
+            return None
+        deadline = deadline or Deadline()
+        
+        try:
+            form_values = {'case_type': case_type, 'case_number': case_number, 'case_year': filing_year}
+            for captcha_attempt in range(self.captcha_attempts):
+                deadline.checkpoint('loading search form')
+                with metrics.timer(f'backend.{backend.name}.navigate'), get_upstream().slot(FORM, deadline=deadline):
+                    backend.navigate(self.case_status_url, wait_for_id='case_type', timeout=deadline.timeout(15))
+                backend.fill_form(form_values)
+                
+                kind, captcha = backend.read_captcha()
+                if kind == 'image':
+                    image_bytes = captcha
+                    with metrics.timer('captcha.solve'):
+                        captcha = self.solve_captcha_bytes_fast(image_bytes) if image_bytes else None
+                    self.record_captcha_sample(image_bytes, captcha)
+                if kind and (not captcha or not backend.enter_captcha(captcha)):
+                    logger.warning(f"❌ {backend.name} backend could not solve CAPTCHA (try {captcha_attempt + 1})")
+                    continue
+                
+                deadline.checkpoint('submitting search')
+                # The slot covers the portal's answer, not just the click
+                with get_upstream().slot(RESULTS, deadline=deadline) as slot:
+                    submitted = backend.submit()
+                    if submitted and not backend.wait_for_answer(deadline.timeout(20)):
+                        slot.ok = False
+                if not submitted:
+                    logger.warning(f"⚠️ {backend.name} backend found no submit button")
+                    return None
+                
+                page_source = backend.dom_snapshot()
+                if captcha_rejected(page_source):
+                    logger.warning(f"❌ CAPTCHA rejected ({backend.name} backend, try {captcha_attempt + 1})")
+                    self.settle_captcha_sample(accepted=False)
+                    continue
+                self.settle_captcha_sample(accepted=True)
+                
+                return self.results_page_outcome(page_source, case_type, case_number, filing_year, f'{backend.name} backend')
+            
+            return {
+                'success': False,
+                'message': 'CAPTCHA verification failed after multiple attempts',
+                'error': 'captcha_failed',
+                'case_data': None
+            }
+        except (Cancelled, DeadlineExceeded):
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ {backend.name} backend search failed, falling back to Selenium: {str(e)}")
+            return None
+        finally:
+            backend.quit()
+    
+    def results_page_outcome(self, page_source, case_type, case_number, filing_year, mode):
+        """no_record_result() or found_result() for a results page; None if it shows neither"""
+        if shows_no_record(page_source):
+            return no_record_result(f'No case found for {case_type} {case_number}/{filing_year}')
+        case_data = self.parse_case_data_fast(page_source)
+        if case_data and case_data.get('total_cases', 0) > 0:
+            logger.info(f"✅ {mode} search successful: Found {case_data.get('total_cases', 0)} case(s)")
+            return found_result(case_data)
+        return None
+    
+    def fill_form_fast(self, case_type, case_number, filing_year):
+        """Fill case type, number and year on the loaded search form"""
+        case_type_select = Select(self.driver.find_element(By.ID, "case_type"))
+        case_type_select.select_by_value(case_type)
+        logger.info(f"✅ Selected case type: {case_type}")
+        
+        case_number_input = self.driver.find_element(By.ID, "case_number")
+        case_number_input.clear()
+        case_number_input.send_keys(case_number)
+        logger.info(f"✅ Entered case number: {case_number}")
+        
+        filing_year_select = Select(self.driver.find_element(By.ID, "case_year"))
+        filing_year_select.select_by_value(filing_year)
+        logger.info(f"✅ Selected year: {filing_year}")
+    
+    def refresh_captcha_fast(self, case_type, case_number, filing_year, deadline=None):
+        """Get a new CAPTCHA in place, falling back to a full form reload only when forced"""
+        deadline = deadline or Deadline()
+        apply_rules(self.driver, 'search_form')
+        start = time.perf_counter()
+        with get_upstream().slot(FORM, deadline=deadline):
+            refreshed = refresh_captcha_in_place(self.driver)
+        if (refreshed and
+                form_state_intact(self.driver, case_type, case_number, filing_year)):
+            metrics.observe('captcha.retry.in_place', time.perf_counter() - start)
+            logger.info("🔄 Refreshed CAPTCHA in place")
+            return
+        
+        logger.info("🔄 In-place CAPTCHA refresh not possible, reloading the form")
+        start = time.perf_counter()
+        with get_upstream().slot(FORM, deadline=deadline):
+            self.driver.get(self.case_status_url)
+        WebDriverWait(self.driver, deadline.timeout(10)).until(
+            EC.presence_of_element_located((By.ID, "case_type"))
+        )
+        self.fill_form_fast(case_type, case_number, filing_year)
+        metrics.observe('captcha.retry.full_reload', time.perf_counter() - start)
+    
+    def submit_with_captcha_retries(self, case_type, case_number, filing_year, captcha_ready=False, deadline=None):
+        """
+        Solve the CAPTCHA and submit the filled form on the current driver.
+        captcha_ready skips solving on the first try (pre-armed form slots).
+        Returns 'submitted', 'captcha_failed' or 'submit_failed'; raises
+        DeadlineExceeded or Cancelled from the deadline's checkpoints.
+        """
+        deadline = deadline or Deadline()
+        for captcha_attempt in range(self.captcha_attempts):
+            deadline.checkpoint('solving CAPTCHA')
+            if captcha_attempt > 0:
+                self.refresh_captcha_fast(case_type, case_number, filing_year, deadline=deadline)
+            
+            already_solved = captcha_ready and captcha_attempt == 0
+            if not already_solved and not self.handle_captcha_fast():
+                logger.warning(f"❌ CAPTCHA not solved (try {captcha_attempt + 1}/{self.captcha_attempts})")
+                continue
+            
+            deadline.checkpoint('submitting search')
+            
+            # The results page is only parsed, so nothing but its HTML is needed
+            apply_rules(self.driver, 'results')
+            logger.info("⏳ Submitting and waiting for results...")
+            if not self.submit_form_fast(deadline=deadline):
+                return 'submit_failed'
+            deadline.checkpoint('waiting for results')
+            
+            if captcha_rejected(self.driver.page_source):
+                logger.warning(f"❌ CAPTCHA rejected by site (try {captcha_attempt + 1}/{self.captcha_attempts})")
+                self.settle_captcha_sample(accepted=False)
+                continue
+            
+            # The site accepted the submission, so the prediction was right
+            self.settle_captcha_sample(accepted=True)
+            return 'submitted'
+        
+        return 'captcha_failed'
+    
     def handle_captcha_fast(self):
         """Fast CAPTCHA handling"""
         try:
@@ -410,7 +800,7 @@ class EnhancedDelhiHighCourtScraper:
             
             # Try image-based CAPTCHA if text-based failed
             try:
-                captcha_img = self.driver.find_element(By.XPATH, "//img[contains(@src, 'captcha') or contains(@src, 'Captcha')]")
+                captcha_img = self.driver.find_element(By.XPATH, CAPTCHA_IMG_XPATH)
                 captcha_input_selectors = [
                     "input[name*='captcha']",
                     "input[id*='captcha']",
@@ -433,7 +823,9 @@ class EnhancedDelhiHighCourtScraper:
                         captcha_input.send_keys(captcha_solution)
                         logger.info(f"✅ Entered image CAPTCHA: {captcha_solution}")
                         return True
-            except:
+                    logger.warning("❌ Could not read image CAPTCHA")
+                    return False
+            except NoSuchElementException:
                 pass
             
             # No CAPTCHA found
@@ -444,8 +836,9 @@ class EnhancedDelhiHighCourtScraper:
             logger.error(f"❌ CAPTCHA handling failed: {str(e)}")
             return False
     
-    def submit_form_fast(self):
-        """Fast form submission"""
+    def submit_form_fast(self, deadline=None):
+        """Submit the form and wait (within deadline) for the portal's answer"""
+        deadline = deadline or Deadline()
         try:
             # Try different submit button selectors
             submit_selectors = [
@@ -487,273 +880,63 @@ class EnhancedDelhiHighCourtScraper:
                             break
             
             if submit_button:
-                submit_button.click()
+                # The slot covers the portal's answer, not just the click
+                page_before = self.driver.page_source
+                with get_upstream().slot(RESULTS, deadline=deadline) as slot:
+                    submit_button.click()
+                    if not wait_for_driver_answer(self.driver, page_before, deadline.timeout(20)):
+                        slot.ok = False
                 logger.info("✅ Form submitted successfully")
                 return True
             else:
                 logger.error("❌ No submit button found")
                 return False
                 
+        except (Cancelled, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"❌ Form submission failed: {str(e)}")
             return False
     
-    def parse_case_data_fast(self):
-        """Fast case data parsing optimized for single case results with stale element protection"""
-        try:
-            logger.info("🔍 Fast parsing case data...")
-            
-            # Wait a bit more for page to stabilize
-            time.sleep(2)
-            
-            case_data = {
-                'cases': [],
-                'total_cases': 0,
-                'raw_html': self.driver.page_source
-            }
+    def parse_case_data_fast(self, page_source=None, deadline=None):
+        """
+        Fast case data parsing optimized for single case results with stale element protection.
+        Parses the given HTML (HTTP mode) or the current browser page.
+        """
+        if page_source is None:
+            # Wait a bit more for page to stabilize, but not past the search deadline
+            (deadline or Deadline()).sleep(2)
             
             # Get fresh page source to avoid stale elements
             page_source = self.driver.page_source
-            
-            # First, try to parse from HTML source directly (more reliable)
-            soup = BeautifulSoup(page_source, 'html.parser')
-            
-            # Look for results table in HTML
-            tables = soup.find_all('table')
-            results_table = None
-            
-            for table in tables:
-                table_text = table.get_text().lower()
-                if any(keyword in table_text for keyword in ['s.no', 'case no', 'petitioner', 'respondent', 'diary']):
-                    results_table = table
-                    logger.info(f"📋 Found results table in HTML")
-                    break
-            
-            if not results_table:
-                logger.warning("⚠️ No results table found in HTML, trying text parsing")
-                return self.parse_from_page_text_fast()
-            
-            # Parse table rows from HTML
-            rows = results_table.find_all('tr')
-            logger.info(f"📊 Found {len(rows)} rows in results table")
-            
-            for i, row in enumerate(rows):
-                try:
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) < 3:  # Skip header rows or incomplete rows
-                        continue
-                    
-                    # Extract basic data from HTML
-                    sno = cells[0].get_text(strip=True) if len(cells) > 0 else ""
-                    case_info = cells[1].get_text(strip=True) if len(cells) > 1 else ""
-                    parties = cells[2].get_text(strip=True) if len(cells) > 2 else ""
-                    listing_info = cells[3].get_text(strip=True) if len(cells) > 3 else ""
-                    
-                    # Skip header rows
-                    if sno.lower() in ['s.no', 's.no.', 'sno', 'serial'] or not case_info:
-                        logger.info(f"⏭️ Skipping header row: {sno}")
-                        continue
-                    
-                    # Quick parsing of case number and status
-                    case_number = ""
-                    status = "Unknown"
-                    
-                    if '[' in case_info and ']' in case_info:
-                        status_start = case_info.find('[')
-                        status_end = case_info.find(']')
-                        if status_start != -1 and status_end != -1:
-                            status = case_info[status_start+1:status_end].strip()
-                            case_number = case_info[:status_start].strip()
-                    else:
-                        case_number = case_info
-                    
-                    # Quick parsing of dates
-                    next_date = "N/A"
-                    last_date = "N/A"
-                    court_no = "N/A"
-                    
-                    if listing_info:
-                        if "NEXT DATE:" in listing_info:
-                            next_start = listing_info.find("NEXT DATE:") + len("NEXT DATE:")
-                            next_end = listing_info.find("Last Date:", next_start)
-                            if next_end == -1:
-                                next_end = listing_info.find("COURT NO:", next_start)
-                            if next_end == -1:
-                                next_end = len(listing_info)
-                            next_date = listing_info[next_start:next_end].strip()
-                        
-                        if "Last Date:" in listing_info:
-                            last_start = listing_info.find("Last Date:") + len("Last Date:")
-                            last_end = listing_info.find("COURT NO:", last_start)
-                            if last_end == -1:
-                                last_end = len(listing_info)
-                            last_date = listing_info[last_start:last_end].strip()
-                        
-                        if "COURT NO:" in listing_info:
-                            court_start = listing_info.find("COURT NO:") + len("COURT NO:")
-                            court_no = listing_info[court_start:].strip()
-                    
-                    # Look for PDF links in HTML
-                    pdf_links = []
-                    links = cells[1].find_all('a') if len(cells) > 1 else []
-                    for link in links:
-                        href = link.get('href', '')
-                        link_text = link.get_text(strip=True)
-                        if href and ('.pdf' in href.lower() or 'order' in link_text.lower()):
-                            full_url = href if href.startswith('http') else f"{self.base_url}/{href.lstrip('/')}"
-                            pdf_links.append({
-                                'text': link_text,
-                                'url': full_url
-                            })
-                    
-                    case_record = {
-                        'sno': sno,
-                        'case_number': case_number,
-                        'status': status,
-                        'parties': parties,
-                        'next_date': next_date,
-                        'last_date': last_date,
-                        'court_no': court_no,
-                        'pdf_links': pdf_links,
-                        'raw_text': f"{case_info} | {parties} | {listing_info}"
-                    }
-                    
-                    case_data['cases'].append(case_record)
-                    logger.info(f"✅ Parsed case: {case_number} - {status}")
-                    
-                except Exception as e:
-                    logger.warning(f"⚠️ Error parsing row {i}: {str(e)}")
-                    continue
-            
-            case_data['total_cases'] = len(case_data['cases'])
-            logger.info(f"🎉 Fast parsing complete: {case_data['total_cases']} cases found")
-            
-            # If no cases found, try alternative parsing
-            if case_data['total_cases'] == 0:
-                logger.info("🔄 No cases found with table parsing, trying alternative methods...")
-                return self.parse_from_page_text_fast()
-            
-            return case_data
-            
-        except Exception as e:
-            logger.error(f"❌ Fast parsing failed: {str(e)}")
-            return self.parse_from_page_text_fast()
+        return parse_results_html(page_source, self.base_url)
     
-    def parse_from_page_text_fast(self):
+    def parse_from_page_text_fast(self, page_text=None):
         """Fast fallback parser using page text with multiple patterns"""
-        try:
-            logger.info("🔍 Using fast text parsing fallback...")
+        if page_text is None:
             page_text = self.driver.page_source
-            
-            case_data = {
-                'cases': [],
-                'total_cases': 0,
-                'raw_html': page_text,
-                'parsing_method': 'fast_text_fallback'
-            }
-            
-            # Multiple regex patterns for different case formats
-            import re
-            
-            # Pattern 1: Standard format with status in brackets
-            pattern1 = r'([A-Z\.]+\s*-?\s*\d+\s*/\s*\d{4})\s*\[([^\]]+)\]'
-            matches1 = re.findall(pattern1, page_text)
-            
-            # Pattern 2: Case number without status
-            pattern2 = r'([A-Z\.]+\s*-?\s*\d+\s*/\s*\d{4})'
-            matches2 = re.findall(pattern2, page_text)
-            
-            # Pattern 3: Look for table-like structure in text
-            pattern3 = r'(\d+)\s+([A-Z\.]+\s*-?\s*\d+\s*/\s*\d{4})'
-            matches3 = re.findall(pattern3, page_text)
-            
-            logger.info(f"🔍 Pattern matches: {len(matches1)} with status, {len(matches2)} without status, {len(matches3)} with S.No")
-            
-            # Process matches with status first
-            for i, (case_num, status) in enumerate(matches1):
-                case_data['cases'].append({
-                    'sno': str(i + 1),
-                    'case_number': case_num.strip(),
-                    'status': status.strip(),
-                    'parties': 'Parties information not available',
-                    'next_date': 'N/A',
-                    'last_date': 'N/A',
-                    'court_no': 'N/A',
-                    'pdf_links': [],
-                    'raw_text': f"{case_num} [{status}]"
-                })
-            
-            # If no matches with status, try without status
-            if len(case_data['cases']) == 0 and matches2:
-                for i, case_num in enumerate(matches2[:5]):  # Limit to first 5 to avoid duplicates
-                    if case_num.strip() and len(case_num.strip()) > 5:  # Basic validation
-                        case_data['cases'].append({
-                            'sno': str(i + 1),
-                            'case_number': case_num.strip(),
-                            'status': 'Status not available',
-                            'parties': 'Parties information not available',
-                            'next_date': 'N/A',
-                            'last_date': 'N/A',
-                            'court_no': 'N/A',
-                            'pdf_links': [],
-                            'raw_text': case_num.strip()
-                        })
-            
-            # If still no matches, try with S.No pattern
-            if len(case_data['cases']) == 0 and matches3:
-                for sno, case_num in matches3[:5]:  # Limit to first 5
-                    if case_num.strip() and len(case_num.strip()) > 5:
-                        case_data['cases'].append({
-                            'sno': sno.strip(),
-                            'case_number': case_num.strip(),
-                            'status': 'Status not available',
-                            'parties': 'Parties information not available',
-                            'next_date': 'N/A',
-                            'last_date': 'N/A',
-                            'court_no': 'N/A',
-                            'pdf_links': [],
-                            'raw_text': f"{sno} {case_num}"
-                        })
-            
-            case_data['total_cases'] = len(case_data['cases'])
-            logger.info(f"🎉 Fast text parsing found {case_data['total_cases']} cases")
-            
-            # If still no cases found, check for common "no results" messages
-            if case_data['total_cases'] == 0:
-                page_lower = page_text.lower()
-                if any(msg in page_lower for msg in ['no record found', 'no records found', 'case not found', 'invalid case', 'no data found']):
-                    logger.info("📝 Page indicates no records found")
-                else:
-                    logger.warning("⚠️ No cases found and no 'no records' message detected")
-                    # Log a sample of the page content for debugging
-                    sample_text = page_text[:1000] if len(page_text) > 1000 else page_text
-                    logger.debug(f"Page sample: {sample_text}")
-            
-            return case_data
-            
-        except Exception as e:
-            logger.error(f"❌ Fast text parsing failed: {str(e)}")
-            return {
-                'cases': [],
-                'total_cases': 0,
-                'raw_html': self.driver.page_source if self.driver else '',
-                'error': str(e)
-            }
+        return parse_results_text(page_text)
     
     def download_pdf(self, pdf_url):
         """Fast PDF download"""
         try:
             logger.info(f"📥 Fast downloading PDF: {pdf_url}")
             
+            # User-Agent and cookies come from the session (the browser's, in hybrid mode)
             headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                 'Accept': 'application/pdf,application/octet-stream,*/*',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive'
+                'Accept-Language': 'en-US,en;q=0.9'
             }
             
-            response = requests.get(pdf_url, headers=headers, timeout=20, stream=True)
+            # Over the hybrid session when enabled (re-bootstrapped if it expired), like live_scraper
+            with get_upstream().slot(PDF) as slot:
+                if self.hybrid_session:
+                    response = slot.check(self.hybrid_session.request('GET', pdf_url, headers=headers,
+                                                                      timeout=20, stream=True))
+                else:
+                    response = slot.check(self.session.get(pdf_url, headers=headers, timeout=20, stream=True))
+            if response is None:
+                return None
             response.raise_for_status()
             
             # Generate filename
@@ -786,6 +969,10 @@ class EnhancedDelhiHighCourtScraper:
     
     def cleanup(self):
         """Clean up resources"""
+        if self.driver_pool:
+            self.driver_pool.shutdown()
+        if self.shared_browser:
+            self.shared_browser.shutdown()
         if self.driver:
             try:
                 self.driver.quit()
@@ -0,0 +1,195 @@
+"""
+Background jobs for scrapes that outlive their HTTP request
+
+/search and /orders wait for their job only up to SEARCH_DEADLINE seconds.
+If the scrape is still running by then, the user gets a "still working"
+page that polls /api/jobs/<id>, and the job keeps going on a worker thread
+instead of being thrown away. Finished jobs are kept for JOB_RETENTION
+seconds. Jobs that need a browser carry an admission ticket and stay
+'queued' until the admission controller grants them a slot; a job whose
+ticket times out in the queue ends as 'rejected' with a retry_after.
+
+The polls double as a heartbeat: once a job has been handed off, it is
+cancelled at its next checkpoint if the page stops polling for
+JOB_HEARTBEAT_TIMEOUT seconds, if the page reports it was closed and no
+poll follows shortly after, or if the user presses Cancel.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import AdmissionRejected
+from deadline import Cancelled
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """One unit of background work and its outcome"""
+
+    # Seconds a closed page gets to reconnect (e.g. a reload) before its job is cancelled
+    LEAVE_GRACE = 5
+
+    def __init__(self, kind, description=None, heartbeat_timeout=15):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.description = description
+        self.status = 'queued'
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.retry_after = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.heartbeat_timeout = heartbeat_timeout
+        self.cancel_requested = False
+        self.watched = False
+        self.last_seen = None
+        self.left_at = None
+        self._done = threading.Event()
+
+    def set_stage(self, stage):
+        """Progress callback used by Deadline checkpoints"""
+        self.stage = stage
+
+    def watch(self):
+        """The job was handed off to a polling page; from now on it needs heartbeats"""
+        self.watched = True
+        self.last_seen = time.time()
+
+    def heartbeat(self):
+        """The polling page is still open"""
+        self.last_seen = time.time()
+
+    def client_left(self):
+        """The polling page was closed or navigated away"""
+        self.left_at = time.time()
+
+    def cancel(self):
+        """Stop the job at its next checkpoint"""
+        self.cancel_requested = True
+
+    def should_cancel(self):
+        """True if the job was cancelled or its page is gone"""
+        if self.cancel_requested:
+            return True
+        if not self.watched:
+            return False
+        now = time.time()
+        if self.left_at and self.left_at >= self.last_seen and now - self.left_at > self.LEAVE_GRACE:
+            return True
+        return now - self.last_seen > self.heartbeat_timeout
+
+    def done(self):
+        """True once the job has finished, failed, been rejected or been cancelled"""
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job finishes or timeout seconds pass; returns done()"""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        """Status for the polling endpoint"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'description': self.description,
+            'status': self.status,
+            'stage': self.stage,
+            'elapsed_seconds': round((self.finished_at or time.time()) - self.created_at, 1),
+            'error': self.error,
+            'retry_after': self.retry_after
+        }
+
+
+class JobManager:
+    """Runs jobs on a thread pool and keeps recent ones for polling"""
+
+    def __init__(self, max_workers=4, retention=3600, heartbeat_timeout=15):
+        self.retention = retention
+        self.heartbeat_timeout = heartbeat_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func, *args, description=None, ticket=None, on_skipped=None, **kwargs):
+        """
+        Start func(job, *args, **kwargs) in the background; its return value becomes job.result.
+        With an admission ticket, func only starts once the ticket is granted; the ticket is
+        released when the job ends. on_skipped() is called if the job ends before func starts.
+        """
+        job = Job(kind, description, self.heartbeat_timeout)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        try:
+            self._executor.submit(self._run, job, func, args, kwargs, ticket, on_skipped)
+        except Exception:
+            if ticket:
+                ticket.release()
+            if on_skipped:
+                on_skipped()
+            raise
+        return job
+
+    def get(self, job_id):
+        """Look up a job, or None if unknown or expired"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, func, args, kwargs, ticket=None, on_skipped=None):
+        """Run one job and record its outcome"""
+        try:
+            if ticket:
+                job.set_stage('waiting for a browser')
+                if not ticket.wait(should_cancel=job.should_cancel):
+                    raise Cancelled("Cancelled while waiting for a browser")
+            job.status = 'running'
+            on_skipped = None
+            job.result = func(job, *args, **kwargs)
+            job.status = 'done'
+        except Cancelled as e:
+            job.error = str(e)
+            job.status = 'cancelled'
+        except AdmissionRejected as e:
+            # No browser capacity: not a failure of the job, the client should retry later
+            logger.warning(f"Job {job.id} ({job.kind}) rejected by admission: {str(e)}")
+            job.error = str(e)
+            job.retry_after = e.retry_after
+            job.status = 'rejected'
+            metrics.incr(f'job.{job.kind}.rejected')
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}", exc_info=True)
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            if ticket:
+                ticket.release()
+            if on_skipped:
+                on_skipped()
+            job.finished_at = time.time()
+            elapsed = job.finished_at - job.created_at
+            if job.status == 'cancelled':
+                self._record_cancellation(job, elapsed)
+            elif job.status == 'done':
+                metrics.observe(f'job.{job.kind}', elapsed)
+            job._done.set()
+
+    def _record_cancellation(self, job, elapsed):
+        """Count the browser time a cancellation saved, estimated from the median completed job"""
+        typical = metrics.summary(f'job.{job.kind}')
+        reclaimed = max(0.0, typical['p50_ms'] / 1000 - elapsed) if typical else 0.0
+        metrics.incr(f'job.{job.kind}.cancelled')
+        metrics.incr('cancel.browser_seconds_reclaimed', reclaimed)
+        logger.info(f"Job {job.id} ({job.kind}) cancelled at '{job.stage}', ~{reclaimed:.0f} browser-seconds reclaimed")
+
+    def _prune(self):
+        """Forget finished jobs older than the retention period (caller holds the lock)"""
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at and job.finished_at < cutoff:
+                del self._jobs[job_id]
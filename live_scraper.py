@@ -4,30 +4,28 @@ import time
 import logging
 import re
 from datetime import datetime
-import io
-from selenium import webdriver
+import os
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
 import json
 import base64
-from PIL import Image
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except ImportError:
-    TESSERACT_AVAILABLE = False
-
+from captcha_utils import (
+    fetch_captcha_bytes, refresh_captcha_in_place, form_state_intact, captcha_rejected, wait_for_driver_answer, CAPTCHA_IMG_XPATH
+)
+from captcha_solvers import solve as solve_captcha
+from captcha_corpus import get_corpus
+from chrome_profiles import get_profile_manager, record_first_page_load
+from resource_blocking import configure_options, apply_rules, collect_stats
+from driver_health import RecyclePolicy, driver_registry
+from browser_discovery import launch_chrome
+from deadline import Deadline, Cancelled
+from politeness import get_upstream, FORM, RESULTS, ORDERS, PDF
+from metrics import metrics
 logger = logging.getLogger(__name__)
 
-# Check Tesseract availability after logger is defined
-if not TESSERACT_AVAILABLE:
-    logger.warning("Tesseract OCR not available. CAPTCHA solving will be limited.")
-
 class DelhiHighCourtLiveScraper:
     """Live scraper for Delhi High Court website with real data and PDF downloads"""
     
@@ -46,8 +44,12 @@ class DelhiHighCourtLiveScraper:
             'Upgrade-Insecure-Requests': '1',
         })
         self.driver = None
-        self.driver_setup_time = None
-        self.max_driver_age = 300  # 5 minutes before recreating driver
+        # Drivers are replaced once age, memory, page or error limits are crossed
+        self.recycle_policy = RecyclePolicy.from_env()
+        self.captcha_solver = os.getenv('CAPTCHA_SOLVER', 'tesseract_denoise')
+        self.pending_captcha_sample = None
+        self.hybrid_session = None
+        self.shared_browser = None
         
         # Load form structure from JSON
         self.form_structure = self.load_form_structure()
@@ -76,27 +78,19 @@ class DelhiHighCourtLiveScraper:
     
     def setup_driver(self):
         """Setup Chrome WebDriver with options"""
+        if self.shared_browser:
+            # Multi-context mode: a fresh isolated tab in the shared Chrome
+            self.driver = self.shared_browser.open_tab()
+            if not self.driver:
+                return False
+            apply_rules(self.driver, 'search_form')
+            return True
+        
+        profile_manager = get_profile_manager()
+        profile = None
         try:
             chrome_options = Options()
             
-            # Find Chrome executable
-            import os
-            possible_paths = [
-                r"C:\Program Files\Google\Chrome\Application\chrome.exe",
-                r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
-                r"C:\Users\{}\AppData\Local\Google\Chrome\Application\chrome.exe".format(os.getenv('USERNAME'))
-            ]
-            
-            chrome_path = None
-            for path in possible_paths:
-                if os.path.exists(path):
-                    chrome_path = path
-                    break
-            
-            if chrome_path:
-                chrome_options.binary_location = chrome_path
-                logger.info(f"Using Chrome at: {chrome_path}")
-            
             # Browser visibility control
             if self.headless or not self.show_browser:
                 chrome_options.add_argument('--headless')
@@ -125,7 +119,6 @@ class DelhiHighCourtLiveScraper:
             chrome_options.add_argument('--disable-domain-reliability')
             chrome_options.add_argument('--disable-component-update')
             chrome_options.add_argument('--disable-desktop-notifications')
-            chrome_options.add_argument('--aggressive-cache-discard')
             chrome_options.add_argument('--memory-pressure-off')
             chrome_options.add_argument('--disable-logging')
             chrome_options.add_argument('--disable-blink-features=AutomationControlled')
@@ -135,75 +128,80 @@ class DelhiHighCourtLiveScraper:
             # Set page load strategy for faster loading
             chrome_options.page_load_strategy = 'eager'
             
-            # Try direct Chrome start first (faster)
-            try:
-                self.driver = webdriver.Chrome(options=chrome_options)
-                logger.info("Chrome WebDriver setup successful (direct)")
-            except Exception as e1:
-                logger.warning(f"Direct Chrome start failed: {str(e1)}, trying webdriver-manager...")
-                # Fallback to webdriver-manager
-                service = Service(ChromeDriverManager().install())
-                self.driver = webdriver.Chrome(service=service, options=chrome_options)
-                logger.info("Chrome WebDriver setup successful (webdriver-manager)")
+            # Performance log used to count requests blocked over CDP
+            configure_options(chrome_options)
+            
+            # Persistent per-slot profile with a warm disk cache, if configured
+            profile = profile_manager.acquire() if profile_manager else None
+            if profile:
+                profile_manager.apply_options(chrome_options, profile)
+            else:
+                chrome_options.add_argument('--aggressive-cache-discard')
+            
+            # Chrome and chromedriver paths come from the startup discovery manifest
+            self.driver = launch_chrome(chrome_options)
+            logger.info("Chrome WebDriver setup successful")
+            
+            if profile:
+                profile_manager.bind_to_driver(self.driver, profile)
+            driver_registry.register(self.driver, owner='live')
+            
+            # Drop analytics, fonts, stylesheets and decorative images on the search form
+            apply_rules(self.driver, 'search_form')
             
             return True
         except Exception as e:
             logger.error(f"Failed to setup WebDriver: {str(e)}")
+            if profile:
+                profile_manager.release(profile)
             return False
     
     def solve_captcha(self, captcha_element):
         """Attempt to solve CAPTCHA using OCR - optimized for digit CAPTCHAs"""
         try:
-            if not TESSERACT_AVAILABLE:
-                logger.warning("Tesseract OCR not available. Cannot solve CAPTCHA automatically.")
-                return None
-                
-            # Take screenshot of CAPTCHA
-            captcha_screenshot = captcha_element.screenshot_as_png
+            # Use the original image bytes (data-URI or HTTP) instead of a screenshot
+            captcha_bytes = fetch_captcha_bytes(self.driver, captcha_element, self.session.headers)
             
-            # Convert to PIL Image
-            image = Image.open(io.BytesIO(captcha_screenshot))
+            with metrics.timer('captcha.solve'):
+                captcha_text = self.solve_captcha_bytes(captcha_bytes)
             
-            # Preprocess image for better OCR (optimized for digits)
-            image = image.convert('L')  # Convert to grayscale
+            # Keep every image for the offline solver benchmark if recording is on;
+            # unsolved ones stay unlabelled until someone labels them by hand
+            corpus = get_corpus()
+            if corpus and captcha_bytes:
+                sample_id = corpus.record(captcha_bytes, captcha_text, self.captcha_solver)
+                self.pending_captcha_sample = (sample_id, captcha_text) if captcha_text else None
             
-            # Enhance contrast and remove noise
-            from PIL import ImageEnhance, ImageFilter
-            
-            # Increase contrast
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(2.0)
-            
-            # Apply slight blur to reduce noise
-            image = image.filter(ImageFilter.MedianFilter(size=3))
-            
-            # Resize image for better OCR (make it larger)
-            width, height = image.size
-            image = image.resize((width * 3, height * 3), Image.LANCZOS)
-            
-            # Use OCR to read CAPTCHA - optimized for digits only
-            captcha_text = pytesseract.image_to_string(
-                image, 
-                config='--psm 8 -c tessedit_char_whitelist=0123456789'
-            )
-            captcha_text = captcha_text.strip()
-            
-            # Clean up the result - keep only digits
-            captcha_text = ''.join(filter(str.isdigit, captcha_text))
-            
-            logger.info(f"CAPTCHA OCR result: '{captcha_text}' (length: {len(captcha_text)})")
-            
-            # Return only if we got a reasonable result (typically 4-6 digits)
-            if len(captcha_text) >= 3 and len(captcha_text) <= 8:
-                return captcha_text
-            else:
-                logger.warning(f"CAPTCHA result seems invalid: '{captcha_text}'")
-                return None
+            return captcha_text
             
         except Exception as e:
             logger.error(f"CAPTCHA solving failed: {str(e)}")
             return None
     
+    def solve_captcha_bytes(self, captcha_bytes):
+        """OCR raw CAPTCHA image bytes (usable without a browser)"""
+        try:
+            captcha_text = solve_captcha(captcha_bytes, self.captcha_solver)
+            logger.info(f"CAPTCHA OCR result ({self.captcha_solver}): '{captcha_text}'")
+            return captcha_text
+        except Exception as e:
+            logger.error(f"CAPTCHA OCR failed: {str(e)}")
+            return None
+    
+    def confirm_captcha_sample(self):
+        """Label the last recorded CAPTCHA as correct once the site accepted it"""
+        corpus = get_corpus()
+        if corpus and self.pending_captcha_sample:
+            corpus.confirm(*self.pending_captcha_sample)
+        self.pending_captcha_sample = None
+    
+    def reject_captcha_sample(self):
+        """Mark the last recorded CAPTCHA prediction as wrong once the site refused it"""
+        corpus = get_corpus()
+        if corpus and self.pending_captcha_sample:
+            corpus.reject(self.pending_captcha_sample[0])
+        self.pending_captcha_sample = None
+    
     def scrape_case_data(self, case_type, case_number, filing_year):
         """
         Scrape live case data from Delhi High Court website
@@ -216,7 +214,11 @@ class DelhiHighCourtLiveScraper:
                 return None
             
             # Navigate to case status page
-            self.driver.get(self.case_status_url)
+            page_load_start = time.perf_counter()
+            with get_upstream().slot(FORM):
+                self.driver.get(self.case_status_url)
+            record_first_page_load(self.driver, time.perf_counter() - page_load_start)
+            driver_registry.record_page(self.driver)
             time.sleep(2)
             
             # Wait for page to load
@@ -294,7 +296,7 @@ class DelhiHighCourtLiveScraper:
                     # Method 2: Look for image-based CAPTCHA (fallback)
                     if not captcha_solved:
                         try:
-                            captcha_img = self.driver.find_element(By.XPATH, "//img[contains(@src, 'captcha') or contains(@src, 'Captcha')]")
+                            captcha_img = self.driver.find_element(By.XPATH, CAPTCHA_IMG_XPATH)
                             captcha_input_selectors = [
                                 "input[name*='captcha']",
                                 "input[id*='captcha']",
@@ -325,25 +327,8 @@ class DelhiHighCourtLiveScraper:
                     else:
                         logger.warning(f"CAPTCHA solving failed on attempt {attempt + 1}")
                         if attempt < captcha_attempts - 1:
-                            # Refresh page and try again
-                            self.driver.refresh()
-                            time.sleep(3)
-                            
-                            # Re-fill form after refresh
-                            WebDriverWait(self.driver, 10).until(
-                                EC.presence_of_element_located((By.ID, "case_type"))
-                            )
-                            
-                            case_type_select = Select(self.driver.find_element(By.ID, "case_type"))
-                            case_type_select.select_by_value(case_type)
-                            
-                            case_number_input = self.driver.find_element(By.ID, "case_number")
-                            case_number_input.clear()
-                            case_number_input.send_keys(case_number)
-                            
-                            filing_year_select = Select(self.driver.find_element(By.ID, "case_year"))
-                            filing_year_select.select_by_value(filing_year)
-                            
+                            # Get a new CAPTCHA, keeping the filled form where possible
+                            self.retry_captcha(case_type, case_number, filing_year)
                             continue
                         else:
                             logger.error("All CAPTCHA attempts failed")
@@ -411,16 +396,20 @@ class DelhiHighCourtLiveScraper:
                     logger.error(f"Error finding buttons: {str(e)}")
             
             if submit_button:
-                submit_button.click()
+                # Only the results HTML is parsed
+                apply_rules(self.driver, 'results')
+                # The slot covers the portal's answer, not just the click
+                logger.info("Submitting and waiting for results to load...")
+                page_before = self.driver.page_source
+                with get_upstream().slot(RESULTS) as slot:
+                    submit_button.click()
+                    if not wait_for_driver_answer(self.driver, page_before, 20):
+                        slot.ok = False
                 logger.info("Form submitted successfully")
             else:
                 logger.error("No submit button found")
                 return None
             
-            # Wait for results to load
-            logger.info("Waiting for results to load...")
-            time.sleep(8)
-            
             # Keep browser open longer if visible for debugging
             if self.show_browser and not self.headless:
                 logger.info("Results loaded - keeping browser open for 10 seconds for inspection...")
@@ -428,8 +417,13 @@ class DelhiHighCourtLiveScraper:
             
             # Check for "No records found" or similar messages
             page_source = self.driver.page_source.lower()
+            if captcha_rejected(page_source):
+                logger.warning(f"CAPTCHA rejected by site for: {case_type} {case_number}/{filing_year}")
+                self.reject_captcha_sample()
+                return None
             if any(phrase in page_source for phrase in ['no record found', 'no records found', 'case not found', 'invalid case']):
                 logger.info(f"Case not found: {case_type} {case_number}/{filing_year}")
+                self.confirm_captcha_sample()
                 if self.show_browser:
                     input("Press Enter to close browser...")
                 return None
@@ -439,6 +433,7 @@ class DelhiHighCourtLiveScraper:
             
             if case_data:
                 logger.info(f"Successfully scraped case data for: {case_type} {case_number}/{filing_year}")
+                self.confirm_captcha_sample()
                 if self.show_browser:
                     logger.info("Case data found - keeping browser open for 15 seconds...")
                     time.sleep(15)
@@ -454,26 +449,142 @@ class DelhiHighCourtLiveScraper:
             return None
         finally:
             if self.driver:
+                network = collect_stats(self.driver)
+                if network['requests_blocked']:
+                    logger.info(f"Blocked {network['requests_blocked']} request(s), "
+                                f"~{network['bytes_saved'] / 1024:.0f} KB saved")
                 self.driver.quit()
     
-    def scrape_orders_page(self, orders_url):
-        """Scrape orders page to get list of orders with download links"""
+    def quit_driver(self):
+        """Quit the current driver, ignoring errors from a crashed browser"""
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+    
+    def fill_search_form(self, case_type, case_number, filing_year):
+        """Fill case type, number and year on the loaded search form"""
+        case_type_select = Select(self.driver.find_element(By.ID, "case_type"))
+        case_type_select.select_by_value(case_type)
+        
+        case_number_input = self.driver.find_element(By.ID, "case_number")
+        case_number_input.clear()
+        case_number_input.send_keys(case_number)
+        
+        filing_year_select = Select(self.driver.find_element(By.ID, "case_year"))
+        filing_year_select.select_by_value(filing_year)
+    
+    def retry_captcha(self, case_type, case_number, filing_year):
+        """Load a new CAPTCHA, reloading and refilling the form only if the site forces it"""
+        apply_rules(self.driver, 'search_form')
+        start = time.perf_counter()
+        if (refresh_captcha_in_place(self.driver) and
+                form_state_intact(self.driver, case_type, case_number, filing_year)):
+            metrics.observe('captcha.retry.in_place', time.perf_counter() - start)
+            logger.info("Refreshed CAPTCHA in place, form state kept")
+            return
+        
+        logger.info("In-place CAPTCHA refresh not possible, reloading the form")
+        start = time.perf_counter()
+        self.driver.refresh()
+        time.sleep(3)
+        
+        # Re-fill form after refresh
+        WebDriverWait(self.driver, 10).until(
+            EC.presence_of_element_located((By.ID, "case_type"))
+        )
+        self.fill_search_form(case_type, case_number, filing_year)
+        metrics.observe('captcha.retry.full_reload', time.perf_counter() - start)
+    
+    def enable_shared_browser(self, shared_browser):
+        """Open a browser context in one shared Chrome instead of starting Chrome per driver"""
+        self.shared_browser = shared_browser
+    
+    def enable_hybrid_mode(self, hybrid_session):
+        """Fetch orders pages and PDFs over the shared HTTP session"""
+        self.hybrid_session = hybrid_session
+        self.session = hybrid_session.session
+    
+    def absolute_court_url(self, href):
+        """Turn a relative court link into an absolute URL"""
+        if href and not href.startswith("http"):
+            return f"https://delhihighcourt.nic.in{href}"
+        return href
+    
+    def parse_orders_html(self, html):
+        """Parse the orders table from page HTML (same fields as scrape_orders_page)"""
+        orders_data = {
+            'orders': [],
+            'total_orders': 0,
+            'raw_html': html
+        }
+        
+        soup = BeautifulSoup(html, 'html.parser')
+        table = soup.find('table')
+        if not table:
+            logger.warning("No orders table found in HTML")
+            return orders_data
+        
+        # Structure: S.No. | Case No/Order Link | Date of Order | Corrigendum Link/Corr. Date | HINDI ORDER
+        for i, row in enumerate(table.find_all('tr')[1:], 1):  # Skip header row
+            cells = row.find_all('td')
+            if len(cells) < 3:
+                continue
+            
+            def cell_link(cell):
+                link = cell.find('a')
+                return self.absolute_court_url(link.get('href')) if link else None
+            
+            orders_data['orders'].append({
+                'sno': cells[0].get_text(strip=True) or str(i),
+                'order_text': cells[1].get_text(strip=True),
+                'order_date': cells[2].get_text(strip=True),
+                'pdf_link': cell_link(cells[1]),
+                'corrigendum_date': cells[3].get_text(strip=True) if len(cells) > 3 else "",
+                'corrigendum_link': cell_link(cells[3]) if len(cells) > 3 else None,
+                'hindi_link': cell_link(cells[4]) if len(cells) > 4 else None
+            })
+        
+        orders_data['total_orders'] = len(orders_data['orders'])
+        return orders_data
+    
+    def scrape_orders_page(self, orders_url, deadline=None):
+        """
+        Scrape orders page to get list of orders with download links.
+        deadline checkpoints stop the work early (Cancelled) once nobody waits for it.
+        """
+        deadline = deadline or Deadline()
         try:
             logger.info(f"Scraping orders page: {orders_url}")
+            deadline.checkpoint('loading orders page')
             
-            # Initialize driver if not already done or if it's old
-            current_time = time.time()
-            driver_age = current_time - self.driver_setup_time if self.driver_setup_time else float('inf')
-            
-            if (not self.driver or 
-                not hasattr(self.driver, 'session_id') or 
-                driver_age > self.max_driver_age):
-                
-                if self.driver and driver_age > self.max_driver_age:
-                    logger.info("Driver is old, creating fresh one for better performance")
-                    
+            # Hybrid mode: plain HTTP with the handed-off session, browser only as fallback
+            if self.hybrid_session:
+                try:
+                    with get_upstream().slot(ORDERS, deadline=deadline) as slot:
+                        response = slot.check(self.hybrid_session.request('GET', orders_url))
+                    if response is not None and response.status_code == 200:
+                        orders_data = self.parse_orders_html(response.text)
+                        if orders_data['total_orders'] > 0:
+                            logger.info(f"Parsed {orders_data['total_orders']} orders over HTTP")
+                            return orders_data
+                    logger.info("Orders page not usable over HTTP, falling back to browser")
+                except Exception as e:
+                    logger.warning(f"HTTP orders fetch failed, falling back to browser: {str(e)}")
+            
+            # Initialize driver if not already done, or recycle it once it crosses a policy limit
+            recycle_reason = None
+            if self.driver and hasattr(self.driver, 'session_id'):
+                recycle_reason = driver_registry.recycle_reason(self.driver, self.recycle_policy)
+            
+            if not self.driver or not hasattr(self.driver, 'session_id') or recycle_reason:
+                if recycle_reason:
+                    logger.info(f"Recycling driver ({recycle_reason})")
+                    metrics.incr('driver.recycled')
+                    self.quit_driver()
                 self.setup_driver()
-                self.driver_setup_time = current_time
             else:
                 # Check if driver is still alive
                 try:
@@ -481,17 +592,25 @@ class DelhiHighCourtLiveScraper:
                     logger.info("Reusing existing driver session for better speed")
                 except:
                     logger.info("Driver session expired, creating new one")
+                    self.quit_driver()
                     self.setup_driver()
-                    self.driver_setup_time = current_time
             
-            # Navigate to orders page
-            self.driver.get(orders_url)
-            time.sleep(3)
+            # Navigate to orders page (HTML only, every subresource blocked)
+            deadline.checkpoint('loading orders page')
+            apply_rules(self.driver, 'orders')
+            page_load_start = time.perf_counter()
+            with get_upstream().slot(ORDERS, deadline=deadline):
+                self.driver.get(orders_url)
+            record_first_page_load(self.driver, time.perf_counter() - page_load_start)
+            driver_registry.record_page(self.driver)
+            deadline.sleep(3)
             
             # Wait for page to load
-            WebDriverWait(self.driver, 10).until(
+            WebDriverWait(self.driver, deadline.timeout(10)).until(
                 EC.presence_of_element_located((By.TAG_NAME, "table"))
             )
+            collect_stats(self.driver)
+            deadline.checkpoint('parsing orders')
             
             orders_data = {
                 'orders': [],
@@ -599,8 +718,12 @@ class DelhiHighCourtLiveScraper:
             
             return orders_data
             
+        except Cancelled as e:
+            logger.info(f"Orders scrape stopped: {str(e)}")
+            raise
         except Exception as e:
             logger.error(f"Error scraping orders page: {str(e)}", exc_info=True)
+            driver_registry.record_error(self.driver)
             return {
                 'orders': [],
                 'total_orders': 0,
@@ -622,7 +745,8 @@ class DelhiHighCourtLiveScraper:
                 'Upgrade-Insecure-Requests': '1'
             }
             
-            response = requests.get(pdf_url, headers=headers, timeout=30, stream=True)
+            with get_upstream().slot(PDF) as slot:
+                response = slot.check(requests.get(pdf_url, headers=headers, timeout=30, stream=True))
             response.raise_for_status()
             
             # Check if response is actually a PDF
@@ -907,8 +1031,14 @@ class DelhiHighCourtLiveScraper:
         try:
             logger.info(f"Downloading PDF from: {pdf_url}")
             
-            # Make request to download PDF
-            response = self.session.get(pdf_url, timeout=30, stream=True)
+            # Make request to download PDF (re-bootstraps the hybrid session if it expired)
+            with get_upstream().slot(PDF) as slot:
+                if self.hybrid_session:
+                    response = slot.check(self.hybrid_session.request('GET', pdf_url, timeout=30))
+                else:
+                    response = slot.check(self.session.get(pdf_url, timeout=30, stream=True))
+            if response is None:
+                return None
             response.raise_for_status()
             
             # Check if response is actually a PDF
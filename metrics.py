@@ -0,0 +1,86 @@
+"""
+Lightweight in-process metrics for scraper and request timings
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile (0-100) of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class MetricsRegistry:
+    """Thread-safe counters and timing samples, exposed via /debug/metrics"""
+
+    def __init__(self, max_samples=1000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._timings = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._timing_totals = defaultdict(lambda: [0, 0.0])
+
+    def incr(self, name, value=1):
+        """Increase a counter"""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name, seconds):
+        """Record one timing sample in seconds"""
+        with self._lock:
+            self._timings[name].append(seconds)
+            totals = self._timing_totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+
+    @contextmanager
+    def timer(self, name):
+        """Time the enclosed block and record it under name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def summary(self, name):
+        """Summarise recorded samples for one timing"""
+        with self._lock:
+            samples = list(self._timings.get(name, ()))
+            count, total = self._timing_totals.get(name, (0, 0.0))
+        if not samples:
+            return None
+        return {
+            'count': count,
+            'avg_ms': round(total / count * 1000, 2),
+            'p50_ms': round(percentile(samples, 50) * 1000, 2),
+            'p99_ms': round(percentile(samples, 99) * 1000, 2),
+            'max_ms': round(max(samples) * 1000, 2)
+        }
+
+    def snapshot(self):
+        """Return all counters and timing summaries as a JSON-friendly dict"""
+        with self._lock:
+            counters = dict(self._counters)
+            names = list(self._timings.keys())
+        return {
+            'counters': counters,
+            'timings': {name: self.summary(name) for name in sorted(names)}
+        }
+
+    def reset(self):
+        """Drop all recorded values"""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+            self._timing_totals.clear()
+
+
+# Process-wide registry shared by the scrapers and the Flask app
+metrics = MetricsRegistry()
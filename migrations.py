@@ -0,0 +1,256 @@
+"""
+Schema migrations for existing databases
+
+db.create_all() only creates missing tables; it never changes tables that
+already exist. Each schema change is therefore a numbered step here, and the
+number of the last applied step is kept in the schema_version table. A fresh
+database is created at the latest version directly. Run pending steps with
+
+    python run.py migrate
+
+Steps are written to be idempotent (they check what is already there), so
+an interrupted migration can simply be run again.
+"""
+
+import json
+import logging
+
+from sqlalchemy import inspect, text
+
+from models import db, CaseSnapshot, RawPage, Party, Order, UpstreamSchedule
+from case_store import parse_order_date
+from raw_pages import compress, decompress, page_hash
+from results_parser import parse_results_html
+from snapshots import encode_version, snapshot_fields
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(conn, table):
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+
+def _indexes(conn, table):
+    return {index['name'] for index in inspect(conn).get_indexes(table)}
+
+
+def _add_column(conn, table, column, ddl_type):
+    if column not in _columns(conn, table):
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl_type}'))
+
+
+def upsert_by_natural_key(conn):
+    """One CaseData row per (case_type, case_number, filing_year), referenced from CaseQuery"""
+    _add_column(conn, 'case_data', 'content_hash', 'VARCHAR(64)')
+    _add_column(conn, 'case_data', 'updated_at', 'TIMESTAMP')
+    _add_column(conn, 'case_data', 'checked_at', 'TIMESTAMP')
+    _add_column(conn, 'case_queries', 'case_data_id', 'INTEGER REFERENCES case_data (id)')
+
+    # Keep the newest row per case key and point every query for that key at it
+    conn.execute(text('''
+        UPDATE case_queries SET case_data_id = (
+            SELECT MAX(d.id) FROM case_data d
+            WHERE d.case_type = case_queries.case_type
+              AND d.case_number = case_queries.case_number
+              AND d.filing_year = case_queries.filing_year
+        )
+        WHERE case_data_id IS NULL
+    '''))
+    removed = conn.execute(text('''
+        DELETE FROM case_data WHERE id NOT IN (
+            SELECT MAX(id) FROM case_data GROUP BY case_type, case_number, filing_year
+        )
+    ''')).rowcount
+    conn.execute(text('UPDATE case_data SET updated_at = created_at WHERE updated_at IS NULL'))
+    conn.execute(text('UPDATE case_data SET checked_at = created_at WHERE checked_at IS NULL'))
+
+    if 'uq_case_data_natural_key' not in _indexes(conn, 'case_data'):
+        conn.execute(text(
+            'CREATE UNIQUE INDEX uq_case_data_natural_key ON case_data (case_type, case_number, filing_year)'
+        ))
+    logger.info(f"Collapsed case_data to one row per case key ({removed} duplicate rows removed)")
+
+
+def snapshot_history(conn):
+    """Delta-compressed version history per case"""
+    CaseSnapshot.__table__.create(conn, checkfirst=True)
+
+
+def raw_pages_out_of_line(conn):
+    """Move case_data.raw_response into compressed, hash-keyed raw_pages rows"""
+    RawPage.__table__.create(conn, checkfirst=True)
+    _add_column(conn, 'case_data', 'raw_page_hash', 'VARCHAR(64) REFERENCES raw_pages (hash)')
+    if 'raw_response' not in _columns(conn, 'case_data'):
+        return
+
+    moved = saved = 0
+    while True:
+        # A batch at a time, so the whole table's HTML is never in memory at once
+        rows = conn.execute(text(
+            'SELECT id, raw_response FROM case_data '
+            'WHERE raw_response IS NOT NULL AND raw_page_hash IS NULL LIMIT 100'
+        )).fetchall()
+        if not rows:
+            break
+        for case_id, html in rows:
+            key = page_hash(html)
+            if conn.execute(text('SELECT 1 FROM raw_pages WHERE hash = :key'), {'key': key}).first() is None:
+                encoding, data = compress(html)
+                conn.execute(RawPage.__table__.insert().values(
+                    hash=key, encoding=encoding, data=data, size=len(html.encode('utf-8'))
+                ))
+                saved += len(html.encode('utf-8')) - len(data)
+            conn.execute(text('UPDATE case_data SET raw_page_hash = :key, raw_response = NULL WHERE id = :id'),
+                         {'key': key, 'id': case_id})
+            moved += 1
+
+    conn.execute(text('ALTER TABLE case_data DROP COLUMN raw_response'))
+    logger.info(f"Moved {moved} raw pages out of case_data ({saved} bytes saved by compression)")
+
+
+def _json_list(value):
+    try:
+        items = json.loads(value) if value else []
+    except ValueError:
+        return []
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+
+def normalized_parties_orders(conn):
+    """Move the parties and orders_judgments JSON columns into case_parties and case_orders rows"""
+    Party.__table__.create(conn, checkfirst=True)
+    Order.__table__.create(conn, checkfirst=True)
+    columns = _columns(conn, 'case_data')
+    if 'parties' not in columns or 'orders_judgments' not in columns:
+        return
+
+    moved = last_id = 0
+    while True:
+        rows = conn.execute(text(
+            'SELECT id, parties, orders_judgments FROM case_data WHERE id > :last_id ORDER BY id LIMIT 500'
+        ), {'last_id': last_id}).fetchall()
+        if not rows:
+            break
+        for case_id, parties, orders in rows:
+            # Replace rather than add, so running the step again is harmless
+            conn.execute(Party.__table__.delete().where(Party.__table__.c.case_data_id == case_id))
+            conn.execute(Order.__table__.delete().where(Order.__table__.c.case_data_id == case_id))
+            party_rows = [
+                {'case_data_id': case_id, 'position': position, 'party_type': item.get('type'), 'name': item.get('name')}
+                for position, item in enumerate(_json_list(parties))
+            ]
+            order_rows = [
+                {'case_data_id': case_id, 'position': position, 'date_text': item.get('date'),
+                 'order_date': parse_order_date(item.get('date')), 'description': item.get('description'),
+                 'pdf_link': item.get('pdf_link')}
+                for position, item in enumerate(_json_list(orders))
+            ]
+            if party_rows:
+                conn.execute(Party.__table__.insert(), party_rows)
+            if order_rows:
+                conn.execute(Order.__table__.insert(), order_rows)
+            moved += len(party_rows) + len(order_rows)
+        last_id = rows[-1][0]
+
+    conn.execute(text('ALTER TABLE case_data DROP COLUMN parties'))
+    conn.execute(text('ALTER TABLE case_data DROP COLUMN orders_judgments'))
+    logger.info(f"Moved {moved} parties and orders out of case_data JSON columns")
+
+
+# (table, index name, columns) added by step 5
+HOT_PATH_INDEXES = [
+    ('case_queries', 'ix_case_queries_timestamp', 'timestamp'),
+    ('case_queries', 'ix_case_queries_case_key', 'case_type, case_number, filing_year'),
+    ('case_data', 'ix_case_data_query_id', 'query_id'),
+    ('case_data', 'ix_case_data_created_at', 'created_at'),
+]
+
+
+def hot_path_indexes(conn):
+    """Indexes for /history ordering and lookups by case key and query_id"""
+    for table, name, columns in HOT_PATH_INDEXES:
+        if name not in _indexes(conn, table):
+            conn.execute(text(f'CREATE INDEX {name} ON {table} ({columns})'))
+
+
+def upstream_schedule(conn):
+    """Shared pacing table for UPSTREAM_COORDINATION=db"""
+    UpstreamSchedule.__table__.create(conn, checkfirst=True)
+
+
+def snapshot_baselines(conn):
+    """A full version 1 snapshot for every case stored before snapshot history existed"""
+    added = last_id = 0
+    while True:
+        rows = conn.execute(text(
+            'SELECT c.id, c.status, p.encoding, p.data FROM case_data c '
+            'LEFT JOIN raw_pages p ON p.hash = c.raw_page_hash '
+            'WHERE c.id > :last_id AND NOT EXISTS (SELECT 1 FROM case_snapshots s WHERE s.case_data_id = c.id) '
+            'ORDER BY c.id LIMIT 100'
+        ), {'last_id': last_id}).fetchall()
+        if not rows:
+            break
+        for case_id, status, encoding, data in rows:
+            html = decompress(encoding, data) if data is not None else ''
+            case_data = (parse_results_html(html) if html else None) or {}
+            fields_json, html_blob = encode_version(None, snapshot_fields(case_data, status), html, True)
+            # Dated when the stored content last changed, which is what it captures
+            conn.execute(text(
+                'INSERT INTO case_snapshots (case_data_id, version, is_full, fields, html, content_hash, created_at) '
+                'SELECT id, 1, :full, :fields, :html, content_hash, updated_at FROM case_data WHERE id = :id'
+            ), {'full': True, 'fields': fields_json, 'html': html_blob, 'id': case_id})
+            added += 1
+        last_id = rows[-1][0]
+    logger.info(f"Added a baseline snapshot for {added} cases stored before snapshot history")
+
+
+# (version, description, step); append new steps at the end, never renumber
+MIGRATIONS = [
+    (1, 'upsert case records by natural key', upsert_by_natural_key),
+    (2, 'case snapshot history', snapshot_history),
+    (3, 'compressed out-of-line raw pages', raw_pages_out_of_line),
+    (4, 'normalized parties and orders tables', normalized_parties_orders),
+    (5, 'indexes for the hot lookup paths', hot_path_indexes),
+    (6, 'upstream pacing schedule', upstream_schedule),
+    (7, 'baseline snapshots for cases stored before history', snapshot_baselines),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Last applied migration, or None if the database has never been migrated"""
+    if 'schema_version' not in inspect(conn).get_table_names():
+        return None
+    return conn.execute(text('SELECT version FROM schema_version')).scalar() or 0
+
+
+def _set_version(conn, version):
+    conn.execute(text('DELETE FROM schema_version'))
+    conn.execute(text('INSERT INTO schema_version (version) VALUES (:version)'), {'version': version})
+
+
+def migrate():
+    """Bring the database up to SCHEMA_VERSION; call inside an app context. Returns the steps applied."""
+    applied = []
+    with db.engine.begin() as conn:
+        version = current_version(conn)
+        if version is None:
+            conn.execute(text('CREATE TABLE schema_version (version INTEGER NOT NULL)'))
+            tables = inspect(conn).get_table_names()
+            # A brand-new database gets the current schema from the models directly
+            version = 0 if 'case_data' in tables else SCHEMA_VERSION
+            _set_version(conn, version)
+
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        logger.info(f"Applying migration {step_version}: {description}")
+        with db.engine.begin() as conn:
+            step(conn)
+            _set_version(conn, step_version)
+        applied.append(step_version)
+
+    # New tables (and a fresh database) come straight from the models
+    db.create_all()
+    return applied
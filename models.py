@@ -6,35 +6,140 @@ db = SQLAlchemy()
 class CaseQuery(db.Model):
     """Model to store case search queries"""
     __tablename__ = 'case_queries'
+    __table_args__ = (
+        db.Index('ix_case_queries_timestamp', 'timestamp'),  # /history, newest first
+        db.Index('ix_case_queries_case_key', 'case_type', 'case_number', 'filing_year'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     case_type = db.Column(db.String(100), nullable=False)
     case_number = db.Column(db.String(50), nullable=False)
     filing_year = db.Column(db.String(10), nullable=False)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # Lightweight reference to the (single) stored record for this case key, if the search found it
+    case_data_id = db.Column(db.Integer, db.ForeignKey('case_data.id', use_alter=True, name='fk_case_queries_case_data'))
     
     # Relationship with case data
-    case_data = db.relationship('CaseData', backref='query', lazy=True)
+    case_data = db.relationship('CaseData', backref='query', lazy=True, foreign_keys='CaseData.query_id')
+    case_record = db.relationship('CaseData', foreign_keys=[case_data_id])
     
     def __repr__(self):
         return f'<CaseQuery {self.case_type}/{self.case_number}/{self.filing_year}>'
 
 class CaseData(db.Model):
-    """Model to store scraped case data"""
+    """Model to store scraped case data, one row per case key"""
     __tablename__ = 'case_data'
+    __table_args__ = (
+        db.Index('uq_case_data_natural_key', 'case_type', 'case_number', 'filing_year', unique=True),
+        db.Index('ix_case_data_query_id', 'query_id'),
+        db.Index('ix_case_data_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     query_id = db.Column(db.Integer, db.ForeignKey('case_queries.id'), nullable=False)
     case_type = db.Column(db.String(100), nullable=False)
     case_number = db.Column(db.String(50), nullable=False)
     filing_year = db.Column(db.String(10), nullable=False)
-    parties = db.Column(db.Text)  # JSON string of parties
     filing_date = db.Column(db.String(50))
     next_hearing_date = db.Column(db.String(50))
-    orders_judgments = db.Column(db.Text)  # JSON string of orders/judgments
-    raw_response = db.Column(db.Text)  # Raw HTML response
+    raw_page_hash = db.Column(db.String(64), db.ForeignKey('raw_pages.hash'))  # results HTML, stored compressed in raw_pages
     status = db.Column(db.String(100))
+    content_hash = db.Column(db.String(64))  # sha256 of the parsed cases, to skip rewriting unchanged results
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))  # last content change
+    checked_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))  # last time the portal confirmed it
+    
+    parties = db.relationship('Party', order_by='Party.position', cascade='all, delete-orphan', lazy=True)
+    orders = db.relationship('Order', order_by='Order.position', cascade='all, delete-orphan', lazy=True)
+    
+    @property
+    def last_checked(self):
+        """When the stored content was last confirmed by the portal"""
+        return self.checked_at or self.created_at
+    
+    def __repr__(self):
+        return f'<CaseData {self.case_type}/{self.case_number}/{self.filing_year}>'
+
+class Party(db.Model):
+    """One party to a case, in the order the court lists them"""
+    __tablename__ = 'case_parties'
+    __table_args__ = (
+        db.UniqueConstraint('case_data_id', 'position', name='uq_case_parties_position'),
+        db.Index('ix_case_parties_name', 'name'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    case_data_id = db.Column(db.Integer, db.ForeignKey('case_data.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    party_type = db.Column(db.String(50))  # Petitioner, Respondent, Appellant...
+    name = db.Column(db.String(500))
+    
+    def to_dict(self):
+        return {'type': self.party_type, 'name': self.name}
+    
+    def __repr__(self):
+        return f'<Party {self.party_type}: {self.name}>'
+
+class Order(db.Model):
+    """One order or judgment of a case; position is its index on the case page"""
+    __tablename__ = 'case_orders'
+    __table_args__ = (
+        db.UniqueConstraint('case_data_id', 'position', name='uq_case_orders_position'),
+        db.Index('ix_case_orders_date', 'order_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    case_data_id = db.Column(db.Integer, db.ForeignKey('case_data.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    order_date = db.Column(db.Date)  # parsed from date_text when it is a real date
+    date_text = db.Column(db.String(50))  # as shown by the portal
+    description = db.Column(db.Text)
+    pdf_link = db.Column(db.String(500))
+    
+    def to_dict(self):
+        return {'date': self.date_text, 'description': self.description, 'pdf_link': self.pdf_link}
+    
+    def __repr__(self):
+        return f'<Order {self.case_data_id}#{self.position} {self.date_text}>'
+
+class RawPage(db.Model):
+    """Compressed results HTML, keyed by its sha256 (see raw_pages.py)"""
+    __tablename__ = 'raw_pages'
+    
+    hash = db.Column(db.String(64), primary_key=True)
+    encoding = db.Column(db.String(10), nullable=False)  # zstd or zlib
+    data = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer)  # uncompressed bytes
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f'<RawPage {self.hash[:12]} {self.encoding}>'
+
+class CaseSnapshot(db.Model):
+    """One historical version of a case's content, stored in full or as a delta (see snapshots.py)"""
+    __tablename__ = 'case_snapshots'
+    __table_args__ = (
+        db.UniqueConstraint('case_data_id', 'version', name='uq_case_snapshots_version'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    case_data_id = db.Column(db.Integer, db.ForeignKey('case_data.id'), nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False)
+    is_full = db.Column(db.Boolean, nullable=False, default=False)
+    fields = db.Column(db.Text, nullable=False)  # JSON: all flattened fields, or a diff against the previous version
+    html = db.Column(db.LargeBinary)  # zlib-compressed HTML, or a delta against the previous version; NULL if unchanged
+    content_hash = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f'<CaseSnapshot {self.case_data_id} v{self.version}>'
+
+class UpstreamSchedule(db.Model):
+    """Next free request time per endpoint class, shared by processes pacing the portal (see politeness.py)"""
+    __tablename__ = 'upstream_schedule'
+    
+    endpoint = db.Column(db.String(20), primary_key=True)
+    next_slot_at = db.Column(db.Float, nullable=False)  # epoch seconds
     
     def __repr__(self):
-        return f'<CaseData {self.case_type}/{self.case_number}/{self.filing_year}>'
\ No newline at end of file
+        return f'<UpstreamSchedule {self.endpoint} {self.next_slot_at}>'
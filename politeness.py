@@ -0,0 +1,338 @@
+"""
+Politeness scheduler for requests to the court portal
+
+Every scraper path (Selenium, CDP, hybrid HTTP, pooled form slots, PDF
+downloads) asks this scheduler for a token before it hits
+delhihighcourt.nic.in. There is one token bucket per endpoint class:
+
+* form - the case status page (and its CAPTCHA image)
+* results - submitting the search
+* orders - the orders page of a case
+* pdf - order/judgment PDFs
+
+Each bucket's rate adapts AIMD-style to what the portal reports back: slow
+responses (over UPSTREAM_TARGET_LATENCY), 429s, 5xx and exceptions halve
+it, fast successes raise it slowly back to its ceiling. Batch work (debug
+routes, benchmarks, pre-arming pooled form slots) may not take the last
+`reserve` tokens of a bucket, so interactive searches always find capacity.
+
+With UPSTREAM_COORDINATION=db, processes sharing DATABASE_URL also pace
+themselves through a small table holding the next free slot per endpoint
+class (upstream_schedule, created by migration 6), so several workers
+together stay within one budget.
+
+Waiting for a token respects the caller's Deadline: it stops with Cancelled
+once nobody wants the result, and with DeadlineExceeded as soon as the
+token would only come after the budget. Callers without a Deadline wait at
+most UPSTREAM_MAX_WAIT seconds. A slot that ends after its Deadline has
+run out is not reported, since the wait was cut short by our own budget
+rather than by the portal.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from admission import INTERACTIVE
+from deadline import Deadline, DeadlineExceeded, Cancelled
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FORM = 'form'
+RESULTS = 'results'
+ORDERS = 'orders'
+PDF = 'pdf'
+
+# Requests per second (ceiling), burst size and tokens kept for interactive requests
+DEFAULT_LIMITS = {
+    FORM: {'rate': 1.0, 'burst': 4, 'reserve': 1},
+    RESULTS: {'rate': 1.0, 'burst': 4, 'reserve': 1},
+    ORDERS: {'rate': 0.5, 'burst': 2, 'reserve': 1},
+    PDF: {'rate': 2.0, 'burst': 4, 'reserve': 1}
+}
+
+# Longest a token wait may block between checks for cancellation
+POLL_INTERVAL = 0.5
+
+_context = threading.local()
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def load_limits():
+    """Default limits, overridden per endpoint class by the UPSTREAM_LIMITS JSON file"""
+    limits = {name: dict(values) for name, values in DEFAULT_LIMITS.items()}
+    path = os.getenv('UPSTREAM_LIMITS')
+    if path:
+        try:
+            with open(path) as f:
+                for name, values in json.load(f).items():
+                    limits.setdefault(name, {}).update(values)
+        except Exception as e:
+            logger.warning(f"Could not load upstream limits from {path}: {str(e)}")
+    return limits
+
+
+def current_priority():
+    """Priority of the work running on this thread (interactive unless marked otherwise)"""
+    return getattr(_context, 'priority', INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    """Mark the upstream requests made on this thread inside the block as INTERACTIVE or BATCH"""
+    previous = current_priority()
+    _context.priority = level
+    try:
+        yield
+    finally:
+        _context.priority = previous
+
+
+class TokenBucket:
+    """Token bucket with an adaptive refill rate and an interactive reserve"""
+
+    def __init__(self, name, rate, burst, reserve=1, min_rate=0.05,
+                 target_latency=5.0, increase=0.05, decrease=0.5, cooldown=5.0):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.reserve = min(reserve, burst - 1)
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, level=INTERACTIVE, deadline=None):
+        """
+        Block until a token is available for this priority; returns the seconds
+        waited. Raises Cancelled or DeadlineExceeded as described for the module.
+        """
+        floor = 1 + (self.reserve if level != INTERACTIVE else 0)
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                self._refill()
+                if self.tokens >= floor:
+                    self.tokens -= 1
+                    return time.monotonic() - start
+                wait = (floor - self.tokens) / self.rate
+                if deadline is not None:
+                    if deadline.cancelled():
+                        raise Cancelled(f"Cancelled while waiting for an upstream {self.name} token")
+                    if wait > deadline.remaining():
+                        raise DeadlineExceeded(f"Upstream {self.name} token not available within the deadline "
+                                               f"({wait:.1f}s needed, {deadline.remaining():.1f}s left)")
+                # Sleep until enough has refilled; woken early when the rate changes
+                self._cond.wait(min(wait, POLL_INTERVAL))
+
+    def report(self, latency, ok):
+        """Adapt the rate: multiplicative decrease on trouble, additive increase on fast successes"""
+        with self._cond:
+            self._refill()
+            now = time.monotonic()
+            if not ok or latency > self.target_latency:
+                # One decrease per cooldown, so a burst of failures from one incident counts once
+                if now - self.last_decrease >= self.cooldown:
+                    self.rate = max(self.min_rate, self.rate * self.decrease)
+                    self.last_decrease = now
+                    metrics.incr(f'upstream.{self.name}.backoff')
+                    logger.warning(f"🐢 Upstream {self.name} backing off to {self.rate:.2f} req/s "
+                                   f"({'error' if not ok else f'{latency:.1f}s response'})")
+            elif self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            self._refill()
+            return {
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'tokens': round(self.tokens, 2),
+                'burst': self.burst,
+                'reserve': self.reserve
+            }
+
+
+class DatabaseCoordinator:
+    """Cross-process pacing: one row per endpoint class with the next free request time"""
+
+    def __init__(self, database_url):
+        from sqlalchemy import create_engine, inspect
+        from models import UpstreamSchedule
+        self.engine = create_engine(database_url, pool_pre_ping=True)
+        self.table = UpstreamSchedule.__table__
+        if not inspect(self.engine).has_table(self.table.name):
+            raise RuntimeError(f"table {self.table.name} is missing, run 'python run.py migrate'")
+
+    def reserve(self, endpoint, interval):
+        """Claim the next shared slot for endpoint; returns seconds to wait for it"""
+        from sqlalchemy import select, update, insert, case
+        now = time.time()
+        table = self.table
+        with self.engine.begin() as conn:
+            # Single UPDATE so concurrent processes never hand out the same slot
+            updated = conn.execute(
+                update(table)
+                .where(table.c.endpoint == endpoint)
+                .values(next_slot_at=case((table.c.next_slot_at > now, table.c.next_slot_at), else_=now) + interval)
+            )
+            if updated.rowcount == 0:
+                conn.execute(insert(table).values(endpoint=endpoint, next_slot_at=now + interval))
+                return 0.0
+            next_slot_at = conn.execute(
+                select(table.c.next_slot_at).where(table.c.endpoint == endpoint)
+            ).scalar()
+        # next_slot_at now marks the slot after ours
+        return max(0.0, next_slot_at - interval - now)
+
+
+class PolitenessScheduler:
+    """Token buckets per endpoint class, shared by every scraper in the process"""
+
+    def __init__(self, limits=None, target_latency=5.0, coordinator=None, max_wait=60.0):
+        # max_wait bounds the token wait of callers that pass no Deadline
+        self.max_wait = max_wait
+        self.buckets = {
+            name: TokenBucket(name, values['rate'], values['burst'], values.get('reserve', 1),
+                              target_latency=target_latency)
+            for name, values in (limits or DEFAULT_LIMITS).items()
+        }
+        self.coordinator = coordinator
+        self.enabled = True
+
+    @classmethod
+    def from_env(cls):
+        """Build the scheduler from UPSTREAM_* settings"""
+        coordinator = None
+        if os.getenv('UPSTREAM_COORDINATION', 'none').lower() == 'db':
+            try:
+                coordinator = DatabaseCoordinator(os.getenv('DATABASE_URL', 'sqlite:///court_data.db'))
+            except Exception as e:
+                logger.warning(f"Upstream DB coordination unavailable, pacing per process: {str(e)}")
+        scheduler = cls(
+            limits=load_limits(),
+            target_latency=float(os.getenv('UPSTREAM_TARGET_LATENCY', '5')),
+            coordinator=coordinator,
+            max_wait=float(os.getenv('UPSTREAM_MAX_WAIT', '60'))
+        )
+        scheduler.enabled = os.getenv('UPSTREAM_SCHEDULER', 'true').lower() == 'true'
+        return scheduler
+
+    def acquire(self, endpoint, level=None, deadline=None):
+        """Wait for a token for endpoint, within deadline (or max_wait); returns the seconds waited"""
+        if not self.enabled:
+            return 0.0
+        level = current_priority() if level is None else level
+        deadline = deadline or Deadline(self.max_wait)
+        bucket = self.buckets[endpoint]
+        waited = bucket.acquire(level, deadline)
+        if self.coordinator:
+            try:
+                shared_wait = self.coordinator.reserve(endpoint, 1.0 / bucket.rate)
+            except Exception as e:
+                logger.warning(f"Upstream DB coordination failed, continuing with local pacing: {str(e)}")
+                shared_wait = 0.0
+            if shared_wait > deadline.remaining():
+                raise DeadlineExceeded(f"Shared upstream {endpoint} slot is {shared_wait:.1f}s away, "
+                                       f"{deadline.remaining():.1f}s left")
+            self._sleep(shared_wait, deadline)
+            waited += shared_wait
+        metrics.observe(f'upstream.{endpoint}.wait', waited)
+        return waited
+
+    def _sleep(self, seconds, deadline):
+        """Sleep in short steps, raising Cancelled as soon as the caller gives up"""
+        wake_at = time.monotonic() + seconds
+        while True:
+            remaining = wake_at - time.monotonic()
+            if remaining <= 0:
+                return
+            if deadline.cancelled():
+                raise Cancelled("Cancelled while waiting for a shared upstream slot")
+            time.sleep(min(remaining, POLL_INTERVAL))
+
+    def report(self, endpoint, latency, ok=True):
+        """Feed one response back into the endpoint's rate"""
+        if not self.enabled:
+            return
+        self.buckets[endpoint].report(latency, ok)
+        metrics.observe(f'upstream.{endpoint}.latency', latency)
+        if not ok:
+            metrics.incr(f'upstream.{endpoint}.errors')
+
+    @contextmanager
+    def slot(self, endpoint, level=None, deadline=None):
+        """
+        Take a token, run the block and report how it went. Exceptions count as
+        errors; call slot.check(response) to count 429/5xx responses as well.
+        Nothing is reported once deadline has run out or the block was
+        cancelled: the wait was cut short by us, not by the portal.
+        """
+        self.acquire(endpoint, level, deadline)
+        outcome = SlotOutcome()
+        start = time.perf_counter()
+        try:
+            yield outcome
+        except (Cancelled, DeadlineExceeded):
+            outcome.ours = True
+            raise
+        except Exception:
+            outcome.ok = False
+            raise
+        finally:
+            if deadline is not None and deadline.expired():
+                outcome.ours = True
+            if outcome.ours:
+                metrics.incr(f'upstream.{endpoint}.unreported')
+            else:
+                self.report(endpoint, time.perf_counter() - start, outcome.ok)
+
+    def stats(self):
+        """Current rate and tokens of every bucket for /debug/metrics"""
+        return {
+            'enabled': self.enabled,
+            'coordination': 'db' if self.coordinator else 'process',
+            'buckets': {name: bucket.stats() for name, bucket in self.buckets.items()}
+        }
+
+
+class SlotOutcome:
+    """Result of one upstream request, reported when its slot ends"""
+
+    def __init__(self):
+        self.ok = True
+        # True when our own deadline or a cancellation ended the request
+        self.ours = False
+
+    def check(self, response):
+        """Mark the request failed if the portal throttled us or errored"""
+        status = getattr(response, 'status_code', None)
+        if status is not None and (status == 429 or status >= 500):
+            self.ok = False
+        return response
+
+
+def get_upstream():
+    """The process-wide scheduler, built from the environment on first use"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PolitenessScheduler.from_env()
+        return _scheduler
@@ -0,0 +1,40 @@
+"""
+Memory accounting for chromedriver and the Chrome processes it started
+
+psutil is optional; without it every figure is reported as None.
+"""
+
+import logging
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def driver_processes(driver):
+    """chromedriver plus every Chrome process below it, or [] if unknown"""
+    if not PSUTIL_AVAILABLE:
+        return []
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        return [root] + root.children(recursive=True)
+    except (AttributeError, psutil.Error):
+        return []
+
+
+def driver_rss(driver):
+    """Resident memory in bytes of a driver's whole process tree, or None"""
+    processes = driver_processes(driver)
+    if not processes:
+        return None
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
@@ -0,0 +1,92 @@
+"""
+Compressed, out-of-line storage of raw results HTML
+
+The full page source of a search used to sit in CaseData.raw_response, so
+every route that loaded a case (/case/<id>, /api/case/<id>, /download_pdf)
+read a large text blob it never used. Pages now live in the raw_pages
+table, compressed and keyed by the sha256 of the HTML; CaseData only keeps
+that key (raw_page_hash) and the HTML is loaded when a stored result has
+to be re-parsed.
+
+zstandard is optional; without it (or with RAW_HTML_COMPRESSION=zlib) pages
+are zlib-compressed. Each row records its encoding, so both can be read.
+"""
+
+import hashlib
+import logging
+import os
+import zlib
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+from metrics import metrics
+from models import db, CaseData, RawPage
+
+logger = logging.getLogger(__name__)
+
+ZSTD_LEVEL = 19
+ZLIB_LEVEL = 9
+
+
+def page_hash(html):
+    """Key of a page: sha256 of its HTML"""
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def default_encoding():
+    """zstd when installed, unless RAW_HTML_COMPRESSION asks for zlib"""
+    wanted = os.getenv('RAW_HTML_COMPRESSION', 'zstd').lower()
+    return 'zstd' if wanted == 'zstd' and ZSTD_AVAILABLE else 'zlib'
+
+
+def compress(html, encoding=None):
+    """(encoding, compressed bytes) for a page"""
+    encoding = encoding or default_encoding()
+    data = html.encode('utf-8')
+    if encoding == 'zstd':
+        return encoding, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return 'zlib', zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(encoding, data):
+    """Inverse of compress()"""
+    if encoding == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Page is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return zlib.decompress(data).decode('utf-8')
+
+
+def store_page(html):
+    """Add a page to the session unless it is already stored; returns its key (the caller commits)"""
+    key = page_hash(html)
+    if db.session.get(RawPage, key) is None:
+        encoding, data = compress(html)
+        db.session.add(RawPage(hash=key, encoding=encoding, data=data, size=len(html.encode('utf-8'))))
+        metrics.incr('raw_pages.stored')
+        metrics.incr('raw_pages.bytes_saved', len(html.encode('utf-8')) - len(data))
+    return key
+
+
+def release_page(key):
+    """Delete a page no case refers to any more"""
+    if not key:
+        return
+    still_used = db.session.query(CaseData.id).filter_by(raw_page_hash=key).first()
+    if still_used is None:
+        db.session.query(RawPage).filter_by(hash=key).delete(synchronize_session=False)
+
+
+def load_page(key):
+    """HTML of a stored page, or None"""
+    if not key:
+        return None
+    with metrics.timer('raw_pages.load'):
+        page = db.session.get(RawPage, key)
+        if page is None:
+            return None
+        return decompress(page.encoding, page.data)
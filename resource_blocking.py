@@ -0,0 +1,193 @@
+"""
+Network-level resource blocking through the Chrome DevTools Protocol
+
+Chrome flags alone still let analytics, fonts, stylesheets and third-party
+scripts load on the court portal. Before each navigation the scrapers apply
+the block rules for the page type with Network.setBlockedURLs:
+
+* search_form - needs its own scripts and the CAPTCHA image, nothing else
+* results / orders - only the HTML document is read
+
+Network.setBlockedURLs is deny-only, so each rule set lists what to drop and
+leaves out what the page needs (PNG stays allowed on the search form because
+the CAPTCHA is served as PNG). Rules can be overridden with a JSON file named
+by RESOURCE_BLOCK_RULES. Blocked requests and bytes are counted from Chrome's
+performance log.
+
+Scripts on results and orders pages are only blocked with
+RESOURCE_BLOCK_SCRIPTS=true, since results rendered by JavaScript would
+come back empty. Bytes saved are estimated from the last size seen for the
+URL (without its query string, so cache-busted CAPTCHA URLs share an entry)
+or, for resources that were never loaded unblocked, from a typical size for
+their type.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS = [
+    '*google-analytics.com*',
+    '*googletagmanager.com*',
+    '*doubleclick.net*',
+    '*facebook.net*',
+    '*hotjar.com*',
+    '*clarity.ms*'
+]
+
+FONTS = ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot', '*fonts.googleapis.com*', '*fonts.gstatic.com*']
+
+STYLESHEETS = ['*.css', '*.css?*']
+
+THIRD_PARTY_SCRIPTS = ['*cdnjs.cloudflare.com*', '*cdn.jsdelivr.net*', '*code.jquery.com/ui*', '*addthis.com*']
+
+NON_CAPTCHA_IMAGES = ['*.jpg', '*.jpeg', '*.gif', '*.svg', '*.webp', '*.ico', '*.bmp']
+
+ALL_IMAGES = NON_CAPTCHA_IMAGES + ['*.png']
+
+SCRIPTS = ['*.js', '*.js?*']
+
+# Opt-in until checked against results rendered by JavaScript
+BLOCK_SCRIPTS = os.getenv('RESOURCE_BLOCK_SCRIPTS', 'false').lower() == 'true'
+
+DEFAULT_RULES = {
+    'search_form': ANALYTICS + FONTS + STYLESHEETS + THIRD_PARTY_SCRIPTS + NON_CAPTCHA_IMAGES,
+    'results': ANALYTICS + FONTS + STYLESHEETS + THIRD_PARTY_SCRIPTS + ALL_IMAGES + (SCRIPTS if BLOCK_SCRIPTS else []),
+    'orders': ANALYTICS + FONTS + STYLESHEETS + THIRD_PARTY_SCRIPTS + ALL_IMAGES + (SCRIPTS if BLOCK_SCRIPTS else [])
+}
+
+# Typical transfer sizes per resource type, for blocked resources never seen loading
+TYPICAL_SIZES = {
+    'Stylesheet': 30000,
+    'Font': 40000,
+    'Script': 60000,
+    'Image': 15000,
+    'Media': 200000,
+    'XHR': 5000,
+    'Fetch': 5000,
+    'Other': 5000
+}
+
+# Last seen transfer size per URL (without query string), least recently used first
+KNOWN_SIZES_LIMIT = 1024
+_known_sizes = OrderedDict()
+_known_sizes_lock = threading.Lock()
+
+
+def _size_key(url):
+    return (url or '').split('?', 1)[0].split('#', 1)[0]
+
+
+def _remember_size(url, size):
+    key = _size_key(url)
+    with _known_sizes_lock:
+        _known_sizes[key] = size
+        _known_sizes.move_to_end(key)
+        while len(_known_sizes) > KNOWN_SIZES_LIMIT:
+            _known_sizes.popitem(last=False)
+
+
+def estimated_size(url, resource_type):
+    """Bytes a blocked request would have cost: last size seen for the URL, else a typical one"""
+    key = _size_key(url)
+    with _known_sizes_lock:
+        if key in _known_sizes:
+            _known_sizes.move_to_end(key)
+            return _known_sizes[key]
+    return TYPICAL_SIZES.get(resource_type, TYPICAL_SIZES['Other'])
+
+
+def blocking_enabled():
+    """Resource blocking is on unless RESOURCE_BLOCKING=false"""
+    return os.getenv('RESOURCE_BLOCKING', 'true').lower() == 'true'
+
+
+def load_rules():
+    """Default rules, overridden per page type by the RESOURCE_BLOCK_RULES JSON file"""
+    rules = dict(DEFAULT_RULES)
+    path = os.getenv('RESOURCE_BLOCK_RULES')
+    if path:
+        try:
+            with open(path) as f:
+                rules.update(json.load(f))
+        except Exception as e:
+            logger.warning(f"Could not load resource block rules from {path}: {str(e)}")
+    return rules
+
+
+RULES = load_rules()
+
+
+def configure_options(chrome_options):
+    """Enable the performance log that blocked/loaded requests are counted from"""
+    if blocking_enabled():
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+
+def apply_rules(driver, page_type):
+    """Block the resources the given page type does not need"""
+    if not blocking_enabled():
+        return
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': RULES.get(page_type, [])})
+    except Exception as e:
+        logger.debug(f"Could not apply resource block rules for {page_type}: {str(e)}")
+
+
+def collect_stats(driver):
+    """
+    Drain the performance log and count requests loaded and blocked since the
+    last call. Returns {'requests_loaded', 'bytes_loaded', 'requests_blocked',
+    'bytes_saved'}; bytes_saved is an estimate (see estimated_size()).
+    """
+    stats = {'requests_loaded': 0, 'bytes_loaded': 0, 'requests_blocked': 0, 'bytes_saved': 0}
+    if not blocking_enabled():
+        return stats
+    try:
+        entries = driver.get_log('performance')
+    except Exception:
+        return stats
+
+    urls = {}
+    types = {}
+    for entry in entries:
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, ValueError):
+            continue
+        method = message.get('method')
+        params = message.get('params', {})
+        request_id = params.get('requestId')
+
+        if method == 'Network.requestWillBeSent':
+            urls[request_id] = params.get('request', {}).get('url')
+            types[request_id] = params.get('type')
+        elif method == 'Network.loadingFinished':
+            size = int(params.get('encodedDataLength', 0))
+            stats['requests_loaded'] += 1
+            stats['bytes_loaded'] += size
+            if urls.get(request_id):
+                _remember_size(urls[request_id], size)
+        elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+            stats['requests_blocked'] += 1
+            stats['bytes_saved'] += estimated_size(urls.get(request_id), params.get('type') or types.get(request_id))
+
+    metrics.incr('blocking.requests_loaded', stats['requests_loaded'])
+    metrics.incr('blocking.bytes_loaded', stats['bytes_loaded'])
+    metrics.incr('blocking.requests_blocked', stats['requests_blocked'])
+    metrics.incr('blocking.bytes_saved_estimate', stats['bytes_saved'])
+    return stats
+
+
+def merge_stats(total, stats):
+    """Add one collect_stats() result into a running total"""
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+    return total
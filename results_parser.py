@@ -0,0 +1,254 @@
+"""
+Parsing of the portal's case status results page
+
+Pure HTML/text parsing with no browser dependency, shared by the scrapers
+(which hand it the page source) and by anything that re-parses stored
+results HTML, such as the snapshot baseline migration.
+"""
+
+import logging
+import re
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://delhihighcourt.nic.in"
+
+
+def parse_results_html(page_source, base_url=BASE_URL):
+    """
+    Parse the cases out of a results page's HTML, falling back to
+    parse_results_text() when there is no recognisable results table.
+    """
+    try:
+        logger.info("🔍 Fast parsing case data...")
+
+        case_data = {
+            'cases': [],
+            'total_cases': 0,
+            'raw_html': page_source
+        }
+
+        # First, try to parse from HTML source directly (more reliable)
+        soup = BeautifulSoup(page_source, 'html.parser')
+
+        # Look for results table in HTML
+        tables = soup.find_all('table')
+        results_table = None
+
+        for table in tables:
+            table_text = table.get_text().lower()
+            if any(keyword in table_text for keyword in ['s.no', 'case no', 'petitioner', 'respondent', 'diary']):
+                results_table = table
+                logger.info(f"📋 Found results table in HTML")
+                break
+
+        if not results_table:
+            logger.warning("⚠️ No results table found in HTML, trying text parsing")
+            return parse_results_text(page_source)
+
+        # Parse table rows from HTML
+        rows = results_table.find_all('tr')
+        logger.info(f"📊 Found {len(rows)} rows in results table")
+
+        for i, row in enumerate(rows):
+            try:
+                cells = row.find_all(['td', 'th'])
+                if len(cells) < 3:  # Skip header rows or incomplete rows
+                    continue
+
+                # Extract basic data from HTML
+                sno = cells[0].get_text(strip=True) if len(cells) > 0 else ""
+                case_info = cells[1].get_text(strip=True) if len(cells) > 1 else ""
+                parties = cells[2].get_text(strip=True) if len(cells) > 2 else ""
+                listing_info = cells[3].get_text(strip=True) if len(cells) > 3 else ""
+
+                # Skip header rows
+                if sno.lower() in ['s.no', 's.no.', 'sno', 'serial'] or not case_info:
+                    logger.info(f"⏭️ Skipping header row: {sno}")
+                    continue
+
+                # Quick parsing of case number and status
+                case_number = ""
+                status = "Unknown"
+
+                if '[' in case_info and ']' in case_info:
+                    status_start = case_info.find('[')
+                    status_end = case_info.find(']')
+                    if status_start != -1 and status_end != -1:
+                        status = case_info[status_start+1:status_end].strip()
+                        case_number = case_info[:status_start].strip()
+                else:
+                    case_number = case_info
+
+                # Quick parsing of dates
+                next_date = "N/A"
+                last_date = "N/A"
+                court_no = "N/A"
+
+                if listing_info:
+                    if "NEXT DATE:" in listing_info:
+                        next_start = listing_info.find("NEXT DATE:") + len("NEXT DATE:")
+                        next_end = listing_info.find("Last Date:", next_start)
+                        if next_end == -1:
+                            next_end = listing_info.find("COURT NO:", next_start)
+                        if next_end == -1:
+                            next_end = len(listing_info)
+                        next_date = listing_info[next_start:next_end].strip()
+
+                    if "Last Date:" in listing_info:
+                        last_start = listing_info.find("Last Date:") + len("Last Date:")
+                        last_end = listing_info.find("COURT NO:", last_start)
+                        if last_end == -1:
+                            last_end = len(listing_info)
+                        last_date = listing_info[last_start:last_end].strip()
+
+                    if "COURT NO:" in listing_info:
+                        court_start = listing_info.find("COURT NO:") + len("COURT NO:")
+                        court_no = listing_info[court_start:].strip()
+
+                # Look for PDF links in HTML
+                pdf_links = []
+                links = cells[1].find_all('a') if len(cells) > 1 else []
+                for link in links:
+                    href = link.get('href', '')
+                    link_text = link.get_text(strip=True)
+                    if href and ('.pdf' in href.lower() or 'order' in link_text.lower()):
+                        full_url = href if href.startswith('http') else f"{base_url}/{href.lstrip('/')}"
+                        pdf_links.append({
+                            'text': link_text,
+                            'url': full_url
+                        })
+
+                case_record = {
+                    'sno': sno,
+                    'case_number': case_number,
+                    'status': status,
+                    'parties': parties,
+                    'next_date': next_date,
+                    'last_date': last_date,
+                    'court_no': court_no,
+                    'pdf_links': pdf_links,
+                    'raw_text': f"{case_info} | {parties} | {listing_info}"
+                }
+
+                case_data['cases'].append(case_record)
+                logger.info(f"✅ Parsed case: {case_number} - {status}")
+
+            except Exception as e:
+                logger.warning(f"⚠️ Error parsing row {i}: {str(e)}")
+                continue
+
+        case_data['total_cases'] = len(case_data['cases'])
+        logger.info(f"🎉 Fast parsing complete: {case_data['total_cases']} cases found")
+
+        # If no cases found, try alternative parsing
+        if case_data['total_cases'] == 0:
+            logger.info("🔄 No cases found with table parsing, trying alternative methods...")
+            return parse_results_text(page_source)
+
+        return case_data
+
+    except Exception as e:
+        logger.error(f"❌ Fast parsing failed: {str(e)}")
+        return parse_results_text(page_source)
+
+
+def parse_results_text(page_text):
+    """Fallback parser matching case numbers in the page text with several patterns"""
+    try:
+        logger.info("🔍 Using fast text parsing fallback...")
+
+        case_data = {
+            'cases': [],
+            'total_cases': 0,
+            'raw_html': page_text,
+            'parsing_method': 'fast_text_fallback'
+        }
+
+        # Multiple regex patterns for different case formats
+        # Pattern 1: Standard format with status in brackets
+        pattern1 = r'([A-Z\.]+\s*-?\s*\d+\s*/\s*\d{4})\s*\[([^\]]+)\]'
+        matches1 = re.findall(pattern1, page_text)
+
+        # Pattern 2: Case number without status
+        pattern2 = r'([A-Z\.]+\s*-?\s*\d+\s*/\s*\d{4})'
+        matches2 = re.findall(pattern2, page_text)
+
+        # Pattern 3: Look for table-like structure in text
+        pattern3 = r'(\d+)\s+([A-Z\.]+\s*-?\s*\d+\s*/\s*\d{4})'
+        matches3 = re.findall(pattern3, page_text)
+
+        logger.info(f"🔍 Pattern matches: {len(matches1)} with status, {len(matches2)} without status, {len(matches3)} with S.No")
+
+        # Process matches with status first
+        for i, (case_num, status) in enumerate(matches1):
+            case_data['cases'].append({
+                'sno': str(i + 1),
+                'case_number': case_num.strip(),
+                'status': status.strip(),
+                'parties': 'Parties information not available',
+                'next_date': 'N/A',
+                'last_date': 'N/A',
+                'court_no': 'N/A',
+                'pdf_links': [],
+                'raw_text': f"{case_num} [{status}]"
+            })
+
+        # If no matches with status, try without status
+        if len(case_data['cases']) == 0 and matches2:
+            for i, case_num in enumerate(matches2[:5]):  # Limit to first 5 to avoid duplicates
+                if case_num.strip() and len(case_num.strip()) > 5:  # Basic validation
+                    case_data['cases'].append({
+                        'sno': str(i + 1),
+                        'case_number': case_num.strip(),
+                        'status': 'Status not available',
+                        'parties': 'Parties information not available',
+                        'next_date': 'N/A',
+                        'last_date': 'N/A',
+                        'court_no': 'N/A',
+                        'pdf_links': [],
+                        'raw_text': case_num.strip()
+                    })
+
+        # If still no matches, try with S.No pattern
+        if len(case_data['cases']) == 0 and matches3:
+            for sno, case_num in matches3[:5]:  # Limit to first 5
+                if case_num.strip() and len(case_num.strip()) > 5:
+                    case_data['cases'].append({
+                        'sno': sno.strip(),
+                        'case_number': case_num.strip(),
+                        'status': 'Status not available',
+                        'parties': 'Parties information not available',
+                        'next_date': 'N/A',
+                        'last_date': 'N/A',
+                        'court_no': 'N/A',
+                        'pdf_links': [],
+                        'raw_text': f"{sno} {case_num}"
+                    })
+
+        case_data['total_cases'] = len(case_data['cases'])
+        logger.info(f"🎉 Fast text parsing found {case_data['total_cases']} cases")
+
+        # If still no cases found, check for common "no results" messages
+        if case_data['total_cases'] == 0:
+            page_lower = page_text.lower()
+            if any(msg in page_lower for msg in ['no record found', 'no records found', 'case not found', 'invalid case', 'no data found']):
+                logger.info("📝 Page indicates no records found")
+            else:
+                logger.warning("⚠️ No cases found and no 'no records' message detected")
+                # Log a sample of the page content for debugging
+                sample_text = page_text[:1000] if len(page_text) > 1000 else page_text
+                logger.debug(f"Page sample: {sample_text}")
+
+        return case_data
+
+    except Exception as e:
+        logger.error(f"❌ Fast text parsing failed: {str(e)}")
+        return {
+            'cases': [],
+            'total_cases': 0,
+            'raw_html': page_text or '',
+            'error': str(e)
+        }
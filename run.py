@@ -9,6 +9,7 @@ import os
 import sys
 from app import app, db
 from config import config
+from migrations import migrate, SCHEMA_VERSION
 
 def create_app(config_name=None):
     """Create and configure the Flask application"""
@@ -18,16 +19,55 @@ def create_app(config_name=None):
     app.config.from_object(config[config_name])
     
     with app.app_context():
-        db.create_all()
+        migrate()
     
     return app
 
 def init_db():
     """Initialize the database"""
     with app.app_context():
-        db.create_all()
+        migrate()
         print("Database initialized successfully!")
 
+def migrate_db():
+    """Apply pending schema migrations to an existing database"""
+    with app.app_context():
+        applied = migrate()
+    if applied:
+        print(f"Applied migrations: {', '.join(str(version) for version in applied)}")
+    else:
+        print("Database schema is up to date")
+    print(f"Schema version: {SCHEMA_VERSION}")
+
+def discover_browser():
+    """Re-run Chrome/chromedriver discovery and rewrite the browser manifest"""
+    from browser_discovery import get_browser_manifest, manifest_path
+    manifest = get_browser_manifest(refresh=True)
+    print(f"Chrome:       {manifest['chrome_binary']}")
+    print(f"chromedriver: {manifest['chromedriver']}")
+    print(f"Manifest written to {manifest_path()}")
+
+def label_captchas():
+    """Type in the answers of recorded CAPTCHAs the solvers got wrong or could not read"""
+    from captcha_corpus import CaptchaCorpus
+    corpus_dir = os.getenv('CAPTCHA_CORPUS_DIR', 'captcha_corpus')
+    corpus = CaptchaCorpus(corpus_dir)
+    samples = corpus.unlabelled()
+    if not samples:
+        print(f"No unlabelled CAPTCHA samples in {corpus_dir}")
+        return
+    print(f"{len(samples)} unlabelled sample(s). Open each image, type its digits; empty skips, 'q' stops.")
+    labelled = 0
+    for sample in samples:
+        hint = 'rejected' if sample.get('rejected') else 'unsolved'
+        answer = input(f"{sample['path']} ({hint}, predicted {sample.get('predicted')!r}): ").strip()
+        if answer == 'q':
+            break
+        if answer:
+            corpus.label(sample['id'], answer)
+            labelled += 1
+    print(f"Labelled {labelled} sample(s)")
+
 def run_tests():
     """Run the test suite"""
     import unittest
@@ -48,12 +88,24 @@ def main():
         if command == 'init-db':
             init_db()
             return
+        elif command == 'migrate':
+            migrate_db()
+            return
+        elif command == 'discover-browser':
+            discover_browser()
+            return
+        elif command == 'label-captchas':
+            label_captchas()
+            return
         elif command == 'test':
             success = run_tests()
             sys.exit(0 if success else 1)
         elif command == 'help':
             print("Available commands:")
             print("  init-db  - Initialize the database")
+            print("  migrate  - Apply pending schema migrations")
+            print("  discover-browser - Refresh the cached Chrome/chromedriver paths")
+            print("  label-captchas - Label recorded CAPTCHAs that were rejected or unsolved")
             print("  test     - Run the test suite")
             print("  help     - Show this help message")
             return
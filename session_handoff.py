@@ -0,0 +1,249 @@
+"""
+Hybrid browser/HTTP session
+
+If the court site needs JavaScript only to set its session cookies and
+tokens, Chrome does not have to stay in the loop: one browser visit performs
+the handshake, its cookies and CSRF tokens are copied into a requests.Session,
+and later searches, orders pages and PDF downloads run over plain HTTP until
+the session expires. Only then is a browser started again.
+"""
+
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from captcha_utils import copy_driver_cookies
+from metrics import metrics
+from politeness import get_upstream, FORM
+
+logger = logging.getLogger(__name__)
+
+EXPIRED_STATUS_CODES = (401, 403, 419, 440)
+
+EXPIRED_PHRASES = [
+    'page expired',
+    'session expired',
+    'session has expired',
+    'csrf token mismatch'
+]
+
+
+def extract_form(html, page_url, marker_id='case_type'):
+    """
+    Describe the <form> that contains the element with id marker_id.
+
+    Returns None when the form is missing, otherwise a dict with the absolute
+    action URL, the method, the fields a browser would submit unchanged
+    (hidden inputs, default values of the other inputs, selected options,
+    checked boxes and the first named submit button), the names of visible
+    text inputs and a map from element id to field name (e.g.
+    {'case_year': 'year'}).
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    marker = soup.find(id=marker_id)
+    if not marker:
+        return None
+    form = marker.find_parent('form')
+    if not form:
+        return None
+
+    fields = {}
+    names = {}
+    text_inputs = []
+    submit_seen = False
+    for element in form.find_all(['input', 'select', 'textarea', 'button']):
+        name = element.get('name')
+        if not name or element.has_attr('disabled'):
+            continue
+        names[element.get('id') or name] = name
+        if element.name == 'select':
+            option = element.find('option', selected=True) or element.find('option')
+            if option is not None:
+                fields[name] = option.get('value', option.get_text(strip=True))
+            continue
+        if element.name == 'textarea':
+            fields[name] = element.get_text()
+            continue
+        input_type = element.get('type', 'submit' if element.name == 'button' else 'text').lower()
+        if input_type in ('submit', 'image'):
+            # A browser sends the button that was pressed; the search form has one
+            if not submit_seen:
+                fields[name] = element.get('value', '')
+                submit_seen = True
+        elif input_type in ('button', 'reset', 'file'):
+            continue
+        elif input_type in ('checkbox', 'radio'):
+            if element.has_attr('checked'):
+                fields[name] = element.get('value', 'on')
+        else:
+            fields[name] = element.get('value', '')
+            if input_type != 'hidden':
+                text_inputs.append(name)
+
+    return {
+        'action': urljoin(page_url, form.get('action') or page_url),
+        'method': (form.get('method') or 'get').lower(),
+        'fields': fields,
+        'names': names,
+        'text_inputs': text_inputs,
+        'soup': soup
+    }
+
+
+# Cookies (and the header) naming the server session; a fork() leaves them out
+SESSION_COOKIE_MARKERS = ('session', 'sessid', 'xsrf', 'csrf')
+SESSION_HEADERS = ('X-CSRF-TOKEN',)
+
+
+def is_session_cookie(name):
+    """True for cookies that identify the server session (laravel_session, PHPSESSID, XSRF-TOKEN, ...)"""
+    name = name.lower()
+    return any(marker in name for marker in SESSION_COOKIE_MARKERS)
+
+
+class HybridSession:
+    """
+    requests.Session bootstrapped once by a real browser. The portal ties
+    its CAPTCHA to the server session, so each search works on a fork():
+    the bootstrapped headers and cookies without the server session cookie
+    and CSRF token. The fork's first form GET then opens a server session
+    (and CAPTCHA) of its own.
+    """
+
+    def __init__(self, session, create_driver, bootstrap_url, max_age=900, admit=None):
+        # create_driver() -> WebDriver or None, used only for the handshake
+        # admit() -> context manager holding a browser slot for the handshake
+        self.session = session
+        self.create_driver = create_driver
+        self.admit = admit or nullcontext
+        self.bootstrap_url = bootstrap_url
+        self.max_age = max_age
+        self.tokens = {}
+        self.bootstrapped_at = None
+        self.bootstrap_count = 0
+        self._lock = threading.Lock()
+
+    def is_valid(self):
+        """True while the handed-off session is within its lifetime"""
+        return self.bootstrapped_at is not None and time.time() - self.bootstrapped_at < self.max_age
+
+    def invalidate(self):
+        """Force a browser handshake before the next HTTP request"""
+        self.bootstrapped_at = None
+
+    def ensure(self):
+        """Bootstrap the session if it has not been done or has expired"""
+        if self.is_valid():
+            return True
+        return self.bootstrap()
+
+    def bootstrap(self):
+        """Run the browser handshake once and move cookies and tokens into the session"""
+        with self.admit(), self._lock:
+            if self.is_valid():
+                return True
+
+            start = time.perf_counter()
+            driver = self.create_driver()
+            if not driver:
+                logger.error("Hybrid session bootstrap failed: no browser")
+                return False
+            try:
+                with get_upstream().slot(FORM):
+                    driver.get(self.bootstrap_url)
+                WebDriverWait(driver, 15).until(
+                    EC.presence_of_element_located((By.ID, "case_type"))
+                )
+
+                self.session.cookies.clear()
+                copy_driver_cookies(driver, self.session)
+                self.tokens = self._read_tokens(driver)
+                if self.tokens.get('csrf-token'):
+                    self.session.headers['X-CSRF-TOKEN'] = self.tokens['csrf-token']
+                self.session.headers['User-Agent'] = driver.execute_script("return navigator.userAgent;")
+
+                self.bootstrapped_at = time.time()
+                self.bootstrap_count += 1
+                metrics.observe('hybrid.bootstrap', time.perf_counter() - start)
+                logger.info(f"Hybrid session bootstrapped with {len(self.session.cookies)} cookie(s)")
+                return True
+            except Exception as e:
+                logger.error(f"Hybrid session bootstrap failed: {str(e)}")
+                return False
+            finally:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+
+    def fork(self):
+        """A new requests.Session with the bootstrapped cookies and headers minus the server session, or None"""
+        if not self.ensure():
+            return None
+        session = requests.Session()
+        self.refresh(session)
+        return session
+
+    def refresh(self, session):
+        """Copy the current bootstrapped cookies and headers, except the server session's, into a fork"""
+        with self._lock:
+            session.cookies.clear()
+            for cookie in self.session.cookies:
+                if not is_session_cookie(cookie.name):
+                    session.cookies.set_cookie(cookie)
+            session.headers.update({
+                name: value for name, value in self.session.headers.items() if name not in SESSION_HEADERS
+            })
+
+    def _read_tokens(self, driver):
+        """Collect CSRF tokens from <meta> tags and hidden _token inputs"""
+        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        tokens = {}
+        for meta in soup.find_all('meta'):
+            name = (meta.get('name') or '').lower()
+            if 'csrf' in name and meta.get('content'):
+                tokens[name] = meta['content']
+        hidden_token = soup.find('input', attrs={'name': '_token'})
+        if hidden_token and hidden_token.get('value'):
+            tokens['_token'] = hidden_token['value']
+        return tokens
+
+    def looks_expired(self, response):
+        """True if an HTTP response shows the handed-off session is no longer accepted"""
+        if response.status_code in EXPIRED_STATUS_CODES:
+            return True
+        content_type = response.headers.get('content-type', '').lower()
+        if 'html' in content_type:
+            text = response.text[:5000].lower()
+            return any(phrase in text for phrase in EXPIRED_PHRASES)
+        return False
+
+    def request(self, method, url, session=None, **kwargs):
+        """
+        Send a request over session (a fork(); the shared session for
+        stateless requests such as PDFs), re-bootstrapping once if it has expired
+        """
+        if not self.ensure():
+            return None
+        session = session or self.session
+        kwargs.setdefault('timeout', 20)
+        response = session.request(method, url, **kwargs)
+        if self.looks_expired(response):
+            logger.info("Hybrid session expired, reviving the browser for a new handshake")
+            metrics.incr('hybrid.expired')
+            self.invalidate()
+            if not self.bootstrap():
+                return None
+            if session is not self.session:
+                self.refresh(session)
+            response = session.request(method, url, **kwargs)
+        metrics.incr('hybrid.http_requests')
+        return response
@@ -64,9 +64,10 @@ def setup_database():
     """Initialize database"""
     try:
         print("🗄️  Setting up database...")
-        from app import app, db
+        from app import app
+        from migrations import migrate
         with app.app_context():
-            db.create_all()
+            migrate()
         print("✅ Database initialized successfully")
     except Exception as e:
         print(f"❌ Database setup failed: {e}")
@@ -0,0 +1,217 @@
+"""
+Delta-compressed history of case results
+
+Every time a case's content changes, a CaseSnapshot row records the new
+version without keeping another full copy:
+
+* fields - the parsed fields ({'status', 'cases'}) flattened to path/value
+  pairs; a full version stores all of them, later versions only a diff
+  ({'set': {path: value}, 'unset': [path, ...]}) against the previous one
+* html - the raw results HTML, zlib-compressed; later versions are
+  compressed with the previous version's HTML as preset dictionary, so the
+  blob only pays for what changed. It is left empty when the HTML did not
+  change.
+
+Every KEYFRAME_INTERVAL versions a full version is stored again, which
+bounds how many deltas have to be replayed to rebuild any version.
+"""
+
+import json
+import logging
+import zlib
+from datetime import datetime, timezone
+
+from models import db, CaseSnapshot
+
+logger = logging.getLogger(__name__)
+
+KEYFRAME_INTERVAL = 20
+
+# zlib only uses the last 32KB of a preset dictionary
+ZDICT_LIMIT = 32768
+
+
+def flatten(value, prefix=''):
+    """{'cases': [{'status': 'X'}]} -> {'cases/0/status': 'X'}; empty containers are kept as leaves"""
+    if isinstance(value, dict) and value:
+        items = value.items()
+    elif isinstance(value, list) and value:
+        items = ((str(index), item) for index, item in enumerate(value))
+    else:
+        return {prefix: value}
+    flat = {}
+    for key, item in items:
+        flat.update(flatten(item, f'{prefix}/{key}' if prefix else str(key)))
+    return flat
+
+
+def unflatten(flat):
+    """Inverse of flatten(); numeric path segments become list indexes"""
+    root = {}
+    for path, value in flat.items():
+        segments = path.split('/')
+        node = root
+        for segment in segments[:-1]:
+            node = node.setdefault(segment, {})
+        node[segments[-1]] = value
+    return _lists(root)
+
+
+def _lists(node):
+    """Turn dicts keyed 0..n-1 back into lists"""
+    if not isinstance(node, dict) or not node:
+        return node
+    node = {key: _lists(value) for key, value in node.items()}
+    if all(key.isdigit() for key in node) and sorted(int(key) for key in node) == list(range(len(node))):
+        return [node[str(index)] for index in range(len(node))]
+    return node
+
+
+def diff_fields(previous, current):
+    """Changes from one flattened field set to the next"""
+    return {
+        'set': {path: value for path, value in current.items() if previous.get(path, object()) != value},
+        'unset': [path for path in previous if path not in current]
+    }
+
+
+def apply_diff(previous, diff):
+    """Apply diff_fields() output to a flattened field set"""
+    fields = dict(previous)
+    for path in diff['unset']:
+        fields.pop(path, None)
+    fields.update(diff['set'])
+    return fields
+
+
+def compress_html(html, previous_html=None):
+    """zlib-compress html, using previous_html as preset dictionary when given"""
+    if previous_html:
+        compressor = zlib.compressobj(9, zdict=previous_html.encode('utf-8')[-ZDICT_LIMIT:])
+    else:
+        compressor = zlib.compressobj(9)
+    return compressor.compress(html.encode('utf-8')) + compressor.flush()
+
+
+def decompress_html(blob, previous_html=None):
+    """Inverse of compress_html()"""
+    if previous_html:
+        decompressor = zlib.decompressobj(zdict=previous_html.encode('utf-8')[-ZDICT_LIMIT:])
+    else:
+        decompressor = zlib.decompressobj()
+    return (decompressor.decompress(blob) + decompressor.flush()).decode('utf-8')
+
+
+def encode_version(previous, fields, html, full):
+    """
+    Encode one version. previous is the rebuilt (flat_fields, html) of the
+    version before, or None. Returns (fields_json, html_blob).
+    """
+    flat = flatten(fields)
+    if full or previous is None:
+        return json.dumps(flat, default=str), compress_html(html)
+    previous_flat, previous_html = previous
+    blob = compress_html(html, previous_html) if html != previous_html else None
+    return json.dumps(diff_fields(previous_flat, flat), default=str), blob
+
+
+def decode_version(previous, fields_json, html_blob, full):
+    """Inverse of encode_version(); returns (flat_fields, html)"""
+    stored = json.loads(fields_json)
+    if full or previous is None:
+        return stored, decompress_html(html_blob)
+    previous_flat, previous_html = previous
+    html = decompress_html(html_blob, previous_html) if html_blob is not None else previous_html
+    return apply_diff(previous_flat, stored), html
+
+
+def snapshot_fields(case_data, status):
+    """The parsed fields a snapshot tracks"""
+    return {'status': status, 'cases': case_data.get('cases', [])}
+
+
+def _latest(case_data_id):
+    return db.session.query(CaseSnapshot).filter_by(
+        case_data_id=case_data_id
+    ).order_by(CaseSnapshot.version.desc()).first()
+
+
+def record_snapshot(record, case_data):
+    """Add the next version of record's content to the session (the caller commits)"""
+    latest = _latest(record.id)
+    version = latest.version + 1 if latest else 1
+    full = latest is None or keyframe_for(version) == version
+    previous = None if full else rebuild(record.id, latest.version)
+    fields_json, html_blob = encode_version(
+        previous, snapshot_fields(case_data, record.status), case_data.get('raw_html') or '', full
+    )
+    snapshot = CaseSnapshot(
+        case_data_id=record.id,
+        version=version,
+        is_full=full,
+        fields=fields_json,
+        html=html_blob,
+        content_hash=record.content_hash,
+        created_at=datetime.now(timezone.utc)
+    )
+    db.session.add(snapshot)
+    return snapshot
+
+
+def keyframe_for(version):
+    """Version of the full snapshot that version is replayed from"""
+    return version - (version - 1) % KEYFRAME_INTERVAL
+
+
+def _chain(case_data_id, first, version):
+    return db.session.query(CaseSnapshot).filter(
+        CaseSnapshot.case_data_id == case_data_id,
+        CaseSnapshot.version >= first,
+        CaseSnapshot.version <= version
+    ).order_by(CaseSnapshot.version).all()
+
+
+def rebuild(case_data_id, version):
+    """(flat_fields, html) of one stored version, replayed from the nearest full version"""
+    rows = _chain(case_data_id, keyframe_for(version), version)
+    if rows and not rows[0].is_full:
+        # Keyframes are aligned by record_snapshot(); only a gap in the history lands here
+        logger.warning(f"Case {case_data_id} has no full snapshot at version {rows[0].version}; replaying from version 1")
+        rows = _chain(case_data_id, 1, version)
+    if not rows or rows[-1].version != version:
+        return None
+    start = 0
+    for index, row in enumerate(rows):
+        if row.is_full:
+            start = index
+    state = None
+    for row in rows[start:]:
+        state = decode_version(state, row.fields, row.html, row.is_full)
+    return state
+
+
+def get_version(case_data_id, version):
+    """Parsed fields and HTML of a historical version, or None"""
+    state = rebuild(case_data_id, version)
+    if state is None:
+        return None
+    flat, html = state
+    return {'fields': unflatten(flat), 'raw_html': html}
+
+
+def list_versions(case_data_id):
+    """Summary of every stored version, oldest first"""
+    rows = db.session.query(CaseSnapshot).filter_by(
+        case_data_id=case_data_id
+    ).order_by(CaseSnapshot.version).all()
+    versions = []
+    for row in rows:
+        stored = json.loads(row.fields)
+        versions.append({
+            'version': row.version,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'full': row.is_full,
+            'changed_fields': sorted(stored) if row.is_full else sorted(stored['set']) + sorted(stored['unset']),
+            'stored_bytes': len(row.fields) + len(row.html or b'')
+        })
+    return versions
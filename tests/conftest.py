@@ -0,0 +1,23 @@
+import pytest
+from flask import Flask
+
+from models import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Flask app on a throwaway SQLite database, with its app context pushed"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def results(status, html=None, **extra):
+    """case_data as the scrapers return it, for one case"""
+    case = {'case_number': 'W.P.(C) 1/2024', 'status': status, **extra}
+    return {'cases': [case], 'total_cases': 1, 'raw_html': html or f'<table><tr><td>{status}</td></tr></table>'}
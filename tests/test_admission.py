@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, INTERACTIVE, BATCH
+
+
+def test_grants_up_to_max_active():
+    controller = AdmissionController(max_active=2, max_queue=4)
+    first, second, third = (controller.enqueue() for _ in range(3))
+    assert first.granted_at is not None and second.granted_at is not None
+    assert third.granted_at is None
+    first.release()
+    assert third.granted_at is not None
+
+
+def test_interactive_goes_ahead_of_batch():
+    controller = AdmissionController(max_active=1, max_queue=4)
+    running = controller.enqueue(BATCH)
+    batch = controller.enqueue(BATCH)
+    interactive = controller.enqueue(INTERACTIVE)
+    running.release()
+    assert interactive.granted_at is not None
+    assert batch.granted_at is None
+    interactive.release()
+    assert batch.granted_at is not None
+
+
+def test_same_priority_is_first_come_first_served():
+    controller = AdmissionController(max_active=1, max_queue=4)
+    running = controller.enqueue()
+    earlier, later = controller.enqueue(), controller.enqueue()
+    running.release()
+    assert earlier.granted_at is not None and later.granted_at is None
+
+
+def test_full_queue_rejects_with_503():
+    controller = AdmissionController(max_active=1, max_queue=1)
+    controller.enqueue()
+    controller.enqueue()
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.enqueue()
+    assert rejected.value.status_code == 503
+    assert rejected.value.retry_after >= 1
+
+
+def test_batch_share_of_the_queue_rejects_with_429():
+    controller = AdmissionController(max_active=1, max_queue=4, max_batch_queue=1)
+    controller.enqueue()
+    controller.enqueue(BATCH)
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.enqueue(BATCH)
+    assert rejected.value.status_code == 429
+    # Interactive requests still get the rest of the queue
+    controller.enqueue(INTERACTIVE)
+
+
+def test_queue_timeout_rejects_and_frees_the_place():
+    controller = AdmissionController(max_active=1, max_queue=1)
+    controller.enqueue()
+    waiting = controller.enqueue()
+    with pytest.raises(AdmissionRejected):
+        waiting.wait(timeout=0.1)
+    assert controller.stats()['queued'] == 0
+
+
+def test_cancelled_wait_returns_false():
+    controller = AdmissionController(max_active=1, max_queue=1)
+    controller.enqueue()
+    assert controller.enqueue().wait(timeout=5, should_cancel=lambda: True) is False
+
+
+def test_admit_once_does_not_nest():
+    controller = AdmissionController(max_active=1, max_queue=1)
+    with controller.admit():
+        assert controller.holding()
+        # Would wait forever for the only slot if it took a second one
+        with controller.admit_once(BATCH, timeout=0.1):
+            assert controller.stats()['active'] == 1
+    assert not controller.holding()
+
+
+def test_admit_once_takes_a_slot_on_other_threads():
+    controller = AdmissionController(max_active=1, max_queue=1)
+    outcome = []
+
+    def other():
+        try:
+            with controller.admit_once(BATCH, timeout=0.1):
+                outcome.append('admitted')
+        except AdmissionRejected:
+            outcome.append('rejected')
+
+    with controller.admit():
+        thread = threading.Thread(target=other)
+        thread.start()
+        thread.join()
+    assert outcome == ['rejected']
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from case_store import upsert_case, find_case, encode_cursor, decode_cursor, history_page
+from models import db, CaseData, CaseQuery, CaseSnapshot, RawPage
+from conftest import results
+
+
+def _query(number='1'):
+    return CaseQuery(case_type='W.P.(C)', case_number=number, filing_year='2024',
+                     timestamp=datetime.now(timezone.utc))
+
+
+def test_first_result_creates_the_record(app):
+    record, changed = upsert_case(_query(), results('PENDING'))
+    assert changed
+    assert record.status == 'PENDING'
+    assert find_case('W.P.(C)', '1', '2024').id == record.id
+    assert db.session.query(CaseSnapshot).count() == 1
+
+
+def test_same_content_is_not_rewritten(app):
+    first, _ = upsert_case(_query(), results('PENDING'))
+    # The raw HTML carries per-request tokens; only the parsed cases decide
+    second, changed = upsert_case(_query(), results('PENDING', html='<table>other token</table>'))
+    assert not changed
+    assert second.id == first.id
+    assert db.session.query(CaseData).count() == 1
+    assert db.session.query(CaseSnapshot).count() == 1
+    assert db.session.query(RawPage).count() == 1
+    assert db.session.query(CaseQuery).count() == 2
+
+
+def test_changed_content_updates_the_record(app):
+    first, _ = upsert_case(_query(), results('PENDING'))
+    page = first.raw_page_hash
+    second, changed = upsert_case(_query(), results('DISPOSED'))
+    assert changed
+    assert second.id == first.id
+    assert second.status == 'DISPOSED'
+    assert db.session.query(CaseSnapshot).count() == 2
+    # The previous page is no longer referenced and is dropped
+    assert db.session.get(RawPage, page) is None
+
+
+def test_queries_point_at_the_record(app):
+    query = _query()
+    record, _ = upsert_case(query, results('PENDING'))
+    assert query.case_data_id == record.id
+
+
+def test_unlogged_refresh_writes_no_query(app):
+    upsert_case(_query(), results('PENDING'))
+    upsert_case(_query(), results('DISPOSED'), log_query=False)
+    assert db.session.query(CaseQuery).count() == 1
+
+
+def test_cursor_round_trip(app):
+    query = _query()
+    query.id = 42
+    timestamp, query_id = decode_cursor(encode_cursor(query))
+    assert (timestamp, query_id) == (query.timestamp, 42)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not base64!', 'bm8tc2VwYXJhdG9y'])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def _history(count, same_timestamp_every=None):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for n in range(count):
+        offset = n // same_timestamp_every if same_timestamp_every else n
+        db.session.add(CaseQuery(case_type='W.P.(C)' if n % 2 else 'CRL.A.', case_number=str(n),
+                                 filing_year='2024', timestamp=start + timedelta(minutes=offset)))
+    db.session.commit()
+
+
+def _all_pages(**filters):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = history_page(cursor=cursor, limit=2, **filters)
+        pages.append([row.case_number for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_history_pages_newest_first(app):
+    _history(5)
+    assert _all_pages() == [['4', '3'], ['2', '1'], ['0']]
+
+
+def test_history_pages_break_timestamp_ties_by_id(app):
+    _history(6, same_timestamp_every=3)
+    pages = _all_pages()
+    assert [n for page in pages for n in page] == ['5', '4', '3', '2', '1', '0']
+
+
+def test_history_filters(app):
+    _history(6)
+    assert _all_pages(case_type='W.P.(C)') == [['5', '3'], ['1']]
+    assert _all_pages(filing_year='1999') == [[]]
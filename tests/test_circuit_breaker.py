@@ -0,0 +1,111 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker('test', failure_rate=0.5, min_requests=4, window=60, open_seconds=30)
+
+
+def _trip(breaker):
+    for ok in (True, False, False, True):
+        assert breaker.allow()
+        breaker.record(ok)
+
+
+def test_stays_closed_below_min_requests(breaker):
+    for _ in range(3):
+        breaker.record(False)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_opens_at_failure_rate(breaker):
+    _trip(breaker)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 31
+
+
+def test_old_outcomes_leave_the_window(breaker, clock):
+    breaker.record(False)
+    breaker.record(False)
+    clock.now += 61
+    breaker.record(True)
+    breaker.record(True)
+    assert breaker.state == CLOSED
+
+
+def test_one_probe_after_open_seconds(breaker, clock):
+    _trip(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes(breaker, clock):
+    _trip(breaker)
+    clock.now += 30
+    breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.retry_after() == 0
+
+
+def test_failed_probe_reopens(breaker, clock):
+    _trip(breaker)
+    clock.now += 30
+    breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_released_probe_lets_the_next_caller_probe(breaker, clock):
+    _trip(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.retry_after() == 0
+    assert breaker.allow()
+
+
+def test_release_when_closed_changes_nothing(breaker):
+    breaker.release()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_retry_after_counts_from_the_probe(breaker, clock):
+    _trip(breaker)
+    clock.now += 40
+    breaker.allow()
+    clock.now += 10
+    assert breaker.retry_after() == 21
+
+
+def test_unreported_probe_is_replaced(breaker, clock):
+    _trip(breaker)
+    clock.now += 30
+    breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
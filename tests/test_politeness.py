@@ -0,0 +1,67 @@
+import pytest
+
+from admission import INTERACTIVE, BATCH
+from deadline import Deadline, DeadlineExceeded, Cancelled
+from politeness import TokenBucket
+
+
+def _bucket(burst=3, reserve=1, rate=0.001):
+    # A near-zero refill rate, so only the burst is available during a test
+    return TokenBucket('test', rate=rate, burst=burst, reserve=reserve)
+
+
+def test_burst_is_available_at_once():
+    bucket = _bucket()
+    for _ in range(3):
+        assert bucket.acquire(INTERACTIVE, deadline=Deadline(1)) < 0.1
+
+
+def test_batch_cannot_take_the_reserve():
+    bucket = _bucket(burst=3, reserve=1)
+    bucket.acquire(BATCH, deadline=Deadline(1))
+    bucket.acquire(BATCH, deadline=Deadline(1))
+    with pytest.raises(DeadlineExceeded):
+        bucket.acquire(BATCH, deadline=Deadline(1))
+    # The last token is kept for interactive requests
+    bucket.acquire(INTERACTIVE, deadline=Deadline(1))
+
+
+def test_reserve_is_smaller_than_burst():
+    assert _bucket(burst=2, reserve=5).reserve == 1
+
+
+def test_deadline_fails_fast_when_the_token_comes_too_late():
+    bucket = _bucket(burst=1)
+    bucket.acquire(INTERACTIVE)
+    deadline = Deadline(30)
+    with pytest.raises(DeadlineExceeded):
+        bucket.acquire(INTERACTIVE, deadline=deadline)
+    # No waiting for a token that would only arrive after the budget
+    assert deadline.remaining() > 29
+
+
+def test_cancelled_deadline_stops_the_wait():
+    bucket = _bucket(burst=1)
+    bucket.acquire(INTERACTIVE)
+    with pytest.raises(Cancelled):
+        bucket.acquire(INTERACTIVE, deadline=Deadline(30, should_cancel=lambda: True))
+
+
+def test_waits_for_refill_within_the_deadline():
+    bucket = _bucket(burst=1, rate=20)
+    bucket.acquire(INTERACTIVE)
+    waited = bucket.acquire(INTERACTIVE, deadline=Deadline(5))
+    assert 0 < waited < 1
+
+
+def test_report_backs_off_and_recovers():
+    bucket = TokenBucket('test', rate=2.0, burst=2, cooldown=0, increase=0.5)
+    bucket.report(0.1, ok=False)
+    assert bucket.rate == 1.0
+    bucket.report(10.0, ok=True)  # slower than target_latency counts as trouble
+    assert bucket.rate == 0.5
+    bucket.report(0.1, ok=True)
+    assert bucket.rate == 1.0
+    for _ in range(5):
+        bucket.report(0.1, ok=True)
+    assert bucket.rate == bucket.max_rate
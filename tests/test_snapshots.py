@@ -0,0 +1,106 @@
+from models import db, CaseData, CaseQuery, CaseSnapshot
+from snapshots import (
+    KEYFRAME_INTERVAL, flatten, unflatten, diff_fields, apply_diff, encode_version, decode_version,
+    keyframe_for, record_snapshot, rebuild, get_version
+)
+
+
+FIELDS = {
+    'status': 'PENDING',
+    'cases': [
+        {'case_number': 'W.P.(C) 1/2024', 'pdf_links': [], 'parties': {'petitioner': 'A', 'respondent': 'B'}},
+        {'case_number': 'W.P.(C) 2/2024', 'pdf_links': [{'url': 'https://x/1.pdf'}], 'parties': {}}
+    ]
+}
+
+
+def test_flatten_unflatten_round_trip():
+    flat = flatten(FIELDS)
+    assert flat['cases/1/pdf_links/0/url'] == 'https://x/1.pdf'
+    assert flat['cases/0/pdf_links'] == []
+    assert flat['cases/1/parties'] == {}
+    assert unflatten(flat) == FIELDS
+
+
+def test_diff_fields_round_trip():
+    changed = {
+        'status': 'DISPOSED',
+        'cases': [{'case_number': 'W.P.(C) 1/2024', 'pdf_links': [{'url': 'https://x/2.pdf'}], 'parties': {}}]
+    }
+    diff = diff_fields(flatten(FIELDS), flatten(changed))
+    assert diff['set']['status'] == 'DISPOSED'
+    assert 'cases/1/case_number' in diff['unset']
+    assert unflatten(apply_diff(flatten(FIELDS), diff)) == changed
+
+
+def test_diff_of_identical_fields_is_empty():
+    assert diff_fields(flatten(FIELDS), flatten(FIELDS)) == {'set': {}, 'unset': []}
+
+
+def test_keyframe_for():
+    assert keyframe_for(1) == 1
+    assert keyframe_for(KEYFRAME_INTERVAL) == 1
+    assert keyframe_for(KEYFRAME_INTERVAL + 1) == KEYFRAME_INTERVAL + 1
+    assert keyframe_for(2 * KEYFRAME_INTERVAL) == KEYFRAME_INTERVAL + 1
+    assert keyframe_for(2 * KEYFRAME_INTERVAL + 5) == 2 * KEYFRAME_INTERVAL + 1
+
+
+def test_encode_decode_full_and_delta():
+    full = encode_version(None, FIELDS, '<html>1</html>', True)
+    first = decode_version(None, *full, True)
+    assert first == (flatten(FIELDS), '<html>1</html>')
+
+    changed = dict(FIELDS, status='DISPOSED')
+    fields_json, blob = encode_version(first, changed, '<html>1</html>', False)
+    assert blob is None  # unchanged HTML is not stored again
+    assert decode_version(first, fields_json, blob, False) == (flatten(changed), '<html>1</html>')
+
+    fields_json, blob = encode_version(first, changed, '<html>2</html>', False)
+    assert decode_version(first, fields_json, blob, False)[1] == '<html>2</html>'
+
+
+def _record():
+    query = CaseQuery(case_type='W.P.(C)', case_number='1', filing_year='2024')
+    db.session.add(query)
+    db.session.flush()
+    record = CaseData(query_id=query.id, case_type='W.P.(C)', case_number='1', filing_year='2024')
+    db.session.add(record)
+    db.session.flush()
+    return record
+
+
+def _store_versions(record, count):
+    for n in range(1, count + 1):
+        record.status = f'S{n}'
+        record_snapshot(record, {'cases': [{'n': n}], 'raw_html': f'<html>{n}</html>'})
+        db.session.flush()
+    db.session.commit()
+
+
+def test_record_snapshot_stores_keyframes_on_schedule(app):
+    record = _record()
+    _store_versions(record, 2 * KEYFRAME_INTERVAL + 1)
+    full = [row.version for row in CaseSnapshot.query.filter_by(case_data_id=record.id, is_full=True)]
+    assert full == [1, KEYFRAME_INTERVAL + 1, 2 * KEYFRAME_INTERVAL + 1]
+
+
+def test_rebuild_every_version(app):
+    record = _record()
+    _store_versions(record, KEYFRAME_INTERVAL + 5)
+    for version in range(1, KEYFRAME_INTERVAL + 6):
+        version_data = get_version(record.id, version)
+        assert version_data['fields'] == {'status': f'S{version}', 'cases': [{'n': version}]}
+        assert version_data['raw_html'] == f'<html>{version}</html>'
+    assert rebuild(record.id, KEYFRAME_INTERVAL + 6) is None
+
+
+def test_rebuild_only_reads_from_the_keyframe(app):
+    record = _record()
+    _store_versions(record, KEYFRAME_INTERVAL + 5)
+    # Versions before the keyframe are not needed to rebuild a later one
+    CaseSnapshot.query.filter(CaseSnapshot.case_data_id == record.id,
+                              CaseSnapshot.version <= KEYFRAME_INTERVAL).delete()
+    db.session.commit()
+    flat, html = rebuild(record.id, KEYFRAME_INTERVAL + 5)
+    assert flat['status'] == f'S{KEYFRAME_INTERVAL + 5}'
+    assert html == f'<html>{KEYFRAME_INTERVAL + 5}</html>'
@@ -0,0 +1,132 @@
+"""
+Batched background writes for logging-only rows
+
+A search used to commit its CaseQuery on the request path before scraping,
+and commit again when it stored the result: two fsyncs on SQLite, two round
+trips on Postgres. A search that finds its case now adds the query to the
+same unit of work as the result (case_store.upsert_case). A query that only
+needs logging (nothing found, a failed or cancelled scrape) is handed to a
+WriteBatcher instead. The batcher inserts whatever has queued up every
+`interval` seconds, or as soon as `max_batch` rows are waiting, in one
+transaction.
+
+Every commit made through a Session is counted as db.commits, and
+counted_commits() counts the commits made on one thread, so the search
+path can report how many it needed.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from metrics import metrics
+from models import db
+
+logger = logging.getLogger(__name__)
+
+_commits = threading.local()
+
+
+@event.listens_for(Session, 'after_commit')
+def _count_commit(session):
+    metrics.incr('db.commits')
+    if getattr(_commits, 'count', None) is not None:
+        _commits.count += 1
+
+
+class CommitCount:
+    count = 0
+
+
+@contextmanager
+def counted_commits():
+    """Count the commits made on this thread inside the block"""
+    previous = getattr(_commits, 'count', None)
+    _commits.count = 0
+    counter = CommitCount()
+    try:
+        yield counter
+    finally:
+        counter.count = _commits.count
+        _commits.count = previous
+
+
+class WriteBatcher:
+    """Background thread inserting queued rows in batches"""
+
+    def __init__(self, app, interval=0.2, max_batch=500):
+        self.app = app
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the writer thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._write_loop, name='write-batcher', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def add(self, model, **values):
+        """Queue one row of model for insertion"""
+        with self._lock:
+            self._pending.append((model, values))
+            pending = len(self._pending)
+            if self._thread is None:
+                self.start()
+        if pending >= self.max_batch:
+            self._wake.set()
+
+    def flush(self):
+        """Insert everything queued so far; returns the number of rows written"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        rows = defaultdict(list)
+        for model, values in batch:
+            rows[model].append(values)
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                for model, values in rows.items():
+                    db.session.execute(insert(model), values)
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Batched write of {len(batch)} rows failed: {str(e)}")
+            metrics.incr('write_batcher.failed_rows', len(batch))
+            return 0
+        metrics.observe('write_batcher.flush', time.perf_counter() - start)
+        metrics.incr('write_batcher.rows', len(batch))
+        metrics.incr('write_batcher.batches')
+        return len(batch)
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _write_loop(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def shutdown(self):
+        """Stop the thread and write what is still queued"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush()